@@ -1,27 +1,52 @@
 """
 Faris AI SaaS - All API Routes (SQLAlchemy version)
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query, UploadFile, File
+from fastapi.responses import RedirectResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from sqlalchemy import func, or_, and_
-from typing import Optional, List
+from pydantic import ValidationError
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import case, func, or_, and_, select, tuple_
+from typing import Generator, Optional, List, Tuple
 from datetime import datetime, timedelta
+from urllib.parse import urlsplit
 from uuid import UUID, uuid4
 import jwt
+import asyncio
+import base64
 import csv
+import hashlib
+import hmac
+import itertools
 import io
+import json
+import logging
 
 from app.config import settings
 from app.database import get_db
 from app.models import (
     Organization, User, CompanyProfile, IndustrySource, DataSource,
-    Lead, Campaign, Message, Integration, ActivityLog, Usage
+    Lead, LeadDuplicateReport, Campaign, Message, MessageReply, Integration, ActivityLog, Usage
 )
 from app.schemas import *
+from app.services.usage_service import get_usage_meter
+from app.services.user_cache import get_user_cache
+from app.services.write_behind import get_write_behind
+from app.services.dedup import IDENTITY_FIELDS, index_leads, lead_fields, live_clusters, merge_leads
+from app.services.campaign_runner import profile_dict
+from app.services.campaign_stats import MEETING_STATUS, funnel, lead_meeting_changed, replies_by_campaign
+from app.services.templates import TemplateError, compile_template
+from app.services.reference_cache import (
+    cached_response, etag_matches, get_reference_cache, invalidated_ttl, not_modified
+)
+from app.services.collection_versions import collection_etag
+from app.services.serialization import negotiated, response_format
+from app.services.tracking import PIXEL, get_tracker, read_token
+from app.services.read_routing import attribute_writes, read_session, read_session_factory
 import bcrypt
 
 security = HTTPBearer()
+logger = logging.getLogger(__name__)
 
 # ==================== AUTH HELPERS ====================
 
@@ -63,8 +88,48 @@ def get_current_user(
     user = db.query(User).filter(User.id == payload["sub"]).first()
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
+    # The route shares this session: its commits make this user's reads sticky
+    attribute_writes(db, user.id)
     return user
 
+def get_token_identity(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> Tuple[UUID, UUID]:
+    """(user_id, org_id) of the bearer token for cached reads; the user's org is checked against a short-lived cache"""
+    payload = decode_token(credentials.credentials)
+    try:
+        user_id, org_id = UUID(payload["sub"]), UUID(payload["org"])
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=401, detail="Invalid token")
+    if get_user_cache().org_of(db, user_id) != org_id:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user_id, org_id
+
+def get_current_org_id(identity: Tuple[UUID, UUID] = Depends(get_token_identity)) -> UUID:
+    return identity[1]
+
+def get_read_db(identity: Tuple[UUID, UUID] = Depends(get_token_identity)) -> Generator[Session, None, None]:
+    """Read-only session for GET routes: the replica unless the user (or a task in their org) wrote recently"""
+    user_id, org_id = identity
+    yield from read_session(org_id, user_id)
+
+def conditional_list(request: Request, response: Response, org_id: UUID, collection: str) -> Optional[Response]:
+    """304 when the client's copy of this list is current, otherwise tag the response.
+    Must run before the list query so the ETag never outruns the data."""
+    etag = collection_etag(request, org_id, collection)
+    if etag is None:
+        return None
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return None
+
+def enforce_usage_limit(db: Session, org_id: UUID, usage_field: str, amount: int = 1):
+    if not get_usage_meter().check_limit(db, org_id, usage_field, amount):
+        raise HTTPException(status_code=402, detail="تم الوصول إلى الحد الشهري لباقتك")
+
 # ==================== AUTH ROUTES ====================
 auth_router = APIRouter()
 
@@ -122,9 +187,8 @@ def login(data: UserLogin, db: Session = Depends(get_db)):
     if not user or not user.password_hash or not verify_password(data.password, user.password_hash):
         raise HTTPException(status_code=401, detail="بيانات الدخول غير صحيحة")
 
-    # Update last login
-    user.last_login_at = datetime.utcnow()
-    db.commit()
+    # Update last login (written behind, off the request path)
+    get_write_behind().touch_login(user.id)
 
     return TokenResponse(
         access_token=create_token(str(user.id), str(user.org_id)),
@@ -155,11 +219,16 @@ def get_me(user: User = Depends(get_current_user)):
 profile_router = APIRouter()
 
 @profile_router.get("", response_model=CompanyProfileResponse)
-def get_profile(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    profile = db.query(CompanyProfile).filter(CompanyProfile.org_id == user.org_id).first()
-    if not profile:
-        raise HTTPException(status_code=404, detail="Profile not found")
-    return _profile_to_response(profile)
+def get_profile(request: Request, org_id: UUID = Depends(get_current_org_id), db: Session = Depends(get_db)):
+    def load():
+        profile = db.query(CompanyProfile).filter(CompanyProfile.org_id == org_id).first()
+        if not profile:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        return _profile_to_response(profile)
+
+    ttl = invalidated_ttl(settings.PROFILE_CACHE_TTL_SECONDS)
+    entry = get_reference_cache().get(("profile", org_id), load, ttl=ttl)
+    return cached_response(request, entry)
 
 @profile_router.put("", response_model=CompanyProfileResponse)
 def update_profile(data: CompanyProfileUpdate, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -179,6 +248,7 @@ def update_profile(data: CompanyProfileUpdate, user: User = Depends(get_current_
 
     db.commit()
     db.refresh(profile)
+    get_reference_cache().invalidate(("profile", user.org_id))
     return _profile_to_response(profile)
 
 def _profile_to_response(profile: CompanyProfile) -> CompanyProfileResponse:
@@ -205,18 +275,8 @@ def _profile_to_response(profile: CompanyProfile) -> CompanyProfileResponse:
 # ==================== LEADS ROUTES ====================
 leads_router = APIRouter()
 
-@leads_router.get("", response_model=LeadListResponse)
-def list_leads(
-    page: int = Query(1, ge=1),
-    page_size: int = Query(20, ge=1, le=100),
-    status: Optional[LeadStatus] = None,
-    industry: Optional[str] = None,
-    min_score: Optional[int] = Query(None, ge=0, le=10),
-    search: Optional[str] = None,
-    user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    query = db.query(Lead).filter(Lead.org_id == user.org_id)
+def _filter_leads(query, org_id, status=None, industry=None, min_score=None, search=None):
+    query = query.filter(Lead.org_id == org_id)
 
     if status:
         query = query.filter(Lead.status == status.value)
@@ -231,26 +291,306 @@ def list_leads(
                 Lead.contact_name.ilike(f"%{search}%")
             )
         )
+    return query
+
+@leads_router.get("", response_model=LeadListResponse)
+def list_leads(
+    request: Request,
+    response: Response,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    status: Optional[LeadStatus] = None,
+    industry: Optional[str] = None,
+    min_score: Optional[int] = Query(None, ge=0, le=10),
+    search: Optional[str] = None,
+    org_id: UUID = Depends(get_current_org_id),
+    db: Session = Depends(get_read_db)
+):
+    unchanged = conditional_list(request, response, org_id, "leads")
+    if unchanged:
+        return unchanged
+
+    query = _filter_leads(db.query(Lead.id), org_id, status, industry, min_score, search)
 
     total = query.count()
     offset = (page - 1) * page_size
-    leads = query.order_by(Lead.created_at.desc()).offset(offset).limit(page_size).all()
+    # Page through idx_leads_created alone, then load just the rows on the page
+    ids = [row.id for row in query.order_by(Lead.created_at.desc(), Lead.id.desc()).offset(offset).limit(page_size)]
+    by_id = {lead.id: lead for lead in db.query(Lead).filter(Lead.org_id == org_id, Lead.id.in_(ids))} if ids else {}
+    leads = [by_id[i] for i in ids if i in by_id]
 
-    return LeadListResponse(
+    return negotiated(request, LeadListResponse(
         leads=[_lead_to_response(l) for l in leads],
         total=total,
         page=page,
         page_size=page_size,
         total_pages=(total + page_size - 1) // page_size
+    ), response)
+
+@leads_router.get("/export")
+def export_leads(
+    format: ExportFormat = ExportFormat.csv,
+    status: Optional[LeadStatus] = None,
+    industry: Optional[str] = None,
+    min_score: Optional[int] = Query(None, ge=0, le=10),
+    search: Optional[str] = None,
+    user: User = Depends(get_current_user)
+):
+    from app.services import export
+
+    if format == ExportFormat.parquet:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=501, detail="تصدير Parquet غير متاح على هذا الخادم")
+
+    # The stream opens its own session: the request session is closed before the body is sent
+    org_id = user.org_id
+    chunks = export.export_leads(
+        lambda q: _filter_leads(q, org_id, status, industry, min_score, search).order_by(Lead.created_at.desc(), Lead.id.desc()),
+        format.value,
+        read_session_factory(org_id, user.id)
+    )
+
+    get_write_behind().log_activity(
+        org_id=org_id,
+        user_id=user.id,
+        action="leads.exported",
+        entity_type="lead",
+        details={"format": format.value, "status": status.value if status else None, "industry": industry}
+    )
+
+    filename = f"leads-{datetime.utcnow():%Y%m%d-%H%M%S}.{format.value}"
+    return StreamingResponse(
+        chunks,
+        media_type=export.CONTENT_TYPES[format.value],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def _selected_leads(db: Session, org_id, selection: LeadSelection):
+    if selection.is_empty():
+        raise HTTPException(status_code=400, detail="حدد العملاء المحتملين بالمعرفات أو بالفلاتر")
+    query = _filter_leads(
+        db.query(Lead.id), org_id, selection.status, selection.industry, selection.min_score, selection.search
+    )
+    if selection.ids:
+        query = query.filter(Lead.id.in_(selection.ids))
+    return query
+
+def _selection_details(selection: LeadSelection) -> dict:
+    details = selection.model_dump(mode="json", exclude_none=True, exclude={"ids"})
+    if selection.ids:
+        details["ids_count"] = len(selection.ids)
+    return details
+
+@leads_router.post("/bulk/update", response_model=BulkResultResponse)
+def bulk_update_leads(data: BulkLeadUpdateRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    from app.services.bulk_leads import bulk_update
+
+    if not (data.set_status or data.add_tags or data.remove_tags):
+        raise HTTPException(status_code=400, detail="لا توجد تغييرات")
+
+    affected = bulk_update(
+        db,
+        user.org_id,
+        _selected_leads(db, user.org_id, data.selection),
+        status=data.set_status.value if data.set_status else None,
+        add_tags=data.add_tags,
+        remove_tags=data.remove_tags
+    )
+
+    get_write_behind().log_activity(
+        org_id=user.org_id,
+        user_id=user.id,
+        action="leads.bulk_updated",
+        entity_type="lead",
+        details={
+            "affected": affected,
+            "selection": _selection_details(data.selection),
+            "changes": data.model_dump(mode="json", exclude_none=True, exclude={"selection"})
+        }
+    )
+    return BulkResultResponse(affected=affected)
+
+@leads_router.post("/bulk/delete", response_model=BulkResultResponse)
+def bulk_delete_leads(data: BulkLeadDeleteRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    from app.services.bulk_leads import bulk_delete
+
+    affected = bulk_delete(db, user.org_id, _selected_leads(db, user.org_id, data.selection))
+
+    get_write_behind().log_activity(
+        org_id=user.org_id,
+        user_id=user.id,
+        action="leads.bulk_deleted",
+        entity_type="lead",
+        details={"affected": affected, "selection": _selection_details(data.selection)}
+    )
+    return BulkResultResponse(affected=affected)
+
+@leads_router.get("/duplicates", response_model=DuplicateReportResponse)
+def list_duplicate_leads(
+    limit: int = Query(50, ge=1, le=500),
+    org_id: UUID = Depends(get_current_org_id),
+    db: Session = Depends(get_read_db)
+):
+    from app.workers.tasks import find_duplicates, FindDuplicatesPayload
+
+    # Clustering scans the whole org, so it runs in the worker; this reads its last result
+    report = db.get(LeadDuplicateReport, org_id)
+    now = datetime.utcnow()
+    refreshing = report is None or (now - report.built_at).total_seconds() > settings.DEDUP_REPORT_MAX_AGE_SECONDS
+    if refreshing:
+        find_duplicates.enqueue(FindDuplicatesPayload(org_id=org_id, requested_at=now), org_id=org_id)
+    return DuplicateReportResponse(
+        clusters=live_clusters(db, org_id, report.clusters, limit) if report else [],
+        built_at=report.built_at if report else None,
+        refreshing=refreshing,
     )
 
+@leads_router.post("/duplicates/reindex", response_model=TaskResponse, status_code=202)
+def reindex_duplicate_keys(user: User = Depends(get_current_user)):
+    from app.workers.tasks import reindex_match_keys, ReindexMatchKeysPayload
+
+    job = reindex_match_keys.enqueue(ReindexMatchKeysPayload(org_id=user.org_id), org_id=user.org_id)
+    return _task_to_response(job)
+
+@leads_router.post("/merge", response_model=LeadResponse)
+def merge_duplicate_leads(data: MergeLeadsRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    duplicate_ids = [i for i in data.duplicate_ids if i != data.primary_id]
+    leads = db.query(Lead).filter(
+        Lead.org_id == user.org_id,
+        Lead.id.in_([data.primary_id] + duplicate_ids)
+    ).all()
+    by_id = {lead.id: lead for lead in leads}
+    if data.primary_id not in by_id or any(i not in by_id for i in duplicate_ids):
+        raise HTTPException(status_code=404, detail="العميل المحتمل غير موجود")
+
+    primary = merge_leads(db, by_id[data.primary_id], [by_id[i] for i in duplicate_ids])
+    db.commit()
+    get_write_behind().log_activity(
+        org_id=user.org_id,
+        user_id=user.id,
+        action="lead.merged",
+        entity_type="lead",
+        entity_id=primary.id,
+        details={"merged_ids": [str(i) for i in duplicate_ids]}
+    )
+    db.refresh(primary)
+    return _lead_to_response(primary)
+
 @leads_router.get("/{lead_id}", response_model=LeadResponse)
-def get_lead(lead_id: UUID, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    lead = db.query(Lead).filter(Lead.id == lead_id, Lead.org_id == user.org_id).first()
+def get_lead(lead_id: UUID, org_id: UUID = Depends(get_current_org_id), db: Session = Depends(get_read_db)):
+    lead = db.query(Lead).filter(Lead.id == lead_id, Lead.org_id == org_id).first()
     if not lead:
         raise HTTPException(status_code=404, detail="العميل المحتمل غير موجود")
     return _lead_to_response(lead)
 
+@leads_router.get("/{lead_id}/timeline", response_model=LeadTimeline)
+def get_lead_timeline(
+    lead_id: UUID,
+    request: Request,
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    org_id: UUID = Depends(get_current_org_id),
+    db: Session = Depends(get_read_db)
+):
+    # Same queries however long the lead's history: the lead, its version, then
+    # one page each of messages (replies in one more) and activity, and campaigns
+    lead = db.query(Lead).filter(Lead.id == lead_id, Lead.org_id == org_id).first()
+    if not lead:
+        raise HTTPException(status_code=404, detail="العميل المحتمل غير موجود")
+
+    etag = _lead_timeline_etag(request, db, lead)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
+    messages = db.query(Message).options(selectinload(Message.replies)).filter(
+        Message.org_id == org_id, Message.lead_id == lead_id
+    )
+    activities = db.query(ActivityLog).filter(
+        ActivityLog.org_id == org_id, ActivityLog.entity_type == "lead", ActivityLog.entity_id == lead_id
+    )
+    if cursor:
+        created_at, row_id = _decode_cursor(cursor)
+        messages = messages.filter(tuple_(Message.created_at, Message.id) < (created_at, row_id))
+        activities = activities.filter(
+            ActivityLog.created_at <= created_at,
+            tuple_(ActivityLog.created_at, ActivityLog.id) < (created_at, row_id)
+        )
+
+    # The next limit + 1 of each stream hold the merged page and whether more follow
+    rows = messages.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1).all()
+    rows += activities.order_by(ActivityLog.created_at.desc(), ActivityLog.id.desc()).limit(limit + 1).all()
+    rows.sort(key=lambda row: (row.created_at, row.id), reverse=True)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    campaigns = db.query(Campaign).filter(
+        Campaign.org_id == org_id,
+        Campaign.id.in_(select(Message.campaign_id).where(Message.org_id == org_id, Message.lead_id == lead_id))
+    ).order_by(Campaign.created_at.desc()).all()
+
+    return negotiated(request, LeadTimeline(
+        lead=_lead_to_response(lead),
+        campaigns=[TimelineCampaign(id=str(c.id), name=c.name, status=c.status) for c in campaigns],
+        items=[
+            TimelineItem(kind="message", created_at=row.created_at.isoformat(), message=_timeline_message(row))
+            if isinstance(row, Message) else
+            TimelineItem(kind="activity", created_at=row.created_at.isoformat(), activity=_activity_to_item(row))
+            for row in rows
+        ],
+        next_cursor=_encode_cursor(rows[-1]) if has_more else None
+    ), response)
+
+def _lead_timeline_etag(request: Request, db: Session, lead: Lead) -> str:
+    """Weak ETag from everything the timeline shows, reduced to counts and
+    high-water marks in one round trip. Messages, replies, activity and campaigns
+    are written from workers and webhooks too, so no single collection version
+    covers them."""
+    lead_messages = (Message.org_id == lead.org_id, Message.lead_id == lead.id)
+    version = db.execute(select(
+        select(func.count()).where(*lead_messages).scalar_subquery(),
+        select(func.max(Message.updated_at)).where(*lead_messages).scalar_subquery(),
+        select(func.count()).select_from(MessageReply).join(Message, Message.id == MessageReply.message_id)
+        .where(*lead_messages).scalar_subquery(),
+        select(func.count()).where(
+            ActivityLog.org_id == lead.org_id, ActivityLog.entity_type == "lead", ActivityLog.entity_id == lead.id
+        ).scalar_subquery(),
+        select(func.max(Campaign.updated_at)).where(
+            Campaign.org_id == lead.org_id, Campaign.id.in_(select(Message.campaign_id).where(*lead_messages))
+        ).scalar_subquery()
+    )).one()
+    tag = f"lead-timeline:{lead.id}:{lead.updated_at}:{tuple(version)}:{request.url.query}:{response_format(request)}"
+    return f'W/"{hashlib.sha256(tag.encode()).hexdigest()[:32]}"'
+
+def _timeline_message(message: Message) -> TimelineMessage:
+    return TimelineMessage(
+        id=str(message.id),
+        campaign_id=str(message.campaign_id) if message.campaign_id else None,
+        channel=message.channel,
+        subject=message.subject,
+        body=message.body,
+        status=message.status,
+        ai_generated=message.ai_generated or False,
+        sent_at=message.sent_at.isoformat() if message.sent_at else None,
+        delivered_at=message.delivered_at.isoformat() if message.delivered_at else None,
+        opened_at=message.opened_at.isoformat() if message.opened_at else None,
+        clicked_at=message.clicked_at.isoformat() if message.clicked_at else None,
+        replied_at=message.replied_at.isoformat() if message.replied_at else None,
+        replies=[
+            TimelineReply(
+                id=str(r.id),
+                from_address=r.from_address,
+                body=r.body,
+                received_at=r.received_at.isoformat()
+            )
+            for r in sorted(message.replies, key=lambda r: r.received_at)
+        ]
+    )
+
 @leads_router.post("", response_model=LeadResponse, status_code=201)
 def create_lead(data: LeadCreate, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     lead = Lead(
@@ -261,6 +601,8 @@ def create_lead(data: LeadCreate, user: User = Depends(get_current_user), db: Se
         **data.model_dump()
     )
     db.add(lead)
+    db.flush()
+    index_leads(db, user.org_id, [(lead.id, lead_fields(lead))])
     db.commit()
     db.refresh(lead)
     return _lead_to_response(lead)
@@ -275,10 +617,15 @@ def update_lead(lead_id: UUID, data: LeadUpdate, user: User = Depends(get_curren
     if "status" in update_data and update_data["status"]:
         update_data["status"] = update_data["status"].value
 
+    had_meeting = lead.status == MEETING_STATUS
     for key, value in update_data.items():
         if value is not None:
             setattr(lead, key, value)
+    if (lead.status == MEETING_STATUS) != had_meeting:
+        lead_meeting_changed(db, user.org_id, lead.id, booked=not had_meeting)
 
+    if any(f in update_data for f in IDENTITY_FIELDS):
+        index_leads(db, user.org_id, [(lead.id, lead_fields(lead))])
     db.commit()
     db.refresh(lead)
     return _lead_to_response(lead)
@@ -290,44 +637,25 @@ def delete_lead(lead_id: UUID, user: User = Depends(get_current_user), db: Sessi
         db.delete(lead)
         db.commit()
 
-@leads_router.post("/import")
+@leads_router.post("/import", response_model=TaskResponse, status_code=202)
 def import_leads(file: UploadFile = File(...), user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    from app.workers.tasks import import_leads as import_leads_task, ImportLeadsPayload
+
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="يجب أن يكون الملف CSV")
+    enforce_usage_limit(db, user.org_id, "leads_imported")
 
     content = file.file.read()
-    reader = csv.DictReader(io.StringIO(content.decode('utf-8-sig')))
-
-    imported, skipped = 0, 0
-    for row in reader:
-        if not row.get('company_name'):
-            continue
-
-        existing = db.query(Lead).filter(
-            Lead.org_id == user.org_id,
-            Lead.company_name == row['company_name']
-        ).first()
-
-        if existing:
-            skipped += 1
-            continue
-
-        lead = Lead(
-            org_id=user.org_id,
-            company_name=row['company_name'],
-            email=row.get('email'),
-            phone=row.get('phone'),
-            industry=row.get('industry'),
-            website=row.get('website'),
-            contact_name=row.get('contact_name'),
-            status="new",
-            score=0
-        )
-        db.add(lead)
-        imported += 1
+    try:
+        csv_text = content.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="يجب أن يكون الملف بترميز UTF-8")
 
-    db.commit()
-    return {"imported": imported, "skipped": skipped}
+    job = import_leads_task.enqueue(
+        ImportLeadsPayload(org_id=user.org_id, user_id=user.id, csv_text=csv_text),
+        org_id=user.org_id
+    )
+    return _task_to_response(job)
 
 def _lead_to_response(lead: Lead) -> LeadResponse:
     return LeadResponse(
@@ -362,14 +690,26 @@ def _lead_to_response(lead: Lead) -> LeadResponse:
 campaigns_router = APIRouter()
 
 @campaigns_router.get("", response_model=List[CampaignResponse])
-def list_campaigns(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    campaigns = db.query(Campaign).filter(Campaign.org_id == user.org_id).order_by(Campaign.created_at.desc()).all()
-    return [_campaign_to_response(c) for c in campaigns]
+def list_campaigns(request: Request, response: Response, org_id: UUID = Depends(get_current_org_id), db: Session = Depends(get_read_db)):
+    unchanged = conditional_list(request, response, org_id, "campaigns")
+    if unchanged:
+        return unchanged
+
+    campaigns = db.query(Campaign).filter(Campaign.org_id == org_id).order_by(Campaign.created_at.desc()).all()
+    replies = replies_by_campaign(db, org_id)
+    return [_campaign_to_response(c, replies.get(c.id, 0)) for c in campaigns]
 
 @campaigns_router.post("", response_model=CampaignResponse, status_code=201)
 def create_campaign(data: CampaignCreate, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     campaign_data = data.model_dump()
 
+    # Reject broken templates now rather than on the first run
+    try:
+        compile_template(data.email_subject_template)
+        compile_template(data.message_template)
+    except TemplateError as e:
+        raise HTTPException(status_code=400, detail=f"قالب الرسالة غير صالح: {e}")
+
     # Convert enums to values
     if "channels" in campaign_data and campaign_data["channels"]:
         campaign_data["channels"] = [c.value if hasattr(c, 'value') else c for c in campaign_data["channels"]]
@@ -388,14 +728,36 @@ def create_campaign(data: CampaignCreate, user: User = Depends(get_current_user)
     return _campaign_to_response(campaign)
 
 @campaigns_router.get("/{campaign_id}", response_model=CampaignResponse)
-def get_campaign(campaign_id: UUID, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    campaign = db.query(Campaign).filter(Campaign.id == campaign_id, Campaign.org_id == user.org_id).first()
+def get_campaign(campaign_id: UUID, org_id: UUID = Depends(get_current_org_id), db: Session = Depends(get_read_db)):
+    campaign = db.query(Campaign).filter(Campaign.id == campaign_id, Campaign.org_id == org_id).first()
     if not campaign:
         raise HTTPException(status_code=404, detail="الحملة غير موجودة")
-    return _campaign_to_response(campaign)
+    replies = replies_by_campaign(db, org_id, [campaign.id])
+    return _campaign_to_response(campaign, replies.get(campaign.id, 0))
+
+@campaigns_router.get("/{campaign_id}/funnel", response_model=CampaignFunnel)
+def get_campaign_funnel(
+    campaign_id: UUID,
+    request: Request,
+    response: Response,
+    org_id: UUID = Depends(get_current_org_id),
+    db: Session = Depends(get_read_db)
+):
+    # Every stats write marks "campaigns" changed, so the list version covers it;
+    # the ETag includes the path, so it never matches the list's
+    unchanged = conditional_list(request, response, org_id, "campaigns")
+    if unchanged:
+        return unchanged
+
+    exists = db.query(Campaign.id).filter(Campaign.id == campaign_id, Campaign.org_id == org_id).first()
+    if not exists:
+        raise HTTPException(status_code=404, detail="الحملة غير موجودة")
+    return negotiated(request, CampaignFunnel(campaign_id=str(campaign_id), **funnel(db, org_id, campaign_id)), response)
 
 @campaigns_router.post("/{campaign_id}/start")
 def start_campaign(campaign_id: UUID, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    from app.workers.tasks import run_campaign, RunCampaignPayload
+
     campaign = db.query(Campaign).filter(Campaign.id == campaign_id, Campaign.org_id == user.org_id).first()
     if not campaign:
         raise HTTPException(status_code=404, detail="الحملة غير موجودة")
@@ -403,6 +765,8 @@ def start_campaign(campaign_id: UUID, user: User = Depends(get_current_user), db
     campaign.status = "active"
     campaign.started_at = datetime.utcnow()
     db.commit()
+
+    run_campaign.enqueue(RunCampaignPayload(campaign_id=campaign.id), org_id=user.org_id)
     return {"message": "تم بدء الحملة"}
 
 @campaigns_router.post("/{campaign_id}/pause")
@@ -416,7 +780,9 @@ def pause_campaign(campaign_id: UUID, user: User = Depends(get_current_user), db
     db.commit()
     return {"message": "تم إيقاف الحملة"}
 
-def _campaign_to_response(campaign: Campaign) -> CampaignResponse:
+def _campaign_to_response(campaign: Campaign, replies: int = 0) -> CampaignResponse:
+    # Replies come from the funnel counters so the list and the funnel agree
+    # between reconcile runs; leads_contacted and meetings_booked count leads
     return CampaignResponse(
         id=str(campaign.id),
         org_id=str(campaign.org_id),
@@ -433,7 +799,7 @@ def _campaign_to_response(campaign: Campaign) -> CampaignResponse:
         message_template=campaign.message_template,
         status=campaign.status,
         leads_contacted=campaign.leads_contacted or 0,
-        replies_received=campaign.replies_received or 0,
+        replies_received=replies,
         meetings_booked=campaign.meetings_booked or 0,
         created_at=campaign.created_at.isoformat(),
         started_at=campaign.started_at.isoformat() if campaign.started_at else None,
@@ -445,13 +811,22 @@ def _campaign_to_response(campaign: Campaign) -> CampaignResponse:
 sources_router = APIRouter()
 
 @sources_router.get("/industries", response_model=List[IndustrySourceResponse])
-def list_industry_sources(db: Session = Depends(get_db)):
-    sources = db.query(IndustrySource).filter(IndustrySource.is_active == True).all()
-    return [_industry_source_to_response(s) for s in sources]
+def list_industry_sources(request: Request, db: Session = Depends(get_db)):
+    def load():
+        sources = db.query(IndustrySource).filter(IndustrySource.is_active == True).all()
+        return [_industry_source_to_response(s) for s in sources]
+
+    # Global catalog, the same for every caller
+    entry = get_reference_cache().get(("industry_sources",), load)
+    return cached_response(request, entry, cache_control="public, no-cache")
 
 @sources_router.get("", response_model=List[DataSourceResponse])
-def list_data_sources(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    sources = db.query(DataSource).filter(DataSource.org_id == user.org_id).all()
+def list_data_sources(request: Request, response: Response, org_id: UUID = Depends(get_current_org_id), db: Session = Depends(get_db)):
+    unchanged = conditional_list(request, response, org_id, "sources")
+    if unchanged:
+        return unchanged
+
+    sources = db.query(DataSource).filter(DataSource.org_id == org_id).all()
     return [_data_source_to_response(s) for s in sources]
 
 @sources_router.post("", response_model=DataSourceResponse, status_code=201)
@@ -486,6 +861,20 @@ def enable_industry_source(source_id: UUID, user: User = Depends(get_current_use
     db.refresh(source)
     return _data_source_to_response(source)
 
+@sources_router.post("/{source_id}/scrape", response_model=TaskResponse, status_code=202)
+def scrape_data_source(source_id: UUID, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    from app.workers.tasks import scrape_source, ScrapeSourcePayload
+
+    source = db.query(DataSource).filter(DataSource.id == source_id, DataSource.org_id == user.org_id).first()
+    if not source:
+        raise HTTPException(status_code=404, detail="المصدر غير موجود")
+    if source.source_type == "csv_upload":
+        raise HTTPException(status_code=400, detail="لا يمكن جلب بيانات هذا المصدر تلقائياً")
+    enforce_usage_limit(db, user.org_id, "leads_scraped")
+
+    job = scrape_source.enqueue(ScrapeSourcePayload(source_id=source.id), org_id=user.org_id)
+    return _task_to_response(job)
+
 def _industry_source_to_response(source: IndustrySource) -> IndustrySourceResponse:
     return IndustrySourceResponse(
         id=str(source.id),
@@ -521,8 +910,12 @@ def _data_source_to_response(source: DataSource) -> DataSourceResponse:
 integrations_router = APIRouter()
 
 @integrations_router.get("", response_model=List[IntegrationResponse])
-def list_integrations(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    integrations = db.query(Integration).filter(Integration.org_id == user.org_id).all()
+def list_integrations(request: Request, response: Response, org_id: UUID = Depends(get_current_org_id), db: Session = Depends(get_db)):
+    unchanged = conditional_list(request, response, org_id, "integrations")
+    if unchanged:
+        return unchanged
+
+    integrations = db.query(Integration).filter(Integration.org_id == org_id).all()
     return [_integration_to_response(i) for i in integrations]
 
 @integrations_router.post("", response_model=IntegrationResponse, status_code=201)
@@ -573,26 +966,19 @@ def _integration_to_response(integration: Integration) -> IntegrationResponse:
 dashboard_router = APIRouter()
 
 @dashboard_router.get("/stats", response_model=DashboardStats)
-def get_dashboard_stats(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    org_id = user.org_id
-
-    # Get leads stats
-    leads = db.query(Lead).filter(Lead.org_id == org_id).all()
-    total_leads = len(leads)
+def get_dashboard_stats(org_id: UUID = Depends(get_current_org_id), db: Session = Depends(get_read_db)):
 
+    # Aggregated in the database: index-only scans instead of loading every row
+    lead_status = func.coalesce(Lead.status, "new")
+    score_band = case((Lead.score >= 7, "high"), (Lead.score >= 4, "medium"), else_="low")
     leads_by_status = {}
     leads_by_score = {"high": 0, "medium": 0, "low": 0}
-    for lead in leads:
-        status = lead.status or "new"
-        leads_by_status[status] = leads_by_status.get(status, 0) + 1
-
-        score = lead.score or 0
-        if score >= 7:
-            leads_by_score["high"] += 1
-        elif score >= 4:
-            leads_by_score["medium"] += 1
-        else:
-            leads_by_score["low"] += 1
+    for status, band, count in db.query(lead_status, score_band, func.count()).filter(
+        Lead.org_id == org_id
+    ).group_by(lead_status, score_band):
+        leads_by_status[status] = leads_by_status.get(status, 0) + count
+        leads_by_score[band] += count
+    total_leads = sum(leads_by_status.values())
 
     # Get this month's leads
     month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
@@ -602,9 +988,10 @@ def get_dashboard_stats(user: User = Depends(get_current_user), db: Session = De
     ).count()
 
     # Get messages stats
-    messages = db.query(Message).filter(Message.org_id == org_id).all()
-    messages_sent = sum(1 for m in messages if m.status in ["sent", "delivered", "opened", "replied"])
-    replies = sum(1 for m in messages if m.status == "replied")
+    messages_sent, replies = db.query(
+        func.count().filter(Message.status.in_(["sent", "delivered", "opened", "replied"])),
+        func.count().filter(Message.status == "replied")
+    ).filter(Message.org_id == org_id).one()
 
     # Get active campaigns
     active_campaigns = db.query(Campaign).filter(
@@ -625,33 +1012,80 @@ def get_dashboard_stats(user: User = Depends(get_current_user), db: Session = De
         leads_by_score=leads_by_score
     )
 
-@dashboard_router.get("/activity", response_model=List[ActivityItem])
-def get_activity(limit: int = Query(20, le=50), user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    activities = db.query(ActivityLog).filter(
-        ActivityLog.org_id == user.org_id
-    ).order_by(ActivityLog.created_at.desc()).limit(limit).all()
-
-    return [
-        ActivityItem(
-            id=str(a.id),
-            action=a.action,
-            entity_type=a.entity_type,
-            entity_id=str(a.entity_id) if a.entity_id else None,
-            details=a.details,
-            created_at=a.created_at.isoformat()
+def _encode_cursor(row) -> str:
+    """Keyset cursor for feeds ordered newest first on (created_at, id)"""
+    raw = f"{row.created_at.isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="مؤشر الصفحة غير صالح")
+
+@dashboard_router.get("/activity", response_model=ActivityPage)
+def get_activity(
+    request: Request,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    action: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    org_id: UUID = Depends(get_current_org_id),
+    db: Session = Depends(get_read_db)
+):
+    # Newest first on (created_at, id); created_at bounds let the planner skip
+    # whole monthly partitions, and the ordered scan stops after `limit` rows
+    query = db.query(ActivityLog).filter(ActivityLog.org_id == org_id)
+    if action:
+        if action.endswith(".*"):
+            query = query.filter(ActivityLog.action.startswith(action[:-1], autoescape=True))
+        else:
+            query = query.filter(ActivityLog.action == action)
+    if entity_type:
+        query = query.filter(ActivityLog.entity_type == entity_type)
+    if since:
+        query = query.filter(ActivityLog.created_at >= since)
+    if until:
+        query = query.filter(ActivityLog.created_at < until)
+    if cursor:
+        created_at, activity_id = _decode_cursor(cursor)
+        query = query.filter(
+            ActivityLog.created_at <= created_at,
+            tuple_(ActivityLog.created_at, ActivityLog.id) < (created_at, activity_id)
         )
-        for a in activities
-    ]
+
+    activities = query.order_by(
+        ActivityLog.created_at.desc(), ActivityLog.id.desc()
+    ).limit(limit + 1).all()
+    has_more = len(activities) > limit
+    activities = activities[:limit]
+
+    return negotiated(request, ActivityPage(
+        items=[_activity_to_item(a) for a in activities],
+        next_cursor=_encode_cursor(activities[-1]) if has_more else None
+    ))
+
+def _activity_to_item(activity: ActivityLog) -> ActivityItem:
+    return ActivityItem(
+        id=str(activity.id),
+        action=activity.action,
+        entity_type=activity.entity_type,
+        entity_id=str(activity.entity_id) if activity.entity_id else None,
+        details=activity.details,
+        created_at=activity.created_at.isoformat()
+    )
 
 # ==================== AI ROUTES ====================
 ai_router = APIRouter()
 
-@ai_router.post("/generate-message", response_model=GenerateMessageResponse)
-def generate_message(data: GenerateMessageRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    from app.services.ai_service import get_ai_service
-
+def _generation_inputs(db: Session, user: User, lead_id: UUID):
+    """Lead and company profile as the dicts AIService expects"""
     # Get lead
-    lead = db.query(Lead).filter(Lead.id == data.lead_id, Lead.org_id == user.org_id).first()
+    lead = db.query(Lead).filter(Lead.id == lead_id, Lead.org_id == user.org_id).first()
     if not lead:
         raise HTTPException(status_code=404, detail="العميل المحتمل غير موجود")
 
@@ -674,19 +1108,15 @@ def generate_message(data: GenerateMessageRequest, user: User = Depends(get_curr
         "location": lead.location
     }
 
-    profile_dict = {
-        "company_name": profile.company_name,
-        "company_name_ar": profile.company_name_ar,
-        "value_proposition": profile.value_proposition,
-        "value_proposition_ar": profile.value_proposition_ar,
-        "target_audience": profile.target_audience,
-        "pain_points": profile.pain_points,
-        "differentiators": profile.differentiators,
-        "tone": profile.tone,
-        "language": profile.language,
-        "sdr_script": profile.sdr_script,
-        "sdr_script_ar": profile.sdr_script_ar
-    }
+    return lead_dict, profile_dict(profile)
+
+@ai_router.post("/generate-message", response_model=GenerateMessageResponse)
+def generate_message(data: GenerateMessageRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    from app.services.ai_service import get_ai_service
+
+    lead_dict, profile_dict = _generation_inputs(db, user, data.lead_id)
+
+    enforce_usage_limit(db, user.org_id, "ai_generations")
 
     # Generate message
     ai = get_ai_service()
@@ -697,19 +1127,68 @@ def generate_message(data: GenerateMessageRequest, user: User = Depends(get_curr
         custom_context=data.custom_context
     )
 
+    _record_generation(user, data, result.get("tokens_used", 0))
+
+    return GenerateMessageResponse(**result)
+
+@ai_router.post("/generate-message/stream")
+def generate_message_stream(data: GenerateMessageRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Same as /generate-message, streamed as server-sent events
+
+    event: subject  {"subject": "..."}   once, email only
+    event: token    {"text": "..."}      body deltas
+    event: done     GenerateMessageResponse
+    event: error    {"detail": "..."}
+    """
+    from app.services.ai_service import get_ai_service
+
+    lead_dict, profile_dict = _generation_inputs(db, user, data.lead_id)
+
+    enforce_usage_limit(db, user.org_id, "ai_generations")
+
+    ai = get_ai_service()
+    stream = ai.stream_outreach_message(
+        lead=lead_dict,
+        company_profile=profile_dict,
+        channel=data.channel.value,
+        custom_context=data.custom_context
+    )
+    # Opens the upstream stream here, so an unavailable AI is a 503 rather than a broken 200
+    first = next(stream)
+
+    def events():
+        try:
+            for event in itertools.chain([first], stream):
+                if event["event"] == "done":
+                    _record_generation(user, data, event["data"]["tokens_used"])
+                yield _sse(event["event"], event["data"])
+        except Exception:
+            logger.exception("Streaming generation failed")
+            yield _sse("error", {"detail": "تعذر إنشاء الرسالة، حاول مرة أخرى"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _record_generation(user: User, data: GenerateMessageRequest, tokens_used: int):
     # Log activity
-    activity = ActivityLog(
+    get_write_behind().log_activity(
         org_id=user.org_id,
         user_id=user.id,
         action="ai.message_generated",
         entity_type="lead",
         entity_id=data.lead_id,
-        details={"channel": data.channel.value, "tokens": result.get("tokens_used", 0)}
+        details={"channel": data.channel.value, "tokens": tokens_used}
     )
-    db.add(activity)
-    db.commit()
 
-    return GenerateMessageResponse(**result)
+    meter = get_usage_meter()
+    meter.record(user.org_id, "ai_generations")
+    meter.record(user.org_id, "ai_tokens_used", tokens_used)
 
 @ai_router.post("/score-lead", response_model=ScoreLeadResponse)
 def score_lead(data: ScoreLeadRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -738,14 +1217,110 @@ def score_lead(data: ScoreLeadRequest, user: User = Depends(get_current_user), d
 
     return ScoreLeadResponse(**result)
 
+@ai_router.post("/score-leads", response_model=TaskResponse, status_code=202)
+def score_leads(data: ScoreLeadsRequest, user: User = Depends(get_current_user)):
+    from app.workers.tasks import score_leads as score_leads_task, ScoreLeadsPayload
+
+    job = score_leads_task.enqueue(
+        ScoreLeadsPayload(org_id=user.org_id, lead_ids=data.lead_ids),
+        org_id=user.org_id
+    )
+    return _task_to_response(job)
+
 @ai_router.post("/analyze-response", response_model=AnalyzeResponseResponse)
-def analyze_response(data: AnalyzeResponseRequest, user: User = Depends(get_current_user)):
+def analyze_response(data: AnalyzeResponseRequest, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
     from app.services.ai_service import get_ai_service
 
+    enforce_usage_limit(db, user.org_id, "ai_generations")
+
     ai = get_ai_service()
     result = ai.analyze_response(data.message, data.context)
+    get_usage_meter().record(user.org_id, "ai_generations")
 
     return AnalyzeResponseResponse(**result)
 
+# ==================== WEBHOOK ROUTES ====================
+webhooks_router = APIRouter()
+
+@webhooks_router.post("/replies", response_model=InboundRepliesResponse, status_code=202)
+async def receive_replies(request: Request):
+    """Provider reply events, signed with X-Webhook-Signature: sha256=<hmac of body>
+
+    Only verifies and queues; matching, counters and analysis run in the worker.
+    """
+    from app.workers.tasks import IngestRepliesPayload, ingest_replies
+
+    if not settings.INBOUND_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="استقبال الردود غير مفعّل")
+
+    body = await request.body()
+    expected = "sha256=" + hmac.new(settings.INBOUND_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, request.headers.get("X-Webhook-Signature", "")):
+        raise HTTPException(status_code=401, detail="توقيع غير صالح")
+
+    try:
+        data = InboundRepliesRequest.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+
+    size = settings.REPLY_INGEST_BATCH_SIZE
+
+    def enqueue() -> List[str]:
+        return [
+            ingest_replies.enqueue(IngestRepliesPayload(events=data.events[start:start + size])).id
+            for start in range(0, len(data.events), size)
+        ]
+
+    # Pushing to a Redis queue is blocking I/O; keep it off the event loop
+    task_ids = await asyncio.to_thread(enqueue)
+    return InboundRepliesResponse(accepted=len(data.events), task_ids=task_ids)
+
+# ==================== TRACKING ROUTES ====================
+tracking_router = APIRouter()
+
+# Hits only verify the token and land in the in-memory buffer: no database work
+TRACKING_NO_CACHE = {"Cache-Control": "no-store, no-cache, must-revalidate, private", "Pragma": "no-cache"}
+
+@tracking_router.get("/o/{token}.gif", include_in_schema=False)
+async def track_open(token: str):
+    hit = read_token(token)
+    if hit:
+        get_tracker().record_open(*hit)
+    # The pixel either way: a broken image in the recipient's mail helps no one
+    return Response(content=PIXEL, media_type="image/gif", headers=TRACKING_NO_CACHE)
+
+@tracking_router.get("/c/{token}", include_in_schema=False)
+async def track_click(token: str, u: str):
+    hit = read_token(token, url=u)
+    # Only URLs signed into the token, so this never becomes an open redirect
+    if not hit or urlsplit(u).scheme not in ("http", "https"):
+        raise HTTPException(status_code=404, detail="الرابط غير صالح")
+    get_tracker().record_click(*hit)
+    return RedirectResponse(u, status_code=302, headers=TRACKING_NO_CACHE)
+
+# ==================== TASK ROUTES ====================
+tasks_router = APIRouter()
+
+@tasks_router.get("/{task_id}", response_model=TaskResponse)
+def get_task(task_id: str, user: User = Depends(get_current_user)):
+    from app.workers.queue import get_queue
+
+    job = get_queue().get(task_id)
+    if not job or job.org_id != str(user.org_id):
+        raise HTTPException(status_code=404, detail="المهمة غير موجودة")
+    return _task_to_response(job)
+
+def _task_to_response(job) -> TaskResponse:
+    return TaskResponse(
+        id=job.id,
+        name=job.name,
+        status=job.status,
+        attempts=job.attempts,
+        result=job.result,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at
+    )
+
 # Export all routers
 router = APIRouter()
@@ -18,15 +18,37 @@ class Settings(BaseSettings):
     
     # Database (Railway PostgreSQL)
     DATABASE_URL: str = "postgresql://localhost/faris_ai"
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    # Connections all web processes may hold together (0 = each uses the pool above)
+    DATABASE_MAX_CONNECTIONS: int = 0
+    # Read replica (empty = all reads on the primary)
+    DATABASE_READ_URL: str = ""
+    READ_STICKY_SECONDS: float = 10.0  # reads stay on the primary this long after an org writes
+    READ_STICKY_BACKEND: str = "memory"  # memory, redis (needed with several web processes or a task worker)
+    READ_REPLICA_MAX_LAG_SECONDS: float = 5.0  # beyond this, reads go to the primary
     
     # Auth
     JWT_SECRET: str = "jwt-secret-change-me"
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRY_HOURS: int = 24
+    USER_CACHE_TTL_SECONDS: float = 30.0  # a deleted or moved user keeps cached read access this long at most
     
     # AI
     ANTHROPIC_API_KEY: str = ""
     AI_MODEL: str = "claude-sonnet-4-20250514"
+    ANTHROPIC_BASE_URL: str = ""  # e.g. http://127.0.0.1:8089 for scripts/fake_anthropic.py
+    AI_ATTEMPT_TIMEOUT_SECONDS: float = 30.0
+    AI_DEADLINE_SECONDS: float = 60.0
+    AI_MAX_ATTEMPTS: int = 3
+    AI_RETRY_BASE_SECONDS: float = 0.5
+    AI_RETRY_MAX_SECONDS: float = 8.0
+    AI_BREAKER_FAILURE_THRESHOLD: int = 5
+    AI_BREAKER_RESET_SECONDS: float = 30.0
+    AI_HEDGE_ENABLED: bool = False
+    AI_HEDGE_MIN_DELAY_SECONDS: float = 2.0
+    AI_KEEPALIVE_SECONDS: float = 60.0
+    AI_HEDGE_POOL_SIZE: int = 16
     
     # Email
     RESEND_API_KEY: str = ""
@@ -36,11 +58,115 @@ class Settings(BaseSettings):
     # Redis (for background jobs)
     REDIS_URL: str = "redis://localhost:6379"
     
+    # Background jobs
+    TASK_QUEUE_BACKEND: str = "memory"  # memory (in-process workers), redis
+    WORKER_CONCURRENCY: int = 4
+    TASK_MAX_RETRIES: int = 3
+    TASK_RETRY_BASE_SECONDS: float = 2.0
+    TASK_RETRY_MAX_SECONDS: float = 300.0
+    TASK_RESULT_TTL_SECONDS: int = 86400
+    TASK_VISIBILITY_TIMEOUT_SECONDS: int = 120  # lease on a running job, renewed by its worker every third of it
+    
+    # Write-behind (activity log, last login)
+    WRITE_BEHIND_FLUSH_INTERVAL_SECONDS: float = 2.0
+    WRITE_BEHIND_BATCH_SIZE: int = 500
+    WRITE_BEHIND_MAX_PENDING: int = 50000
+    
+    # Scraper
+    SCRAPER_PER_HOST_CONCURRENCY: int = 2
+    SCRAPER_POLITENESS_DELAY_SECONDS: float = 1.0
+    SCRAPER_TIMEOUT_SECONDS: float = 20.0
+    SCRAPER_BATCH_SIZE: int = 200
+    
+    # Lead deduplication
+    DEDUP_MATCH_THRESHOLD: float = 0.85
+    DEDUP_MAX_BLOCK_SIZE: int = 200
+    DEDUP_REPORT_MAX_CLUSTERS: int = 500  # clusters kept per stored report
+    DEDUP_REPORT_MAX_AGE_SECONDS: int = 3600  # older reports are rebuilt when read
+    
+    # Bulk lead operations
+    BULK_CHUNK_SIZE: int = 5000
+    
+    # Inbound replies
+    INBOUND_WEBHOOK_SECRET: str = ""
+    REPLY_INGEST_BATCH_SIZE: int = 500
+    REPLY_ANALYSIS_BATCH_SIZE: int = 10
+    REPLY_ANALYSIS_CONCURRENCY: int = 4
+    
+    # Open/click tracking (links signed with TRACKING_SECRET, or a key derived from JWT_SECRET)
+    TRACKING_ENABLED: bool = True  # campaign messages get tracked links, and email the open pixel
+    TRACKING_SECRET: str = ""
+    TRACKING_BASE_URL: str = "http://localhost:8000"
+    TRACKING_FLUSH_INTERVAL_SECONDS: float = 2.0
+    TRACKING_BATCH_SIZE: int = 1000
+    TRACKING_MAX_PENDING: int = 200000
+    
+    # Activity log partitions
+    ACTIVITY_PARTITIONS_AHEAD: int = 3
+    ACTIVITY_DETACH_ONLY: bool = False
+    ACTIVITY_MAINTENANCE_INTERVAL_SECONDS: int = 86400
+    ACTIVITY_DELETE_BATCH_SIZE: int = 5000
+    
+    # Serving (gunicorn with uvicorn workers, see gunicorn.conf.py)
+    WEB_WORKERS: int = 0  # 0 = one per usable CPU, capped at WEB_WORKERS_MAX
+    WEB_WORKERS_MAX: int = 8
+    WEB_TIMEOUT_SECONDS: int = 120
+    WEB_GRACEFUL_TIMEOUT_SECONDS: int = 30
+    WEB_KEEPALIVE_SECONDS: int = 5
+    WEB_MAX_REQUESTS: int = 20000  # recycle a worker after this many requests (0 = never)
+    WEB_MAX_REQUESTS_JITTER: int = 2000
+    
+    # Health checks (probes read the cached result; thresholds decide degraded/unready)
+    HEALTH_CHECK_INTERVAL_SECONDS: float = 5.0
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = 3.0
+    HEALTH_STALE_AFTER_SECONDS: float = 30.0
+    HEALTH_LIVENESS_STALL_SECONDS: float = 120.0
+    HEALTH_DB_LATENCY_DEGRADED_MS: float = 250.0
+    HEALTH_POOL_SATURATION_DEGRADED: float = 0.8
+    HEALTH_POOL_SATURATION_DOWN: float = 1.0
+    HEALTH_QUEUE_DEPTH_DEGRADED: int = 1000
+    HEALTH_AI_PROBE_INTERVAL_SECONDS: float = 300.0  # while the AI breaker is closed; every round otherwise
+    
+    # Startup warmup
+    WARMUP_DB_CONNECTIONS: int = 2
+    WARMUP_AI_CLIENT: bool = True
+    
+    # Response compression (brotli needs the optional brotli package)
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    
+    # Campaign runner
+    CAMPAIGN_RUN_INTERVAL_SECONDS: int = 3600
+    CAMPAIGN_RENDER_BATCH_SIZE: int = 2000
+    CAMPAIGN_AI_BATCH_SIZE: int = 10  # leads generated per commit
+    CAMPAIGN_STATS_RECONCILE_INTERVAL_SECONDS: int = 3600
+    CAMPAIGN_STATS_RECONCILE_BATCH_SIZE: int = 50
+    
+    # Reference data cache (per process; other workers converge within the TTL)
+    REFERENCE_CACHE_TTL_SECONDS: float = 300.0
+    PROFILE_CACHE_TTL_SECONDS: float = 30.0
+    
+    # List ETag versions (use redis when more than one process serves or writes)
+    COLLECTION_VERSION_BACKEND: str = "memory"  # memory (one web process with in-process tasks), redis
+    
     # Frontend
     FRONTEND_URL: str = "http://localhost:3000"
     
-    # Rate limits
+    # Rate limits (per user per minute; orgs get ORG_MULTIPLIER x)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # memory, redis
     RATE_LIMIT_PER_MINUTE: int = 60
+    RATE_LIMIT_WRITE_PER_MINUTE: int = 30
+    RATE_LIMIT_AI_PER_MINUTE: int = 10
+    RATE_LIMIT_AUTH_PER_MINUTE: int = 10
+    RATE_LIMIT_ORG_MULTIPLIER: int = 5
+    
+    # Usage metering (buffered increments, cached plan limits)
+    USAGE_FLUSH_INTERVAL_SECONDS: float = 5.0
+    USAGE_FLUSH_MAX_PENDING: int = 500
+    USAGE_CACHE_TTL_SECONDS: float = 30.0
     
     class Config:
         env_file = ".env"
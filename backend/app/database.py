@@ -9,16 +9,28 @@ from sqlalchemy.ext.declarative import declarative_base
 from typing import Generator
 
 from app.config import settings
+from app.serving import pool_limits, process_count
 
 # SQLAlchemy setup for Railway PostgreSQL
+pool_size, max_overflow = pool_limits(process_count())
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10
+    pool_size=pool_size,
+    max_overflow=max_overflow
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Optional read replica for read-heavy routes (see services/read_routing.py)
+read_engine = create_engine(
+    settings.DATABASE_READ_URL,
+    pool_pre_ping=True,
+    pool_size=pool_size,
+    max_overflow=max_overflow
+) if settings.DATABASE_READ_URL else None
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine) if read_engine else None
 Base = declarative_base()
 
 
@@ -3,10 +3,16 @@ Faris AI SaaS - FastAPI Backend
 Multi-tenant AI-powered sales outreach platform
 """
 
-from fastapi import FastAPI, Depends, HTTPException, status
+import time
+
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, Depends, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from contextlib import asynccontextmanager
+import asyncio
 import os
 from dotenv import load_dotenv
 
@@ -21,17 +27,68 @@ from app.api import (
     sources_router,
     integrations_router,
     dashboard_router,
-    ai_router
+    ai_router,
+    tasks_router,
+    webhooks_router,
+    tracking_router
 )
+from app.config import settings
+from app.middleware import CompressionMiddleware, FirstRequestMiddleware, RateLimitMiddleware
+from app.serving import warn_process_local_state
+from app.services.call_policy import AIUnavailable, get_call_policy
+from app.services.health import get_health_monitor
+from app.services.read_routing import get_read_router
+from app.services.tracking import get_tracker
+from app.services.usage_service import get_usage_meter
+from app.services.warmup import get_startup_timer, warm_ai_client_in_background, warm_database
+from app.services.write_behind import get_write_behind
+from app.workers import get_inprocess_worker
+
+startup_timer = get_startup_timer()
+startup_timer.begin(_import_started)
+startup_timer.record("imports", _import_started)
 
 # Lifespan for startup/shutdown
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("Faris AI SaaS Backend starting...")
+    warn_process_local_state()
+    started = time.perf_counter()
+    usage_meter = get_usage_meter()
+    usage_meter.start()
+    write_behind = get_write_behind()
+    write_behind.start()
+    tracker = get_tracker()
+    tracker.start()
+    worker = get_inprocess_worker()
+    if worker:
+        worker.start()
+    startup_timer.record("background_services", started)
+
+    # First requests reuse these instead of paying for connects and handshakes
+    started = time.perf_counter()
+    opened = await asyncio.to_thread(warm_database, settings.WARMUP_DB_CONNECTIONS)
+    startup_timer.record("database_pool", started)
+    if settings.WARMUP_AI_CLIENT and settings.ANTHROPIC_API_KEY:
+        warm_ai_client_in_background()
+
+    # First round before reporting ready, so the readiness probe has real data
+    health = get_health_monitor()
+    await asyncio.to_thread(health.run_checks)
+    health.start()
+
+    startup_timer.ready()
+    print(f"Ready ({opened} database connections warm): {startup_timer.report()}")
     yield
     # Shutdown
     print("Faris AI SaaS Backend shutting down...")
+    health.stop()
+    if worker:
+        worker.stop()
+    usage_meter.stop()
+    write_behind.stop()
+    tracker.stop()
 
 # Create FastAPI app
 app = FastAPI(
@@ -44,6 +101,15 @@ app = FastAPI(
     openapi_url="/api/openapi.json"
 )
 
+# Compression innermost, so rate-limit and CORS headers wrap the encoded body
+app.add_middleware(CompressionMiddleware)
+
+# Rate limiting (added before CORS so 429s still carry CORS headers)
+app.add_middleware(RateLimitMiddleware)
+
+# Added after rate limiting so it wraps it: sees every response, including 429s
+app.add_middleware(FirstRequestMiddleware)
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -68,6 +134,19 @@ app.include_router(sources_router, prefix="/api/sources", tags=["Data Sources"])
 app.include_router(integrations_router, prefix="/api/integrations", tags=["Integrations"])
 app.include_router(dashboard_router, prefix="/api/dashboard", tags=["Dashboard"])
 app.include_router(ai_router, prefix="/api/ai", tags=["AI"])
+app.include_router(tasks_router, prefix="/api/tasks", tags=["Background Tasks"])
+app.include_router(webhooks_router, prefix="/api/webhooks", tags=["Webhooks"])
+app.include_router(tracking_router, prefix="/api/t", tags=["Tracking"])
+
+
+@app.exception_handler(AIUnavailable)
+async def ai_unavailable_handler(request: Request, exc: AIUnavailable):
+    # Upstream AI is failing or the breaker is open: fail fast instead of piling up threads
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "خدمة الذكاء الاصطناعي غير متاحة مؤقتاً، حاول بعد قليل"},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))}
+    )
 
 
 @app.get("/")
@@ -83,22 +162,55 @@ async def root():
 
 @app.get("/api/status")
 async def health_check():
-    """Health check endpoint"""
+    """Health report from the last background check round; never touches dependencies"""
+    readiness = get_health_monitor().readiness()
+    checks = readiness["checks"]
+
+    def service(name: str) -> str:
+        state = checks.get(name, {}).get("status")
+        return {"ok": "operational", "disabled": "disabled", None: "unknown"}.get(state, state)
+
     return {
-        "status": "healthy",
+        "status": readiness["status"],
         "services": {
             "api": "operational",
-            "database": "operational",
-            "ai": "operational"
-        }
+            "database": service("database"),
+            "pool": service("pool"),
+            "queue": service("queue"),
+            "ai": service("ai"),
+            "replica": service("replica"),
+        },
+        "checks": checks,
+        "checked_seconds_ago": readiness.get("age_seconds"),
+        "ai": get_call_policy().stats(),
+        "write_behind": get_write_behind().stats(),
+        "tracking": get_tracker().stats(),
+        "read_routing": get_read_router().stats(),
+        "startup": startup_timer.report()
     }
 
 
+@app.get("/api/live")
+async def liveness():
+    """Liveness probe: fails only when the process should be restarted"""
+    report = get_health_monitor().liveness()
+    return JSONResponse(status_code=200 if report["alive"] else 503, content=report)
+
+
+@app.get("/api/ready")
+async def readiness():
+    """Readiness probe: fails while the database is unreachable or the pool is exhausted"""
+    report = get_health_monitor().readiness()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report,
+                        headers={"Cache-Control": "no-store"})
+
+
 if __name__ == "__main__":
+    # Development server; production runs gunicorn -c gunicorn.conf.py
     import uvicorn
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=int(os.getenv("PORT", 8000)),
-        reload=True
+        reload=settings.DEBUG
     )
@@ -0,0 +1,9 @@
+"""
+Middleware Package
+"""
+
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.rate_limit import RateLimitMiddleware
+from app.middleware.startup_timing import FirstRequestMiddleware
+
+__all__ = ["CompressionMiddleware", "FirstRequestMiddleware", "RateLimitMiddleware"]
@@ -0,0 +1,156 @@
+"""
+Compression Middleware - gzip/brotli response bodies above a size threshold
+Picks br (when the brotli package is installed) or gzip from Accept-Encoding.
+Small bodies go out untouched; streamed bodies (exports) are compressed chunk
+by chunk with a sync flush so the client keeps receiving data. Server-sent
+events and already-compressed formats are never touched.
+"""
+
+from typing import List, Optional, Tuple
+import zlib
+
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only without it
+    brotli = None
+
+# Streams that must reach the client unbuffered, or bodies compressed already
+EXCLUDED_TYPES = (
+    b"text/event-stream",
+    b"application/vnd.apache.parquet",
+    b"application/gzip",
+    b"application/zip",
+    b"image/",
+    b"video/",
+    b"audio/",
+)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """br or gzip per the client's q-values, None for identity"""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            weights[name.strip()] = q
+
+    wildcard = weights.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best = max(candidates, key=lambda name: weights.get(name, wildcard))
+    return best if weights.get(best, wildcard) > 0 else None
+
+
+class _Encoder:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            # wbits 31: gzip container
+            self._zlib = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _compressed_headers(headers: List[Tuple[bytes, bytes]], encoding: str, length: Optional[int]):
+    out = []
+    vary = None
+    for key, value in headers:
+        lower = key.lower()
+        if lower == b"content-length":
+            continue
+        if lower == b"vary":
+            vary = value
+            continue
+        if lower == b"etag" and not value.startswith(b"W/"):
+            # The bytes differ from the identity representation; keep it matchable but weak
+            value = b"W/" + value
+        out.append((key, value))
+    out.append((b"content-encoding", encoding.encode()))
+    out.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+    if length is not None:
+        out.append((b"content-length", str(length).encode()))
+    return out
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = settings.COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.COMPRESSION_ENABLED:
+            return await self.app(scope, receive, send)
+
+        accept = _header(scope.get("headers", []), b"accept-encoding")
+        encoding = choose_encoding(accept.decode("latin-1")) if accept else None
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, encoder, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+
+            if encoder is None:
+                headers = list(start.get("headers", []))
+                content_type = _header(headers, b"content-type") or b""
+                if (
+                    start["status"] < 200 or start["status"] in (204, 304)
+                    or _header(headers, b"content-encoding") is not None
+                    or any(content_type.startswith(t) for t in EXCLUDED_TYPES)
+                    or (not more and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start)
+                    return await send(message)
+
+                encoder = _Encoder(encoding)
+                if not more:
+                    compressed = encoder.chunk(body) + encoder.finish()
+                    start["headers"] = _compressed_headers(headers, encoding, len(compressed))
+                    await send(start)
+                    return await send({"type": "http.response.body", "body": compressed})
+                start["headers"] = _compressed_headers(headers, encoding, None)
+                await send(start)
+
+            data = encoder.chunk(body) if body else b""
+            if not more:
+                data += encoder.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,270 @@
+"""
+Rate Limiting - Per-org and per-user GCRA limits
+Pure ASGI middleware so the hot path stays a dict lookup and a JWT decode.
+
+Every request is classified into a route class (auth, ai, write, read) and
+checked against two GCRA buckets: one for the caller and a wider one for the
+caller's organization. Both must admit the request. The in-process backend
+is exact for a single worker and splits the limits evenly across gunicorn
+workers; use the Redis backend when exact limits matter across workers or
+instances.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import json
+import logging
+import math
+import threading
+import time
+
+import jwt
+
+from app.config import settings
+from app.serving import per_process_share
+
+logger = logging.getLogger(__name__)
+
+PERIOD_SECONDS = 60.0
+
+# Webhooks are signature-checked and only enqueue, and providers deliver in bursts;
+# tracking hits come from mail clients and image proxies, not from our users
+EXEMPT_PATHS = (
+    "/api/status", "/api/live", "/api/ready", "/api/docs", "/api/redoc", "/api/openapi.json",
+    "/api/webhooks/", "/api/t/",
+)
+AUTH_PATHS = ("/api/auth/login", "/api/auth/register")
+
+# (key, limit, period)
+Bucket = Tuple[str, int, float]
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float
+    retry_after: float = 0.0
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """Map a request to its limit class, or None if it is not limited"""
+    if method == "OPTIONS" or path == "/" or path.startswith(EXEMPT_PATHS):
+        return None
+    if path.startswith(AUTH_PATHS):
+        return "auth"
+    if path.startswith("/api/ai/"):
+        return "ai"
+    if method in ("GET", "HEAD"):
+        return "read"
+    return "write"
+
+
+def class_limits() -> Dict[str, int]:
+    limits = {
+        "auth": settings.RATE_LIMIT_AUTH_PER_MINUTE,
+        "ai": settings.RATE_LIMIT_AI_PER_MINUTE,
+        "write": settings.RATE_LIMIT_WRITE_PER_MINUTE,
+        "read": settings.RATE_LIMIT_PER_MINUTE,
+    }
+    if settings.RATE_LIMIT_BACKEND != "redis":
+        # Each worker only sees its share of the traffic, so it enforces its share of the limit
+        limits = {name: per_process_share(limit) for name, limit in limits.items()}
+    return limits
+
+
+# ==================== BACKENDS ====================
+
+class MemoryRateLimiter:
+    """In-process GCRA; stores one float (theoretical arrival time) per key"""
+
+    SWEEP_EVERY = 10000
+
+    def __init__(self):
+        self._tats: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+
+    async def hit(self, buckets: List[Bucket]) -> RateLimitResult:
+        now = time.monotonic()
+        with self._lock:
+            self._hits += 1
+            if self._hits % self.SWEEP_EVERY == 0:
+                self._tats = {k: v for k, v in self._tats.items() if v > now}
+
+            new_tats = []
+            result = None
+            for key, limit, period in buckets:
+                new_tat, bucket_result = _gcra(self._tats.get(key, now), now, limit, period)
+                new_tats.append(new_tat)
+                result = _tighter(result, bucket_result)
+
+            if result.allowed:
+                for (key, _, _), new_tat in zip(buckets, new_tats):
+                    self._tats[key] = new_tat
+            return result
+
+
+class RedisRateLimiter:
+    """GCRA evaluated atomically in Redis so all workers share the buckets"""
+
+    # KEYS: bucket keys. ARGV: limit, period pairs.
+    # Returns {allowed, limit, remaining, reset_after, retry_after} of the tightest bucket.
+    SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local allowed = 1
+local best_limit, best_remaining, best_reset, retry_after = 0, nil, 0, 0
+local new_tats = {}
+for i, key in ipairs(KEYS) do
+  local limit = tonumber(ARGV[2 * i - 1])
+  local period = tonumber(ARGV[2 * i])
+  local interval = period / limit
+  local tat = tonumber(redis.call('GET', key) or now)
+  if tat < now then tat = now end
+  local new_tat = tat + interval
+  local allow_at = new_tat - period
+  local remaining
+  if now < allow_at then
+    allowed = 0
+    retry_after = math.max(retry_after, allow_at - now)
+    remaining = 0
+  else
+    remaining = math.floor((period - (new_tat - now)) / interval)
+  end
+  new_tats[i] = new_tat
+  if best_remaining == nil or remaining < best_remaining then
+    best_limit, best_remaining, best_reset = limit, remaining, new_tat - now
+  end
+end
+if allowed == 1 then
+  for i, key in ipairs(KEYS) do
+    redis.call('SET', key, tostring(new_tats[i]), 'PX', math.ceil((new_tats[i] - now) * 1000))
+  end
+end
+return {allowed, best_limit, best_remaining, tostring(best_reset), tostring(retry_after)}
+"""
+
+    def __init__(self, url: str = settings.REDIS_URL, prefix: str = "faris:rl:"):
+        import redis.asyncio as aioredis
+
+        self.prefix = prefix
+        self._redis = aioredis.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    async def hit(self, buckets: List[Bucket]) -> RateLimitResult:
+        keys = [self.prefix + key for key, _, _ in buckets]
+        args = []
+        for _, limit, period in buckets:
+            args.extend([limit, period])
+        allowed, limit, remaining, reset_after, retry_after = await self._script(keys=keys, args=args)
+        return RateLimitResult(
+            allowed=bool(allowed),
+            limit=int(limit),
+            remaining=int(remaining),
+            reset_after=float(reset_after),
+            retry_after=float(retry_after),
+        )
+
+
+def _gcra(tat: float, now: float, limit: int, period: float) -> Tuple[float, RateLimitResult]:
+    interval = period / limit
+    tat = max(tat, now)
+    new_tat = tat + interval
+    allow_at = new_tat - period
+    if now < allow_at:
+        return tat, RateLimitResult(False, limit, 0, tat - now, allow_at - now)
+    remaining = int((period - (new_tat - now)) / interval)
+    return new_tat, RateLimitResult(True, limit, remaining, new_tat - now)
+
+
+def _tighter(current: Optional[RateLimitResult], other: RateLimitResult) -> RateLimitResult:
+    if current is None:
+        return other
+    allowed = current.allowed and other.allowed
+    retry_after = max(current.retry_after, other.retry_after)
+    best = other if other.remaining < current.remaining else current
+    return RateLimitResult(allowed, best.limit, best.remaining, best.reset_after, retry_after)
+
+
+def create_rate_limiter():
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimiter()
+    return MemoryRateLimiter()
+
+
+# ==================== MIDDLEWARE ====================
+
+class RateLimitMiddleware:
+    """Applies per-user and per-org limits and sets RateLimit-* headers"""
+
+    def __init__(self, app, limiter=None):
+        self.app = app
+        self.limiter = limiter or create_rate_limiter()
+        self.limits = class_limits()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.RATE_LIMIT_ENABLED:
+            return await self.app(scope, receive, send)
+
+        klass = route_class(scope["method"], scope["path"])
+        if klass is None:
+            return await self.app(scope, receive, send)
+
+        try:
+            result = await self.limiter.hit(self._buckets(scope, klass))
+        except Exception:
+            # Never take the API down because the limiter backend is unavailable
+            logger.exception("Rate limiter unavailable, allowing request")
+            return await self.app(scope, receive, send)
+
+        headers = [
+            (b"ratelimit-limit", str(result.limit).encode()),
+            (b"ratelimit-remaining", str(max(result.remaining, 0)).encode()),
+            (b"ratelimit-reset", str(math.ceil(result.reset_after)).encode()),
+        ]
+
+        if not result.allowed:
+            body = json.dumps({"detail": "طلبات كثيرة جداً، يرجى المحاولة لاحقاً"}, ensure_ascii=False).encode("utf-8")
+            headers += [
+                (b"retry-after", str(max(1, math.ceil(result.retry_after))).encode()),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ]
+            await send({"type": "http.response.start", "status": 429, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    def _buckets(self, scope, klass: str) -> List[Bucket]:
+        limit = self.limits[klass]
+        user_id, org_id = _identity(scope)
+        if user_id is None or klass == "auth":
+            client = scope.get("client")
+            return [(f"ip:{client[0] if client else 'unknown'}:{klass}", limit, PERIOD_SECONDS)]
+        buckets = [(f"user:{user_id}:{klass}", limit, PERIOD_SECONDS)]
+        if org_id:
+            buckets.append((f"org:{org_id}:{klass}", limit * settings.RATE_LIMIT_ORG_MULTIPLIER, PERIOD_SECONDS))
+        return buckets
+
+
+def _identity(scope) -> Tuple[Optional[str], Optional[str]]:
+    """Read user and org from the bearer token without touching the database"""
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return None, None
+            try:
+                payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM])
+            except jwt.InvalidTokenError:
+                return None, None
+            return payload.get("sub"), payload.get("org")
+    return None, None
@@ -0,0 +1,25 @@
+"""
+Startup Timing Middleware - Records the first successful request after boot
+"""
+
+from app.services.warmup import get_startup_timer
+
+
+class FirstRequestMiddleware:
+    """Notes time-to-first-successful-request, then only costs a flag check"""
+
+    def __init__(self, app):
+        self.app = app
+        self.recorded = False
+
+    async def __call__(self, scope, receive, send):
+        if self.recorded or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_and_record(message):
+            if message["type"] == "http.response.start" and message["status"] < 500 and not self.recorded:
+                self.recorded = True
+                get_startup_timer().request_served(scope["path"], message["status"])
+            await send(message)
+
+        await self.app(scope, receive, send_and_record)
@@ -116,6 +116,7 @@ class DataSource(Base):
     source_type = Column(String(50), nullable=False)
     url = Column(Text)
     scrape_config = Column(JSONB, default={})
+    scrape_state = Column(JSONB, default={})
     is_active = Column(Boolean, default=True)
     last_scraped_at = Column(DateTime)
     last_error = Column(Text)
@@ -183,6 +184,23 @@ class Lead(Base):
     messages = relationship("Message", back_populates="lead", cascade="all, delete-orphan")
 
 
+class LeadMatchKey(Base):
+    __tablename__ = "lead_match_keys"
+
+    org_id = Column(UUID(as_uuid=True), primary_key=True)
+    key_type = Column(String(20), primary_key=True)
+    key_value = Column(String(255), primary_key=True)
+    lead_id = Column(UUID(as_uuid=True), ForeignKey("leads.id", ondelete="CASCADE"), primary_key=True)
+
+
+class LeadDuplicateReport(Base):
+    __tablename__ = "lead_duplicate_reports"
+
+    org_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id", ondelete="CASCADE"), primary_key=True)
+    clusters = Column(JSONB, nullable=False, default=list)
+    built_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
 class Campaign(Base):
     __tablename__ = "campaigns"
 
@@ -272,6 +290,39 @@ class Message(Base):
     organization = relationship("Organization", back_populates="messages")
     lead = relationship("Lead", back_populates="messages")
     campaign = relationship("Campaign", back_populates="messages")
+    replies = relationship("MessageReply", back_populates="message", cascade="all, delete-orphan")
+
+
+class MessageReply(Base):
+    __tablename__ = "message_replies"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    org_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id", ondelete="CASCADE"))
+    message_id = Column(UUID(as_uuid=True), ForeignKey("messages.id", ondelete="CASCADE"))
+
+    external_id = Column(String(255), nullable=False, unique=True)
+    from_address = Column(String(255))
+    body = Column(Text, nullable=False)
+    received_at = Column(DateTime, nullable=False)
+
+    analysis = Column(JSONB)
+    analyzed_at = Column(DateTime)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    message = relationship("Message", back_populates="replies")
+
+
+class CampaignMessageStat(Base):
+    __tablename__ = "campaign_message_stats"
+
+    campaign_id = Column(UUID(as_uuid=True), ForeignKey("campaigns.id", ondelete="CASCADE"), primary_key=True)
+    org_id = Column(UUID(as_uuid=True), ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False)
+    channel = Column(String(50), primary_key=True)
+    status = Column(String(50), primary_key=True)
+    messages = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
 class Integration(Base):
@@ -317,7 +368,8 @@ class ActivityLog(Base):
     ip_address = Column(INET)
     user_agent = Column(Text)
 
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Partition key (monthly range partitions), so part of the primary key
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
 
     # Relationships
     organization = relationship("Organization", back_populates="activity_logs")
@@ -357,3 +409,4 @@ class SubscriptionLimit(Base):
     campaigns = Column(Integer)
     integrations = Column(ARRAY(Text))
     features = Column(ARRAY(Text))
+    activity_retention_months = Column(Integer)
@@ -53,6 +53,12 @@ class Channel(str, Enum):
     whatsapp = "whatsapp"
 
 
+class ExportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+    parquet = "parquet"
+
+
 class Tone(str, Enum):
     professional = "professional"
     casual = "casual"
@@ -215,6 +221,51 @@ class LeadListResponse(BaseModel):
     total_pages: int
 
 
+class DuplicateCluster(BaseModel):
+    lead_ids: List[str]
+    score: float
+    matched_on: List[str] = []
+
+
+class DuplicateReportResponse(BaseModel):
+    clusters: List[DuplicateCluster]
+    built_at: Optional[datetime] = None  # None until the first report is built
+    refreshing: bool = False  # a rebuild was queued; the next read may differ
+
+
+class MergeLeadsRequest(BaseModel):
+    primary_id: UUID
+    duplicate_ids: List[UUID] = Field(..., min_length=1)
+
+
+class LeadSelection(BaseModel):
+    """Explicit ids and/or the list_leads filters; both given means both must match"""
+    ids: Optional[List[UUID]] = Field(None, max_length=50000)
+    status: Optional[LeadStatus] = None
+    industry: Optional[str] = None
+    min_score: Optional[int] = Field(None, ge=0, le=10)
+    search: Optional[str] = None
+
+    def is_empty(self) -> bool:
+        return not self.ids and self.status is None and self.industry is None \
+            and self.min_score is None and not self.search
+
+
+class BulkLeadUpdateRequest(BaseModel):
+    selection: LeadSelection
+    set_status: Optional[LeadStatus] = None
+    add_tags: Optional[List[str]] = None
+    remove_tags: Optional[List[str]] = None
+
+
+class BulkLeadDeleteRequest(BaseModel):
+    selection: LeadSelection
+
+
+class BulkResultResponse(BaseModel):
+    affected: int
+
+
 # ==================== CAMPAIGN SCHEMAS ====================
 
 class CampaignCreate(BaseModel):
@@ -255,6 +306,23 @@ class CampaignResponse(BaseModel):
     completed_at: Optional[str] = None
 
 
+class FunnelCounts(BaseModel):
+    messages: int = 0
+    sent: int = 0
+    delivered: int = 0
+    opened: int = 0
+    clicked: int = 0
+    replied: int = 0
+    bounced: int = 0
+    failed: int = 0
+
+
+class CampaignFunnel(BaseModel):
+    campaign_id: str
+    totals: FunnelCounts
+    by_channel: Dict[str, FunnelCounts] = {}
+
+
 # ==================== DATA SOURCE SCHEMAS ====================
 
 class DataSourceCreate(BaseModel):
@@ -337,6 +405,54 @@ class ActivityItem(BaseModel):
     created_at: str
 
 
+class ActivityPage(BaseModel):
+    items: List[ActivityItem]
+    next_cursor: Optional[str] = None
+
+
+class TimelineReply(BaseModel):
+    id: str
+    from_address: Optional[str] = None
+    body: str
+    received_at: str
+
+
+class TimelineMessage(BaseModel):
+    id: str
+    campaign_id: Optional[str] = None
+    channel: str
+    subject: Optional[str] = None
+    body: str
+    status: str
+    ai_generated: bool = False
+    sent_at: Optional[str] = None
+    delivered_at: Optional[str] = None
+    opened_at: Optional[str] = None
+    clicked_at: Optional[str] = None
+    replied_at: Optional[str] = None
+    replies: List[TimelineReply] = []
+
+
+class TimelineItem(BaseModel):
+    kind: str  # message | activity
+    created_at: str
+    message: Optional[TimelineMessage] = None
+    activity: Optional[ActivityItem] = None
+
+
+class TimelineCampaign(BaseModel):
+    id: str
+    name: str
+    status: str
+
+
+class LeadTimeline(BaseModel):
+    lead: LeadResponse
+    campaigns: List[TimelineCampaign]
+    items: List[TimelineItem]
+    next_cursor: Optional[str] = None
+
+
 # ==================== AI SCHEMAS ====================
 
 class GenerateMessageRequest(BaseModel):
@@ -361,6 +477,10 @@ class ScoreLeadResponse(BaseModel):
     reasons: List[str] = []
 
 
+class ScoreLeadsRequest(BaseModel):
+    lead_ids: Optional[List[UUID]] = None
+
+
 class AnalyzeResponseRequest(BaseModel):
     message: str
     context: Optional[str] = None
@@ -372,3 +492,35 @@ class AnalyzeResponseResponse(BaseModel):
     inshallah_score: int = 5
     suggested_action: Optional[str] = None
     analysis: Optional[str] = None
+
+
+# ==================== WEBHOOK SCHEMAS ====================
+
+class InboundReply(BaseModel):
+    external_id: str  # Message.external_id of the message being replied to
+    reply_id: str  # Provider's id for the reply itself
+    from_address: Optional[str] = None
+    body: str
+    received_at: datetime
+
+
+class InboundRepliesRequest(BaseModel):
+    events: List[InboundReply] = Field(..., min_length=1, max_length=5000)
+
+
+class InboundRepliesResponse(BaseModel):
+    accepted: int
+    task_ids: List[str]
+
+
+# ==================== TASK SCHEMAS ====================
+
+class TaskResponse(BaseModel):
+    id: str
+    name: str
+    status: str
+    attempts: int = 0
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: str
+    updated_at: Optional[str] = None
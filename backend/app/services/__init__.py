@@ -1,7 +1,25 @@
 """
 Services Package
+Exports resolve on first use, so importing one service (or the API module)
+does not pull in the Anthropic SDK and httpx at startup.
 """
 
-from app.services.ai_service import AIService, get_ai_service
+import importlib
 
-__all__ = ["AIService", "get_ai_service"]
+_EXPORTS = {
+    "AIService": "app.services.ai_service",
+    "get_ai_service": "app.services.ai_service",
+    "UsageMeter": "app.services.usage_service",
+    "get_usage_meter": "app.services.usage_service",
+    "WriteBehindBuffer": "app.services.write_behind",
+    "get_write_behind": "app.services.write_behind",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module), name)
@@ -0,0 +1,96 @@
+"""
+Activity Retention Service - Monthly partition upkeep for activity_log
+Keeps partitions created ahead of time so inserts never land in the default
+partition, drops whole partitions past the longest tier retention, and deletes
+rows for shorter-retention tiers in bounded batches inside the partitions that
+remain. Runs daily from the task worker (activity.maintain_partitions).
+"""
+
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, select, text, tuple_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import ActivityLog, Organization, SubscriptionLimit
+
+
+def month_start(months_ago: int, today: Optional[date] = None) -> datetime:
+    """First instant of the month `months_ago` months before today's month"""
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - months_ago
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def ensure_partitions(db: Session, months_ahead: int = settings.ACTIVITY_PARTITIONS_AHEAD) -> int:
+    return db.execute(
+        text("SELECT ensure_activity_log_partitions(CURRENT_DATE, :ahead)"), {"ahead": months_ahead}
+    ).scalar() or 0
+
+
+def drop_partitions(db: Session, keep_months: int, detach_only: bool = settings.ACTIVITY_DETACH_ONLY) -> List[str]:
+    return list(db.execute(
+        text("SELECT drop_activity_log_partitions(:keep, :detach_only)"),
+        {"keep": keep_months, "detach_only": detach_only}
+    ).scalars())
+
+
+def purge_tier(db: Session, tier: str, cutoff: datetime, floor: Optional[datetime] = None,
+               batch_size: int = settings.ACTIVITY_DELETE_BATCH_SIZE) -> int:
+    """Delete a tier's rows older than `cutoff`, committing after each batch
+
+    `floor` bounds the scan from below (rows before it were already dropped with
+    their partition) so only the partitions in [floor, cutoff) are touched.
+    """
+    victims = (
+        select(ActivityLog.id, ActivityLog.created_at)
+        .join(Organization, Organization.id == ActivityLog.org_id)
+        .where(func.coalesce(Organization.subscription_tier, "free") == tier)
+        .where(ActivityLog.created_at < cutoff)
+    )
+    if floor is not None:
+        victims = victims.where(ActivityLog.created_at >= floor)
+    victims = victims.limit(batch_size)
+
+    deleted = 0
+    while True:
+        result = db.execute(
+            delete(ActivityLog)
+            .where(ActivityLog.created_at < cutoff)
+            .where(tuple_(ActivityLog.id, ActivityLog.created_at).in_(victims))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+
+def maintain(db: Session) -> Dict[str, object]:
+    """Create upcoming partitions and enforce every tier's retention"""
+    created = ensure_partitions(db)
+    db.commit()
+
+    retention = {
+        tier: months
+        for tier, months in db.query(SubscriptionLimit.tier, SubscriptionLimit.activity_retention_months)
+        if months is not None
+    }
+    report: Dict[str, object] = {"created": created, "dropped": [], "deleted": {}}
+    if not retention:
+        return report
+
+    # -1 anywhere means some tier keeps everything, so no partition can go
+    keep_months = None if -1 in retention.values() else max(retention.values())
+    floor = None
+    if keep_months is not None:
+        report["dropped"] = drop_partitions(db, keep_months)
+        db.commit()
+        floor = month_start(keep_months)
+
+    for tier, months in retention.items():
+        if months == -1 or months == keep_months:
+            continue
+        report["deleted"][tier] = purge_tier(db, tier, month_start(months), floor)
+    return report
@@ -4,10 +4,14 @@ Uses Anthropic Claude API
 """
 
 from anthropic import Anthropic
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator, List
 import json
+import threading
+
+import httpx
 
 from app.config import settings
+from app.services.call_policy import get_call_policy
 
 
 class AIService:
@@ -16,8 +20,23 @@ class AIService:
     def __init__(self):
         if not settings.ANTHROPIC_API_KEY:
             raise ValueError("ANTHROPIC_API_KEY not configured")
-        self.client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+        # Keep-alive outlasts the SDK's 5s default, so warm connections survive quiet spells
+        self.http = httpx.Client(limits=httpx.Limits(
+            max_connections=100, max_keepalive_connections=20, keepalive_expiry=settings.AI_KEEPALIVE_SECONDS
+        ))
+        # Retries and timeouts are handled by the call policy, not the SDK
+        self.client = Anthropic(
+            api_key=settings.ANTHROPIC_API_KEY,
+            base_url=settings.ANTHROPIC_BASE_URL or None,
+            max_retries=0,
+            http_client=self.http
+        )
         self.model = settings.AI_MODEL
+        self.policy = get_call_policy()
+
+    def warm(self) -> None:
+        """Open a pooled TLS connection to the API so the first call skips the handshake"""
+        self.http.head(str(self.client.base_url), timeout=settings.AI_ATTEMPT_TIMEOUT_SECONDS)
     
     def generate_outreach_message(
         self,
@@ -30,12 +49,13 @@ class AIService:
         system_prompt = self._build_system_prompt(company_profile, channel)
         user_prompt = self._build_user_prompt(lead, channel, custom_context)
         
-        response = self.client.messages.create(
+        response = self.policy.call(lambda timeout: self.client.messages.create(
             model=self.model,
             max_tokens=1000,
             system=system_prompt,
-            messages=[{"role": "user", "content": user_prompt}]
-        )
+            messages=[{"role": "user", "content": user_prompt}],
+            timeout=timeout
+        ))
         
         content = response.content[0].text
         tokens_used = response.usage.input_tokens + response.usage.output_tokens
@@ -62,6 +82,55 @@ class AIService:
             }
         }
     
+    def stream_outreach_message(
+        self,
+        lead: Dict[str, Any],
+        company_profile: Dict[str, Any],
+        channel: str,
+        custom_context: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream a message as events: subject (once), token (body deltas), then done"""
+        system_prompt = self._build_system_prompt(company_profile, channel)
+        user_prompt = self._build_user_prompt(lead, channel, custom_context)
+        splitter = SubjectSplitter(enabled=channel == "email")
+
+        def open_stream(timeout: float):
+            manager = self.client.messages.stream(
+                model=self.model,
+                max_tokens=1000,
+                system=system_prompt,
+                messages=[{"role": "user", "content": user_prompt}],
+                timeout=timeout
+            )
+            return manager, manager.__enter__()
+
+        # Only opening the stream is retried; once tokens flow the timeout bounds each read
+        manager, stream = self.policy.call(open_stream, hedge=False)
+        try:
+            for text in stream.text_stream:
+                for event in splitter.feed(text):
+                    yield event
+            final = stream.get_final_message()
+        finally:
+            manager.__exit__(None, None, None)
+
+        for event in splitter.close():
+            yield event
+
+        yield {
+            "event": "done",
+            "data": {
+                "subject": splitter.subject,
+                "body": splitter.body.strip(),
+                "tokens_used": final.usage.input_tokens + final.usage.output_tokens,
+                "personalization_data": {
+                    "company_name": lead.get("company_name"),
+                    "funding": lead.get("funding_amount"),
+                    "industry": lead.get("industry")
+                }
+            }
+        }
+    
     def _build_system_prompt(self, profile: Dict[str, Any], channel: str) -> str:
         tone_map = {"professional": "محترف ومهني", "casual": "ودي وغير رسمي", "formal": "رسمي جداً", "friendly": "ودود ودافئ"}
         tone = tone_map.get(profile.get("tone", "professional"), "محترف")
@@ -106,7 +175,8 @@ class AIService:
         
         return prompt + "\nاكتب الرسالة:"
     
-    def score_lead(self, lead: Dict[str, Any]) -> Dict[str, Any]:
+    @staticmethod
+    def score_lead(lead: Dict[str, Any]) -> Dict[str, Any]:
         """Score a lead 0-10"""
         score = 0
         breakdown = {}
@@ -149,11 +219,12 @@ class AIService:
 
 {{"sentiment": "positive/neutral/negative", "intent": "interested/maybe/not_interested", "inshallah_score": 1-10, "suggested_action": "...", "analysis": "..."}}'''
 
-        response = self.client.messages.create(
+        response = self.policy.call(lambda timeout: self.client.messages.create(
             model=self.model,
             max_tokens=500,
-            messages=[{"role": "user", "content": prompt}]
-        )
+            messages=[{"role": "user", "content": prompt}],
+            timeout=timeout
+        ))
         
         content = response.content[0].text
         try:
@@ -165,12 +236,103 @@ class AIService:
             pass
         
         return {"sentiment": "neutral", "intent": "maybe", "inshallah_score": 5, "suggested_action": "تابع", "analysis": content}
+    
+    def analyze_responses(self, messages: List[str]) -> Dict[str, Any]:
+        """Analyze several replies in one call; results come back in input order"""
+        numbered = "\n".join(f'{i + 1}. "{m}"' for i, m in enumerate(messages))
+        prompt = f'''حلل كل رد من هذه الردود وأجب بمصفوفة JSON فقط، عنصر لكل رد بنفس الترتيب:
+{numbered}
+
+[{{"sentiment": "positive/neutral/negative", "intent": "interested/maybe/not_interested", "inshallah_score": 1-10, "suggested_action": "...", "analysis": "..."}}]'''
+
+        response = self.policy.call(lambda timeout: self.client.messages.create(
+            model=self.model,
+            max_tokens=300 * len(messages),
+            messages=[{"role": "user", "content": prompt}],
+            timeout=timeout
+        ))
+        
+        content = response.content[0].text
+        results = []
+        try:
+            start = content.find('[')
+            end = content.rfind(']') + 1
+            if start != -1 and end > start:
+                results = [r for r in json.loads(content[start:end]) if isinstance(r, dict)]
+        except ValueError:
+            pass
+        
+        default = {"sentiment": "neutral", "intent": "maybe", "inshallah_score": 5, "suggested_action": "تابع", "analysis": None}
+        return {
+            "results": (results + [default] * len(messages))[:len(messages)],
+            "tokens_used": response.usage.input_tokens + response.usage.output_tokens
+        }
+
+
+class SubjectSplitter:
+    """Incremental version of the "الموضوع:" parsing in generate_outreach_message
+
+    Holds text back until a complete line starts with the prefix: that line
+    becomes the subject, the lines before it are dropped and the rest is body,
+    as in the non-streaming parse. If MAX_HOLD characters arrive without one,
+    everything held is released as body and later subject lines stay in it.
+    """
+
+    PREFIX = "الموضوع:"
+    MAX_HOLD = 300
+
+    def __init__(self, enabled: bool = True):
+        self.subject: Optional[str] = None
+        self.body = ""
+        self._pending = ""
+        self._deciding = enabled
+
+    def feed(self, text: str) -> Iterator[Dict[str, Any]]:
+        if not self._deciding:
+            yield from self._emit(text)
+            return
+
+        self._pending += text
+        complete = self._pending.split("\n")[:-1]
+        if self._subject_index(complete) is None and len(self._pending) < self.MAX_HOLD:
+            return
+        yield from self._decide(final=False)
+
+    def close(self) -> Iterator[Dict[str, Any]]:
+        if self._deciding:
+            yield from self._decide(final=True)
+
+    def _subject_index(self, lines: List[str]) -> Optional[int]:
+        return next((i for i, line in enumerate(lines) if line.strip().startswith(self.PREFIX)), None)
+
+    def _decide(self, final: bool) -> Iterator[Dict[str, Any]]:
+        self._deciding = False
+        pending, self._pending = self._pending, ""
+        lines = pending.split("\n")
+        # The last line may still be growing until the stream ends
+        i = self._subject_index(lines if final else lines[:-1])
+        if i is not None:
+            self.subject = lines[i].replace(self.PREFIX, "").strip()
+            yield {"event": "subject", "data": {"subject": self.subject}}
+            pending = "\n".join(lines[i + 1:]).lstrip()
+        yield from self._emit(pending)
+
+    def _emit(self, text: str) -> Iterator[Dict[str, Any]]:
+        if not self.body:
+            text = text.lstrip()
+        if text:
+            self.body += text
+            yield {"event": "token", "data": {"text": text}}
 
 
 _ai_service: Optional[AIService] = None
+_ai_service_lock = threading.Lock()
 
 def get_ai_service() -> AIService:
     global _ai_service
     if _ai_service is None:
-        _ai_service = AIService()
+        # Startup warmup and the first request may race to build it
+        with _ai_service_lock:
+            if _ai_service is None:
+                _ai_service = AIService()
     return _ai_service
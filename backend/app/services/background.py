@@ -0,0 +1,56 @@
+"""
+Background Flushers - Periodic in-process flush threads
+Shared by the services that buffer writes in memory and persist them in batches
+"""
+
+from typing import Callable, Optional
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicFlusher:
+    """Runs a flush callable every `interval` seconds, or early when woken"""
+
+    def __init__(self, name: str, flush: Callable[[], None], interval: float):
+        self.name = name
+        self.interval = interval
+        self._flush = flush
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def wake(self) -> None:
+        """Request an early flush (e.g. when a size threshold is crossed)"""
+        self._wake.set()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop the thread and run one final flush"""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self._safe_flush()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopping.is_set():
+                break
+            self._safe_flush()
+
+    def _safe_flush(self) -> None:
+        try:
+            self._flush()
+        except Exception:
+            logger.exception("%s flush failed", self.name)
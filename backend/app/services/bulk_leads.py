@@ -0,0 +1,92 @@
+"""
+Bulk Leads Service - Set-based status, tag and delete operations
+The selection is walked in id order, BULK_CHUNK_SIZE ids at a time, and each
+chunk is one UPDATE/DELETE ... WHERE id = ANY(...) committed on its own, so a
+50k-lead cleanup is a few dozen statements and never holds long row locks.
+"""
+
+from collections import Counter
+from datetime import datetime
+from typing import Iterator, List, Optional
+from uuid import UUID
+
+from sqlalchemy import Text, cast, delete, func, update
+from sqlalchemy.dialects.postgresql import ARRAY, array
+from sqlalchemy.orm import Query, Session
+
+from app.config import settings
+from app.models import DataSource, Lead
+from app.services.collection_versions import mark_changed
+
+
+def _id_chunks(selection: Query, chunk_size: int) -> Iterator[List[UUID]]:
+    """Keyset-paginate `selection` (a query for Lead.id) by id"""
+    last_id = None
+    while True:
+        page = selection.filter(Lead.id > last_id) if last_id else selection
+        ids = [row[0] for row in page.order_by(Lead.id).limit(chunk_size)]
+        if not ids:
+            return
+        yield ids
+        if len(ids) < chunk_size:
+            return
+        last_id = ids[-1]
+
+
+def tags_expression(add_tags: Optional[List[str]] = None, remove_tags: Optional[List[str]] = None):
+    """tags minus remove_tags and add_tags, then add_tags appended once each"""
+    add_tags = list(dict.fromkeys(add_tags or []))
+    expression = func.coalesce(Lead.tags, cast(array([], type_=Text), ARRAY(Text)))
+    for tag in list(remove_tags or []) + add_tags:
+        expression = func.array_remove(expression, tag)
+    if add_tags:
+        expression = func.array_cat(expression, cast(array(add_tags), ARRAY(Text)))
+    return expression
+
+
+def bulk_update(
+    db: Session,
+    org_id: UUID,
+    selection: Query,
+    status: Optional[str] = None,
+    add_tags: Optional[List[str]] = None,
+    remove_tags: Optional[List[str]] = None,
+    chunk_size: int = settings.BULK_CHUNK_SIZE,
+) -> int:
+    values = {"updated_at": datetime.utcnow()}
+    if status:
+        values["status"] = status
+        values["status_updated_at"] = values["updated_at"]
+    if add_tags or remove_tags:
+        values["tags"] = tags_expression(add_tags, remove_tags)
+
+    affected = 0
+    for ids in _id_chunks(selection, chunk_size):
+        result = db.execute(
+            update(Lead).where(Lead.id.in_(ids)).values(values).execution_options(synchronize_session=False)
+        )
+        mark_changed(db, org_id, "leads")
+        db.commit()
+        affected += result.rowcount
+    return affected
+
+
+def bulk_delete(db: Session, org_id: UUID, selection: Query, chunk_size: int = settings.BULK_CHUNK_SIZE) -> int:
+    """Delete the selection; match keys and messages go with the rows (ON DELETE CASCADE)"""
+    affected = 0
+    for ids in _id_chunks(selection, chunk_size):
+        source_ids = db.execute(
+            delete(Lead).where(Lead.id.in_(ids)).returning(Lead.source_id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+
+        # Keep data_sources.leads_count in step with the deleted rows
+        per_source = Counter(s for s in source_ids if s)
+        for source_id, count in per_source.items():
+            db.query(DataSource).filter(DataSource.id == source_id).update(
+                {"leads_count": func.greatest(DataSource.leads_count - count, 0)}, synchronize_session=False
+            )
+        mark_changed(db, org_id, "leads", "sources")
+        db.commit()
+        affected += len(source_ids)
+    return affected
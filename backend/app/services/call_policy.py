@@ -0,0 +1,268 @@
+"""
+Call Policy - Deadlines, retries, circuit breaking and hedging for LLM calls
+Every upstream call gets a per-attempt timeout inside an overall deadline.
+Attempts that fail with 429/529/5xx, timeouts or connection errors are retried
+with jittered exponential backoff (honouring Retry-After). Consecutive failures
+open a breaker that fails fast with AIUnavailable until a probe succeeds, so a
+slow upstream cannot tie up every request thread. Optional hedging fires a
+second attempt when the first is slower than the recent p95.
+"""
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Optional, TypeVar
+import logging
+import random
+import threading
+import time
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+class AIUnavailable(Exception):
+    """Upstream is failing or the breaker is open; callers should degrade"""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_retryable(error: Exception) -> bool:
+    # Imported here so loading the policy (e.g. for AIUnavailable) stays cheap
+    import anthropic
+
+    if isinstance(error, (anthropic.APITimeoutError, anthropic.APIConnectionError)):
+        return True
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS
+    return False
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class CircuitBreaker:
+    """closed -> open after `threshold` consecutive failures -> half_open after
+    `reset_after` seconds, where one probe decides between closed and open"""
+
+    def __init__(self, threshold: int, reset_after: float):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened_count = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_after:
+                return "half_open"
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open":
+                if time.monotonic() - self._opened_at < self.reset_after:
+                    return False
+                self._state = "half_open"
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def retry_in(self) -> float:
+        with self._lock:
+            return max(0.0, self.reset_after - (time.monotonic() - self._opened_at))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or self._failures >= self.threshold:
+                if self._state != "open":
+                    self.opened_count += 1
+                    logger.warning("AI circuit breaker opened after %d failures", self._failures)
+                self._state = "open"
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self) -> None:
+        """A probe ended without a verdict (e.g. a 400), let another one through"""
+        with self._lock:
+            self._probing = False
+
+
+class CallPolicy:
+    """Runs `fn(timeout)` under the policy; fn must be safe to call twice"""
+
+    def __init__(
+        self,
+        attempt_timeout: float = settings.AI_ATTEMPT_TIMEOUT_SECONDS,
+        deadline: float = settings.AI_DEADLINE_SECONDS,
+        max_attempts: int = settings.AI_MAX_ATTEMPTS,
+        backoff_base: float = settings.AI_RETRY_BASE_SECONDS,
+        backoff_max: float = settings.AI_RETRY_MAX_SECONDS,
+        hedge: bool = settings.AI_HEDGE_ENABLED,
+        hedge_min_delay: float = settings.AI_HEDGE_MIN_DELAY_SECONDS,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = breaker or CircuitBreaker(
+            settings.AI_BREAKER_FAILURE_THRESHOLD, settings.AI_BREAKER_RESET_SECONDS
+        )
+        self._latencies: Deque[float] = deque(maxlen=200)
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+        # Counters
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.short_circuits = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def call(self, fn: Callable[[float], T], hedge: Optional[bool] = None) -> T:
+        with self._lock:
+            self.calls += 1
+        deadline = time.monotonic() + self.deadline
+        last_error: Optional[Exception] = None
+
+        for attempt in range(1, self.max_attempts + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if not self.breaker.allow():
+                self.short_circuits += 1
+                raise AIUnavailable("circuit open", retry_after=self.breaker.retry_in())
+
+            started = time.monotonic()
+            try:
+                if self.hedge if hedge is None else hedge:
+                    result = self._hedged(fn, min(self.attempt_timeout, remaining))
+                else:
+                    result = self._attempt(fn, min(self.attempt_timeout, remaining))
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.release()
+                    raise
+                self.breaker.record_failure()
+                last_error = e
+                delay = self._backoff(attempt, e)
+                if attempt == self.max_attempts or time.monotonic() + delay >= deadline:
+                    break
+                self.retries += 1
+                logger.info("AI call failed (%s), retry %d in %.2fs", type(e).__name__, attempt, delay)
+                time.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            # Latency as the caller saw it, so hedged losers do not inflate the tail
+            with self._lock:
+                self._latencies.append(time.monotonic() - started)
+            return result
+
+        self.failures += 1
+        raise AIUnavailable(f"upstream failed: {type(last_error).__name__ if last_error else 'deadline'}",
+                            retry_after=self.backoff_base) from last_error
+
+    def _attempt(self, fn: Callable[[float], T], timeout: float) -> T:
+        with self._lock:
+            self.attempts += 1
+        return fn(timeout)
+
+    def _hedged(self, fn: Callable[[float], T], timeout: float) -> T:
+        """Start a second attempt if the first outlives the recent p95; first success wins"""
+        pool = self._executor()
+        primary = pool.submit(self._attempt, fn, timeout)
+        done, _ = wait([primary], timeout=self.hedge_delay())
+        if done:
+            return primary.result()
+
+        self.hedges += 1
+        backup = pool.submit(self._attempt, fn, timeout)
+        pending = {primary, backup}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is backup:
+                        self.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def hedge_delay(self) -> float:
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < 20:
+            return max(self.hedge_min_delay, self.attempt_timeout / 2)
+        return max(self.hedge_min_delay, samples[int(len(samples) * 0.95) - 1])
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))
+        delay = random.uniform(0, ceiling)
+        hinted = retry_after(error)
+        return min(self.backoff_max, max(delay, hinted)) if hinted is not None else delay
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=settings.AI_HEDGE_POOL_SIZE, thread_name_prefix="ai-hedge")
+            return self._pool
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = sorted(self._latencies)
+        return {
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.opened_count,
+            "calls": self.calls,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "failures": self.failures,
+            "short_circuits": self.short_circuits,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "p50_seconds": round(samples[len(samples) // 2], 3) if samples else None,
+            "p95_seconds": round(samples[int(len(samples) * 0.95) - 1], 3) if len(samples) >= 20 else None,
+        }
+
+
+_policy: Optional[CallPolicy] = None
+
+def get_call_policy() -> CallPolicy:
+    global _policy
+    if _policy is None:
+        _policy = CallPolicy()
+    return _policy
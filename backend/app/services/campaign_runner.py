@@ -0,0 +1,237 @@
+"""
+Campaign Runner - Turns an active campaign's targets into scheduled messages
+Each run picks leads that match the campaign's targeting and have no message
+from it yet, up to what is left of the daily limit and max_leads. Campaigns
+with a message template are rendered by the compiled template engine, a batch
+at a time; campaigns without one get a per-lead AI message counted against
+ai_generations.
+
+One run per campaign at a time (an advisory lock), and each batch commits on
+its own, so slow AI generation never keeps a long transaction open. Messages
+are unique per (campaign, lead, channel); an insert that races another writer
+is skipped rather than duplicated.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID, uuid4
+import logging
+
+from sqlalchemy import and_, exists, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Campaign, CompanyProfile, Lead, Message
+from app.services.campaign_stats import apply_transitions
+from app.services.collection_versions import mark_changed
+from app.services.templates import compiled_campaign
+from app.services.tracking import tracked_body
+
+logger = logging.getLogger(__name__)
+
+LEAD_COLUMNS = (
+    Lead.id, Lead.company_name, Lead.company_name_ar, Lead.website, Lead.industry,
+    Lead.contact_name, Lead.contact_title, Lead.email, Lead.phone, Lead.linkedin_url,
+    Lead.funding_amount, Lead.funding_stage, Lead.employee_count, Lead.location, Lead.score,
+)
+
+
+def profile_dict(profile: CompanyProfile) -> Dict[str, Any]:
+    """Company profile as the dict AIService expects"""
+    return {
+        "company_name": profile.company_name,
+        "company_name_ar": profile.company_name_ar,
+        "value_proposition": profile.value_proposition,
+        "value_proposition_ar": profile.value_proposition_ar,
+        "target_audience": profile.target_audience,
+        "pain_points": profile.pain_points,
+        "differentiators": profile.differentiators,
+        "tone": profile.tone,
+        "language": profile.language,
+        "sdr_script": profile.sdr_script,
+        "sdr_script_ar": profile.sdr_script_ar
+    }
+
+
+def _budget(db: Session, campaign: Campaign) -> int:
+    """Leads this run may still take: what is left of today's limit and of max_leads"""
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    messaged = func.count(func.distinct(Message.lead_id))
+    today_count, total = db.execute(
+        select(messaged.filter(Message.created_at >= today), messaged)
+        .where(Message.campaign_id == campaign.id)
+    ).one()
+
+    budget = (campaign.daily_limit or 20) - today_count
+    if campaign.max_leads:
+        budget = min(budget, campaign.max_leads - total)
+    return max(budget, 0)
+
+
+def _targets(campaign: Campaign, limit: int, after: Optional[Tuple[int, UUID]] = None):
+    """Next `limit` targets in (score desc, id) order, after the (score, id) of the last batch"""
+    already = exists().where(Message.campaign_id == campaign.id, Message.lead_id == Lead.id)
+    query = (
+        select(*LEAD_COLUMNS)
+        .where(Lead.org_id == campaign.org_id)
+        .where(Lead.status.in_(campaign.target_statuses or ["new"]))
+        .where(Lead.score >= (campaign.min_score or 0))
+        .where(~already)
+    )
+    if campaign.target_industries:
+        query = query.where(Lead.industry.in_(campaign.target_industries))
+    if after is not None:
+        # Leads a batch skipped (an empty template body) still match, so page past them
+        score, lead_id = after
+        query = query.where(or_(Lead.score < score, and_(Lead.score == score, Lead.id > lead_id)))
+    return query.order_by(Lead.score.desc(), Lead.id).limit(limit)
+
+
+def _message(campaign: Campaign, lead_id: UUID, channel: str, subject: Optional[str], body: str,
+             ai_generated: bool, now: datetime) -> Dict[str, Any]:
+    message_id = uuid4()
+    if settings.TRACKING_ENABLED:
+        body = tracked_body(campaign.org_id, message_id, channel, body)
+    return {
+        "id": message_id,
+        "org_id": campaign.org_id,
+        "lead_id": lead_id,
+        "campaign_id": campaign.id,
+        "channel": channel,
+        "subject": subject if channel == "email" else None,
+        "body": body,
+        "ai_generated": ai_generated,
+        "status": "scheduled",
+        "scheduled_for": now,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def _render(campaign: Campaign, profile: Optional[CompanyProfile], leads: List[Any]) -> List[Dict[str, Any]]:
+    compiled = compiled_campaign(campaign)
+    sender = (profile.company_name_ar or profile.company_name) if profile else None
+    channels = campaign.channels or ["email"]
+    now = datetime.utcnow()
+
+    rows = [dict(lead._mapping, sender_company=sender) for lead in leads]
+    return [
+        _message(campaign, lead.id, channel, subject, body, False, now)
+        for lead, (subject, body) in zip(leads, compiled.render_batch(rows))
+        for channel in channels
+        if body
+    ]
+
+
+def _generate(db: Session, campaign: Campaign, profile: CompanyProfile, leads: List[Any]) -> List[Dict[str, Any]]:
+    from app.services.ai_service import get_ai_service
+    from app.services.call_policy import AIUnavailable
+    from app.services.usage_service import get_usage_meter
+
+    ai = get_ai_service()
+    meter = get_usage_meter()
+    company = profile_dict(profile)
+    channels = campaign.channels or ["email"]
+
+    messages, generations, tokens = [], 0, 0
+    try:
+        for lead in leads:
+            if not meter.check_limit(db, campaign.org_id, "ai_generations", generations + len(channels)):
+                break
+            lead_dict = dict(lead._mapping)
+            lead_id = lead_dict.pop("id")
+            lead_dict.pop("score")
+            for channel in channels:
+                result = ai.generate_outreach_message(lead=lead_dict, company_profile=company, channel=channel)
+                generations += 1
+                tokens += result.get("tokens_used", 0)
+                messages.append(
+                    _message(campaign, lead_id, channel, result.get("subject"), result["body"], True, datetime.utcnow())
+                )
+    except AIUnavailable:
+        # Keep what was generated; the next run picks up the remaining leads
+        logger.warning("AI unavailable, campaign %s stopped after %d messages", campaign.id, len(messages))
+    finally:
+        if generations:
+            meter.record(campaign.org_id, "ai_generations", generations)
+            meter.record(campaign.org_id, "ai_tokens_used", tokens)
+    return messages
+
+
+@contextmanager
+def _run_lock(db: Session, campaign_id: UUID) -> Iterator[bool]:
+    """Session-level advisory lock on the campaign, True if this run holds it
+
+    Held on a connection of its own outside any transaction, so it survives the
+    per-batch commits; if the worker dies the connection closes and frees it.
+    """
+    key = int.from_bytes(campaign_id.bytes[:8], "big", signed=True)
+    with db.get_bind().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        locked = conn.execute(select(func.pg_try_advisory_lock(key))).scalar()
+        try:
+            yield locked
+        finally:
+            if locked:
+                conn.execute(select(func.pg_advisory_unlock(key)))
+
+
+def run_campaign(db: Session, campaign_id: UUID, batch_size: int = settings.CAMPAIGN_RENDER_BATCH_SIZE) -> Dict[str, Any]:
+    with _run_lock(db, campaign_id) as locked:
+        if not locked:
+            # The run in progress picks up the same leads
+            return {"mode": None, "leads": 0, "messages": 0, "error": "already_running"}
+        return _run(db, campaign_id, batch_size)
+
+
+def _run(db: Session, campaign_id: UUID, batch_size: int) -> Dict[str, Any]:
+    campaign = db.get(Campaign, campaign_id)
+    if campaign is None or campaign.status != "active":
+        return {"mode": None, "leads": 0, "messages": 0}
+
+    mode = "template" if campaign.message_template else "ai"
+    profile = db.query(CompanyProfile).filter(CompanyProfile.org_id == campaign.org_id).first()
+    if mode == "ai" and profile is None:
+        return {"mode": mode, "leads": 0, "messages": 0, "error": "missing_company_profile"}
+
+    budget = _budget(db, campaign)
+    if mode == "ai":
+        batch_size = min(batch_size, settings.CAMPAIGN_AI_BATCH_SIZE)
+
+    leads, messages, after = set(), 0, None
+    while len(leads) < budget and campaign.status == "active":
+        batch = db.execute(_targets(campaign, min(batch_size, budget - len(leads)), after)).all()
+        if not batch:
+            break
+        after = (batch[-1].score, batch[-1].id)
+
+        rows = _render(campaign, profile, batch) if mode == "template" else _generate(db, campaign, profile, batch)
+        inserted = db.execute(
+            pg_insert(Message)
+            .on_conflict_do_nothing(
+                index_elements=[Message.org_id, Message.campaign_id, Message.lead_id, Message.channel]
+            )
+            .returning(Message.lead_id, Message.channel, Message.status),
+            rows,
+        ).all() if rows else []
+        if inserted:
+            apply_transitions(db, (
+                (campaign.org_id, campaign.id, row.channel, None, row.status) for row in inserted
+            ))
+            contacted = {row.lead_id for row in inserted}
+            db.execute(
+                update(Campaign)
+                .where(Campaign.id == campaign.id)
+                .values(leads_contacted=func.coalesce(Campaign.leads_contacted, 0) + len(contacted))
+                .execution_options(synchronize_session=False)
+            )
+            mark_changed(db, campaign.org_id, "campaigns")
+            leads.update(contacted)
+            messages += len(inserted)
+        # Each batch is committed on its own; the campaign reloads, so a pause stops the run
+        db.commit()
+        if mode == "ai" and len(rows) < len(batch) * len(campaign.channels or ["email"]):
+            break
+
+    return {"mode": mode, "leads": len(leads), "messages": messages}
@@ -0,0 +1,240 @@
+"""
+Campaign Stats Service - Funnel counters driven by message status transitions
+campaign_message_stats holds a message count per campaign, channel and status.
+Whatever moves a message between statuses (the campaign runner creating it,
+reply ingestion) passes the transitions to apply_transitions in the same
+transaction, which turns them into one upsert of deltas. The funnel is read
+from those few rows instead of counting messages, and so is a campaign's
+replies_received. campaigns.reconcile_stats recounts from messages to correct
+drift, e.g. from messages deleted with their lead, and also recounts the lead
+counters kept on campaigns (leads_contacted, meetings_booked), which the
+message counters cannot express.
+"""
+
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+import logging
+
+from sqlalchemy import and_, delete, distinct, func, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Campaign, CampaignMessageStat, Lead, Message
+from app.services.collection_versions import mark_changed
+
+logger = logging.getLogger(__name__)
+
+# Funnel stages in order: a message counts toward its status's stage and every earlier one
+FUNNEL = ("sent", "delivered", "opened", "clicked", "replied")
+# Off the funnel path: a bounce was still sent, a failure never was
+STAGES_REACHED = {status: FUNNEL[:i + 1] for i, status in enumerate(FUNNEL)}
+STAGES_REACHED["bounced"] = ("sent",)
+
+# Lead status counted by campaigns.meetings_booked
+MEETING_STATUS = "meeting_scheduled"
+
+# (org_id, campaign_id, channel, old status or None if created, new status)
+Transition = Tuple[UUID, Optional[UUID], str, Optional[str], str]
+
+
+def apply_transitions(db: Session, transitions: Iterable[Transition]) -> int:
+    """Apply status transitions to the counters; returns the rows touched"""
+    deltas: Counter = Counter()
+    for org_id, campaign_id, channel, old, new in transitions:
+        if campaign_id is None or old == new:
+            continue
+        if old is not None:
+            deltas[(org_id, campaign_id, channel, old)] -= 1
+        deltas[(org_id, campaign_id, channel, new)] += 1
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+
+    # Serializes with reconcile(), which recounts under FOR UPDATE on the same rows
+    campaign_ids = sorted({campaign_id for _, campaign_id, _, _ in deltas})
+    db.execute(
+        select(Campaign.id).where(Campaign.id.in_(campaign_ids)).order_by(Campaign.id)
+        .with_for_update(read=True, key_share=True)
+    )
+
+    # Rows in key order, so concurrent upserts lock them in the same order
+    now = datetime.utcnow()
+    stmt = pg_insert(CampaignMessageStat).values([
+        {"campaign_id": campaign_id, "org_id": org_id, "channel": channel, "status": status,
+         "messages": delta, "updated_at": now}
+        for (org_id, campaign_id, channel, status), delta in sorted(deltas.items(), key=lambda item: item[0][1:])
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["campaign_id", "channel", "status"],
+        set_={"messages": CampaignMessageStat.messages + stmt.excluded.messages, "updated_at": now},
+    ))
+    for org_id in {org_id for org_id, _, _, _ in deltas}:
+        mark_changed(db, org_id, "campaigns")
+    return len(deltas)
+
+
+def _stage_counts(by_status: Dict[str, int]) -> Dict[str, int]:
+    counts = {"messages": sum(by_status.values()), "bounced": 0, "failed": 0}
+    counts.update({stage: 0 for stage in FUNNEL})
+    for status, n in by_status.items():
+        for stage in STAGES_REACHED.get(status, ()):
+            counts[stage] += n
+        if status in ("bounced", "failed"):
+            counts[status] += n
+    return counts
+
+
+def funnel(db: Session, org_id: UUID, campaign_id: UUID) -> Dict[str, object]:
+    """Stage counts for the whole campaign and per channel"""
+    rows = db.execute(
+        select(CampaignMessageStat.channel, CampaignMessageStat.status, CampaignMessageStat.messages)
+        .where(CampaignMessageStat.org_id == org_id, CampaignMessageStat.campaign_id == campaign_id)
+    ).all()
+
+    totals: Counter = Counter()
+    by_channel: Dict[str, Counter] = {}
+    for channel, status, n in rows:
+        totals[status] += n
+        by_channel.setdefault(channel, Counter())[status] += n
+    return {
+        "totals": _stage_counts(totals),
+        "by_channel": {channel: _stage_counts(counts) for channel, counts in sorted(by_channel.items())},
+    }
+
+
+def replies_by_campaign(db: Session, org_id: UUID, campaign_ids: Optional[List[UUID]] = None) -> Dict[UUID, int]:
+    """Replied messages per campaign, the funnel's replied total"""
+    query = (
+        select(CampaignMessageStat.campaign_id, func.sum(CampaignMessageStat.messages))
+        .where(CampaignMessageStat.org_id == org_id, CampaignMessageStat.status == "replied")
+        .group_by(CampaignMessageStat.campaign_id)
+    )
+    if campaign_ids is not None:
+        query = query.where(CampaignMessageStat.campaign_id.in_(campaign_ids))
+    return {campaign_id: int(n) for campaign_id, n in db.execute(query)}
+
+
+def lead_meeting_changed(db: Session, org_id: UUID, lead_id: UUID, booked: bool) -> None:
+    """Move meetings_booked on every campaign that messaged the lead"""
+    campaign_ids = select(Message.campaign_id).where(
+        Message.org_id == org_id, Message.lead_id == lead_id, Message.campaign_id.isnot(None)
+    )
+    meetings = func.coalesce(Campaign.meetings_booked, 0)
+    db.execute(
+        update(Campaign)
+        .where(Campaign.org_id == org_id, Campaign.id.in_(campaign_ids))
+        .values(meetings_booked=meetings + 1 if booked else func.greatest(meetings - 1, 0))
+        .execution_options(synchronize_session=False)
+    )
+    mark_changed(db, org_id, "campaigns")
+
+
+def _lead_counts(db: Session, campaign_ids: List[UUID]) -> Dict[UUID, Tuple[int, int]]:
+    """(leads contacted, leads with a meeting) per campaign, from messages and leads"""
+    rows = db.execute(
+        select(
+            Message.campaign_id,
+            func.count(distinct(Message.lead_id)),
+            func.count(distinct(Lead.id)).filter(Lead.status == MEETING_STATUS),
+        )
+        .outerjoin(Lead, and_(Lead.org_id == Message.org_id, Lead.id == Message.lead_id))
+        .where(Message.campaign_id.in_(campaign_ids), Message.lead_id.isnot(None))
+        .group_by(Message.campaign_id)
+    )
+    return {campaign_id: (contacted, meetings) for campaign_id, contacted, meetings in rows}
+
+
+def _reconcile_batch(db: Session, campaign_ids: List[UUID]) -> int:
+    # Writers hold FOR KEY SHARE on these rows until they commit, so the recount
+    # below sees every message whose delta is already in the counters
+    campaigns = {
+        row.id: row
+        for row in db.execute(
+            select(Campaign.id, Campaign.org_id, Campaign.leads_contacted, Campaign.replies_received,
+                   Campaign.meetings_booked)
+            .where(Campaign.id.in_(campaign_ids)).order_by(Campaign.id)
+            .with_for_update()
+        )
+    }
+    orgs = {campaign_id: row.org_id for campaign_id, row in campaigns.items()}
+
+    status = func.coalesce(Message.status, "draft")
+    actual = {
+        (row.campaign_id, row.channel, row.status): row.n
+        for row in db.execute(
+            select(Message.campaign_id, Message.channel, status.label("status"), func.count().label("n"))
+            .where(Message.campaign_id.in_(campaign_ids))
+            .group_by(Message.campaign_id, Message.channel, status)
+        )
+    }
+    stored = {
+        (row.campaign_id, row.channel, row.status): row.messages
+        for row in db.execute(
+            select(CampaignMessageStat.campaign_id, CampaignMessageStat.channel,
+                   CampaignMessageStat.status, CampaignMessageStat.messages)
+            .where(CampaignMessageStat.campaign_id.in_(campaign_ids))
+        )
+    }
+
+    wrong = sorted((key, n) for key, n in actual.items() if stored.get(key) != n)
+    stale = [key for key in stored if key not in actual]
+    if wrong:
+        now = datetime.utcnow()
+        stmt = pg_insert(CampaignMessageStat).values([
+            {"campaign_id": campaign_id, "org_id": orgs[campaign_id], "channel": channel, "status": status,
+             "messages": n, "updated_at": now}
+            for (campaign_id, channel, status), n in wrong
+        ])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["campaign_id", "channel", "status"],
+            set_={"messages": stmt.excluded.messages, "updated_at": now},
+        ))
+    if stale:
+        db.execute(
+            delete(CampaignMessageStat)
+            .where(tuple_(CampaignMessageStat.campaign_id, CampaignMessageStat.channel, CampaignMessageStat.status)
+                   .in_(stale))
+        )
+
+    replied = Counter()
+    for (campaign_id, _, status), n in actual.items():
+        if status == "replied":
+            replied[campaign_id] += n
+    lead_counts = _lead_counts(db, campaign_ids)
+    counters = []
+    for campaign_id, row in campaigns.items():
+        contacted, meetings = lead_counts.get(campaign_id, (0, 0))
+        counted = {"leads_contacted": contacted, "replies_received": replied[campaign_id], "meetings_booked": meetings}
+        if any(getattr(row, name) != n for name, n in counted.items()):
+            counters.append({"id": campaign_id, **counted})
+    if counters:
+        db.execute(update(Campaign), counters)
+
+    changed = {key[0] for key, _ in wrong} | {key[0] for key in stale} | {row["id"] for row in counters}
+    for campaign_id in changed:
+        mark_changed(db, orgs[campaign_id], "campaigns")
+    db.commit()
+
+    corrected = len(wrong) + len(stale) + len(counters)
+    if corrected:
+        logger.info("Corrected %d campaign stat rows and counters across %d campaigns", corrected, len(campaign_ids))
+    return corrected
+
+
+def reconcile(db: Session, batch_size: int = settings.CAMPAIGN_STATS_RECONCILE_BATCH_SIZE) -> Dict[str, int]:
+    """Recount every campaign that has left draft, a batch of campaigns per transaction"""
+    query = select(Campaign.id).where(func.coalesce(Campaign.status, "draft") != "draft").order_by(Campaign.id)
+    checked, corrected, last_id = 0, 0, None
+    while True:
+        page = query.where(Campaign.id > last_id) if last_id else query
+        campaign_ids = list(db.execute(page.limit(batch_size)).scalars())
+        db.rollback()
+        if not campaign_ids:
+            break
+        corrected += _reconcile_batch(db, campaign_ids)
+        checked += len(campaign_ids)
+        last_id = campaign_ids[-1]
+    return {"campaigns": checked, "corrected": corrected}
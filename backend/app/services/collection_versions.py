@@ -0,0 +1,159 @@
+"""
+Collection Versions - Per-org change counters behind list ETags
+Every committed write to leads, campaigns, sources or integrations bumps a
+counter for (org, collection) after the commit. List endpoints read the counter
+before querying and derive their ETag from it, so an unchanged list is a 304
+without running the query. Counters live in Redis (INCR, no row locks) or in
+process memory when one web process also runs the tasks, never in the tenant tables.
+
+ORM writes are picked up from the session automatically; Core/bulk statements
+call mark_changed() with the org they touched.
+"""
+
+from itertools import chain
+from typing import Iterable, Optional, Set, Tuple
+from uuid import UUID
+import hashlib
+import logging
+import threading
+import time
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Campaign, DataSource, Integration, Lead
+from app.serving import process_count, single_process
+from app.services.serialization import response_format
+
+logger = logging.getLogger(__name__)
+
+COLLECTIONS = ("leads", "campaigns", "sources", "integrations")
+MODEL_COLLECTIONS = {Lead: "leads", Campaign: "campaigns", DataSource: "sources", Integration: "integrations"}
+
+_Key = Tuple[UUID, str]
+_SESSION_KEY = "changed_collections"
+
+
+def _epoch() -> int:
+    # Counters start from the clock, so a lost store never replays old versions
+    return int(time.time() * 1000)
+
+
+class MemoryVersionStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+
+    def current(self, org_id: UUID, collection: str) -> int:
+        with self._lock:
+            return self._versions.setdefault((str(org_id), collection), _epoch())
+
+    def bump_many(self, keys: Iterable[_Key]) -> None:
+        with self._lock:
+            for org_id, collection in keys:
+                key = (str(org_id), collection)
+                self._versions[key] = self._versions.get(key, _epoch()) + 1
+
+
+class RedisVersionStore:
+    """faris:cv:<org_id>:<collection> -> integer version"""
+
+    def __init__(self, url: str = settings.REDIS_URL, prefix: str = "faris:cv:"):
+        import redis
+
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url, socket_timeout=0.5)
+
+    def _key(self, org_id: UUID, collection: str) -> str:
+        return f"{self.prefix}{org_id}:{collection}"
+
+    def current(self, org_id: UUID, collection: str) -> int:
+        key = self._key(org_id, collection)
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.set(key, _epoch(), nx=True)
+        pipe.get(key)
+        return int(pipe.execute()[1])
+
+    def bump_many(self, keys: Iterable[_Key]) -> None:
+        pipe = self._redis.pipeline(transaction=False)
+        for org_id, collection in keys:
+            key = self._key(org_id, collection)
+            pipe.set(key, _epoch(), nx=True)
+            pipe.incr(key)
+        pipe.execute()
+
+
+_store = None
+
+def get_collection_versions():
+    """The version store, or None when versions would not be shared by every process"""
+    global _store
+    if _store is None:
+        if settings.COLLECTION_VERSION_BACKEND == "redis":
+            _store = RedisVersionStore()
+        elif not single_process():
+            # A write seen by one process (a sibling web worker, or the task worker
+            # running imports and campaigns) would leave the others answering 304 with stale lists
+            logger.warning(
+                "List ETags disabled: memory version store with %d web processes and %s task workers",
+                process_count(), settings.TASK_QUEUE_BACKEND,
+            )
+            _store = False
+        else:
+            _store = MemoryVersionStore()
+    return _store or None
+
+
+def collection_etag(request: Request, org_id: UUID, collection: str) -> Optional[str]:
+    """Weak ETag for a list response, or None if the version store is unavailable"""
+    store = get_collection_versions()
+    if store is None:
+        return None
+    try:
+        version = store.current(org_id, collection)
+    except Exception:
+        logger.warning("Collection version store unavailable", exc_info=True)
+        return None
+    # Path, query string and format pick the representation; the version says whether it changed
+    tag = f"{collection}:{org_id}:{version}:{request.url.path}?{request.url.query}:{response_format(request)}"
+    digest = hashlib.sha256(tag.encode()).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def mark_changed(db: Session, org_id: UUID, *collections: str) -> None:
+    """Bump these collections for org_id when `db` commits"""
+    changed: Set[_Key] = db.info.setdefault(_SESSION_KEY, set())
+    changed.update((org_id, collection) for collection in collections)
+
+
+def changed_orgs(db: Session) -> Set[UUID]:
+    """Orgs with collection changes pending in `db`"""
+    return {org_id for org_id, _ in db.info.get(_SESSION_KEY, ())}
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context) -> None:
+    for obj in chain(session.new, session.dirty, session.deleted):
+        collection = MODEL_COLLECTIONS.get(type(obj))
+        if collection and obj.org_id:
+            mark_changed(session, obj.org_id, collection)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_versions(session: Session) -> None:
+    changed = session.info.pop(_SESSION_KEY, None)
+    store = get_collection_versions()
+    if not changed or store is None:
+        return
+    try:
+        store.bump_many(changed)
+    except Exception:
+        # The write is committed either way; the next bump for this list moves it on
+        logger.warning("Could not bump collection versions", exc_info=True)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session) -> None:
+    session.info.pop(_SESSION_KEY, None)
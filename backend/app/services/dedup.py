@@ -0,0 +1,435 @@
+"""
+Dedup Service - Lead entity resolution
+Every lead is indexed under a few blocking keys in lead_match_keys:
+
+    name          consonant skeleton of the Arabic/English company name
+                  ("شركة تمارا", "Tamara" and "tamara.co" all give "tmr")
+    domain        registrable website domain
+    email_domain  company email domain (free mail providers excluded)
+    phone         E.164 phone number
+
+Fuzzy matching only runs between leads that share a block, so cost grows
+with the number of real candidates rather than with the size of the org.
+The org-wide duplicate report is still a scan of every block, so it is built
+by a background task and stored in lead_duplicate_reports; reads only drop
+leads that were merged or deleted since.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+from uuid import UUID
+import re
+
+from sqlalchemy import delete, func, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Lead, LeadDuplicateReport, LeadMatchKey, Message, DataSource
+from app.services.collection_versions import mark_changed
+
+# ==================== NORMALIZATION ====================
+
+_ARABIC_DIACRITICS = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]")
+_ARABIC_LETTERS = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ؤ": "و", "ئ": "ي", "ة": "ه",
+    "٠": "0", "١": "1", "٢": "2", "٣": "3", "٤": "4", "٥": "5", "٦": "6", "٧": "7", "٨": "8", "٩": "9",
+})
+_ARABIC = re.compile(r"[\u0600-\u06FF]")
+_NON_WORD = re.compile(r"[^\w\s]|_", re.UNICODE)
+
+# Legal forms and generic words that carry no identity
+_STOPWORDS = {
+    "شركه", "مؤسسه", "مجموعه", "المحدوده", "محدوده", "للتجاره", "التجاريه", "القابضه", "ذمم", "ش", "م", "ذ",
+    "co", "company", "inc", "llc", "ltd", "limited", "group", "est", "the", "corp", "corporation",
+    "holding", "holdings", "sa", "ksa", "plc",
+}
+
+_TLDS = ("com", "co", "net", "org", "sa", "io", "ai", "app", "me", "ae", "info", "biz")
+_SECOND_LEVEL = {"com.sa", "net.sa", "org.sa", "gov.sa", "edu.sa", "med.sa", "co.uk", "com.eg", "co.ae"}
+_FREE_MAIL = {
+    "gmail.com", "googlemail.com", "hotmail.com", "outlook.com", "live.com", "yahoo.com",
+    "icloud.com", "me.com", "aol.com", "proton.me", "protonmail.com", "msn.com",
+}
+
+# Arabic letters -> Latin consonant classes; vowels and weak letters drop out
+_ARABIC_SKELETON = {
+    "ب": "b", "ت": "t", "ث": "t", "ج": "j", "ح": "", "خ": "k", "د": "d", "ذ": "z", "ر": "r",
+    "ز": "z", "س": "s", "ش": "s", "ص": "s", "ض": "d", "ط": "t", "ظ": "z", "ع": "", "غ": "g",
+    "ف": "f", "ق": "k", "ك": "k", "ل": "l", "م": "m", "ن": "n", "ه": "", "ة": "", "و": "",
+    "ي": "", "ى": "", "ا": "", "أ": "", "إ": "", "آ": "", "ء": "", "ؤ": "", "ئ": "", "پ": "b", "گ": "g",
+}
+_LATIN_DIGRAPHS = (("sh", "s"), ("kh", "k"), ("th", "t"), ("dh", "z"), ("gh", "g"), ("ph", "f"), ("ck", "k"), ("q", "k"), ("c", "k"), ("x", "ks"), ("v", "f"), ("p", "b"))
+_LATIN_VOWELS = re.compile(r"[aeiouyhw]")
+
+
+def normalize_arabic(text: str) -> str:
+    return _ARABIC_DIACRITICS.sub("", text).translate(_ARABIC_LETTERS)
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """Lowercase, strip diacritics, punctuation, TLDs and legal forms"""
+    if not name:
+        return ""
+    text = normalize_arabic(name.strip().lower())
+    text = re.sub(r"^(https?://)?(www\.)?", "", text)
+    text = re.sub(r"\.(%s)(\.[a-z]{2})?(/.*)?$" % "|".join(_TLDS), "", text)
+    words = _NON_WORD.sub(" ", text).split()
+    words = [w for w in words if w not in _STOPWORDS]
+    return " ".join(words)
+
+
+def name_skeleton(name: Optional[str]) -> str:
+    """Script-independent consonant skeleton used as the name blocking key"""
+    if not name:
+        return ""
+    text = _ARABIC_DIACRITICS.sub("", name.strip().lower())
+    text = re.sub(r"^(https?://)?(www\.)?", "", text)
+    text = re.sub(r"\.(%s)(\.[a-z]{2})?(/.*)?$" % "|".join(_TLDS), "", text)
+    words = [w for w in _NON_WORD.sub(" ", text).split() if normalize_arabic(w) not in _STOPWORDS]
+
+    out = []
+    for word in words:
+        if _ARABIC.search(word):
+            if word.startswith("ال") and len(word) > 4:
+                word = word[2:]
+            out.append("".join(_ARABIC_SKELETON.get(ch, ch if ch.isdigit() else "") for ch in word))
+        elif word not in ("al", "el"):
+            for src, dst in _LATIN_DIGRAPHS:
+                word = word.replace(src, dst)
+            out.append(_LATIN_VOWELS.sub("", word))
+    skeleton = "".join(out)
+    return re.sub(r"(.)\1+", r"\1", skeleton)
+
+
+def registrable_domain(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    value = value.strip().lower()
+    if "@" in value:
+        value = value.rsplit("@", 1)[1]
+    host = urlsplit(value if "//" in value else f"//{value}").hostname or ""
+    host = host[4:] if host.startswith("www.") else host
+    labels = host.split(".")
+    if len(labels) < 2:
+        return ""
+    if ".".join(labels[-2:]) in _SECOND_LEVEL and len(labels) >= 3:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def e164_phone(phone: Optional[str], default_country: str = "966") -> str:
+    if not phone:
+        return ""
+    digits = re.sub(r"\D", "", normalize_arabic(phone))
+    if phone.strip().startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    elif digits.startswith("0"):
+        digits = default_country + digits[1:]
+    elif len(digits) == 9 and digits.startswith("5"):
+        digits = default_country + digits
+    return f"+{digits}" if 8 <= len(digits) <= 15 else ""
+
+
+# ==================== KEYS & SCORING ====================
+
+@dataclass
+class LeadIdentity:
+    lead_id: Optional[UUID]
+    names: List[str] = field(default_factory=list)
+    skeletons: Set[str] = field(default_factory=set)
+    domain: str = ""
+    email_domain: str = ""
+    phone: str = ""
+
+    @classmethod
+    def from_fields(cls, fields: Dict[str, Any], lead_id: Optional[UUID] = None) -> "LeadIdentity":
+        identity = cls(lead_id=lead_id)
+        for key in ("company_name", "company_name_ar"):
+            if fields.get(key):
+                normalized = normalize_name(fields[key])
+                if normalized:
+                    identity.names.append(normalized)
+                skeleton = name_skeleton(fields[key])
+                if len(skeleton) >= 2:
+                    identity.skeletons.add(skeleton)
+        identity.domain = registrable_domain(fields.get("website"))
+        email_domain = registrable_domain(fields.get("email"))
+        identity.email_domain = "" if email_domain in _FREE_MAIL else email_domain
+        for domain in (identity.domain, identity.email_domain):
+            skeleton = name_skeleton(domain.split(".")[0]) if domain else ""
+            if len(skeleton) >= 2:
+                identity.skeletons.add(skeleton)
+        identity.phone = e164_phone(fields.get("phone"))
+        return identity
+
+    def keys(self) -> List[Tuple[str, str]]:
+        keys = [("name", s) for s in self.skeletons]
+        if self.domain:
+            keys.append(("domain", self.domain))
+        if self.email_domain:
+            keys.append(("email_domain", self.email_domain))
+        if self.phone:
+            keys.append(("phone", self.phone))
+        return keys
+
+
+def _is_arabic(text: str) -> bool:
+    return bool(_ARABIC.search(text))
+
+
+def match_score(a: LeadIdentity, b: LeadIdentity) -> float:
+    """0..1 likelihood that two leads are the same company"""
+    if a.phone and a.phone == b.phone:
+        return 1.0
+    if a.domain and a.domain == b.domain:
+        return 0.95
+
+    score = 0.0
+    for name_a in a.names:
+        for name_b in b.names:
+            if _is_arabic(name_a) == _is_arabic(name_b):
+                score = max(score, SequenceMatcher(None, name_a, name_b).ratio())
+    # Cross-script (or name vs domain) comparisons fall back to the skeletons
+    cross_script = {_is_arabic(n) for n in a.names} != {_is_arabic(n) for n in b.names} or not (a.names and b.names)
+    if cross_script or score == 0.0:
+        for skel_a in a.skeletons:
+            for skel_b in b.skeletons:
+                ratio = SequenceMatcher(None, skel_a, skel_b).ratio()
+                # Very short skeletons collide easily
+                weight = 0.9 if min(len(skel_a), len(skel_b)) >= 3 else 0.75
+                score = max(score, ratio * weight)
+    if a.email_domain and a.email_domain == b.email_domain:
+        score = max(score, 0.9)
+    return score
+
+
+# ==================== INDEX MAINTENANCE ====================
+
+IDENTITY_FIELDS = ("company_name", "company_name_ar", "website", "email", "phone")
+
+
+def lead_fields(lead: Lead) -> Dict[str, Any]:
+    return {f: getattr(lead, f) for f in IDENTITY_FIELDS}
+
+
+def index_leads(db: Session, org_id: UUID, leads: Iterable[Tuple[UUID, Dict[str, Any]]]) -> None:
+    """(Re)write the blocking keys for (lead_id, fields) pairs; caller commits"""
+    leads = list(leads)
+    if not leads:
+        return
+    ids = [lead_id for lead_id, _ in leads]
+    db.execute(delete(LeadMatchKey).where(LeadMatchKey.lead_id.in_(ids)))
+    rows = []
+    for lead_id, fields in leads:
+        for key_type, key_value in LeadIdentity.from_fields(fields, lead_id).keys():
+            rows.append({"org_id": org_id, "key_type": key_type, "key_value": key_value[:255], "lead_id": lead_id})
+    for start in range(0, len(rows), 5000):
+        db.execute(pg_insert(LeadMatchKey).values(rows[start:start + 5000]).on_conflict_do_nothing())
+
+
+class DuplicateIndex:
+    """Matches a batch of incoming leads against the org and against each other
+
+    Loads only the existing leads that share a blocking key with the batch.
+    """
+
+    def __init__(self, db: Session, org_id: UUID, incoming: List[Dict[str, Any]]):
+        self.threshold = settings.DEDUP_MATCH_THRESHOLD
+        self._blocks: Dict[Tuple[str, str], List[LeadIdentity]] = {}
+        identities = [LeadIdentity.from_fields(f) for f in incoming]
+        keys = list({k for identity in identities for k in identity.keys()})
+
+        candidate_ids: Set[UUID] = set()
+        for start in range(0, len(keys), 1000):
+            chunk = keys[start:start + 1000]
+            rows = db.query(LeadMatchKey.lead_id).filter(
+                LeadMatchKey.org_id == org_id,
+                tuple_(LeadMatchKey.key_type, LeadMatchKey.key_value).in_(chunk)
+            ).all()
+            candidate_ids.update(r.lead_id for r in rows)
+
+        ids = list(candidate_ids)
+        for start in range(0, len(ids), 1000):
+            columns = [Lead.id] + [getattr(Lead, f) for f in IDENTITY_FIELDS]
+            for row in db.query(*columns).filter(Lead.org_id == org_id, Lead.id.in_(ids[start:start + 1000])):
+                self.add(dict(zip(IDENTITY_FIELDS, row[1:])), row.id)
+
+    def add(self, fields: Dict[str, Any], lead_id: Optional[UUID]) -> None:
+        identity = LeadIdentity.from_fields(fields, lead_id)
+        for key in identity.keys():
+            block = self._blocks.setdefault(key, [])
+            if len(block) < settings.DEDUP_MAX_BLOCK_SIZE:
+                block.append(identity)
+
+    def match(self, fields: Dict[str, Any]) -> Optional[LeadIdentity]:
+        identity = LeadIdentity.from_fields(fields)
+        best, best_score = None, self.threshold
+        seen = set()
+        for key in identity.keys():
+            for candidate in self._blocks.get(key, []):
+                if id(candidate) in seen:
+                    continue
+                seen.add(id(candidate))
+                score = match_score(identity, candidate)
+                if score >= best_score:
+                    best, best_score = candidate, score
+        return best
+
+
+# ==================== REPORT & MERGE ====================
+
+def duplicate_clusters(db: Session, org_id: UUID, limit: int = 50) -> List[Dict[str, Any]]:
+    """Clusters of likely duplicates, built block by block"""
+    threshold = settings.DEDUP_MATCH_THRESHOLD
+    parent: Dict[UUID, UUID] = {}
+    best: Dict[Tuple[UUID, UUID], Tuple[float, str]] = {}
+
+    def find(x):
+        while parent.setdefault(x, x) != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    blocks = db.query(
+        LeadMatchKey.key_type, func.array_agg(LeadMatchKey.lead_id)
+    ).filter(
+        LeadMatchKey.org_id == org_id
+    ).group_by(
+        LeadMatchKey.key_type, LeadMatchKey.key_value
+    ).having(
+        func.count().between(2, settings.DEDUP_MAX_BLOCK_SIZE)
+    ).yield_per(500)
+
+    def process(chunk):
+        ids = list({lead_id for _, lead_ids in chunk for lead_id in lead_ids})
+        columns = [Lead.id] + [getattr(Lead, f) for f in IDENTITY_FIELDS]
+        identities = {
+            row.id: LeadIdentity.from_fields(dict(zip(IDENTITY_FIELDS, row[1:])), row.id)
+            for row in db.query(*columns).filter(Lead.org_id == org_id, Lead.id.in_(ids))
+        }
+        for key_type, lead_ids in chunk:
+            members = [identities[i] for i in lead_ids if i in identities]
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    pair = tuple(sorted((a.lead_id, b.lead_id), key=str))
+                    if pair in best:
+                        continue
+                    score = match_score(a, b)
+                    if score >= threshold:
+                        best[pair] = (score, key_type)
+                        parent[find(a.lead_id)] = find(b.lead_id)
+
+    chunk = []
+    for block in blocks:
+        chunk.append(block)
+        if len(chunk) >= 500:
+            process(chunk)
+            chunk = []
+    if chunk:
+        process(chunk)
+
+    clusters: Dict[UUID, Dict[str, Any]] = {}
+    for (a, b), (score, key_type) in best.items():
+        cluster = clusters.setdefault(find(a), {"lead_ids": set(), "score": 1.0, "matched_on": set()})
+        cluster["lead_ids"].update((a, b))
+        cluster["score"] = min(cluster["score"], score)
+        cluster["matched_on"].add(key_type)
+
+    ordered = sorted(clusters.values(), key=lambda c: (-len(c["lead_ids"]), -c["score"]))[:limit]
+    return [
+        {"lead_ids": [str(i) for i in c["lead_ids"]], "score": round(c["score"], 3), "matched_on": sorted(c["matched_on"])}
+        for c in ordered
+    ]
+
+
+def build_duplicate_report(db: Session, org_id: UUID, requested_at: Optional[datetime] = None) -> Optional[int]:
+    """Recluster the org and store the report; None if one built since `requested_at` covers it"""
+    started = datetime.utcnow()
+    if requested_at is not None:
+        built_at = db.query(LeadDuplicateReport.built_at).filter(LeadDuplicateReport.org_id == org_id).scalar()
+        if built_at is not None and built_at >= requested_at:
+            return None
+
+    clusters = duplicate_clusters(db, org_id, settings.DEDUP_REPORT_MAX_CLUSTERS)
+    stmt = pg_insert(LeadDuplicateReport).values(org_id=org_id, clusters=clusters, built_at=started)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[LeadDuplicateReport.org_id],
+        set_={"clusters": stmt.excluded.clusters, "built_at": stmt.excluded.built_at},
+    ))
+    db.commit()
+    return len(clusters)
+
+
+def live_clusters(db: Session, org_id: UUID, clusters: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """Stored clusters without the leads merged or deleted since the report was built"""
+    ids = list({UUID(i) for c in clusters for i in c["lead_ids"]})
+    existing: Set[str] = set()
+    for start in range(0, len(ids), 1000):
+        rows = db.query(Lead.id).filter(Lead.org_id == org_id, Lead.id.in_(ids[start:start + 1000]))
+        existing.update(str(row.id) for row in rows)
+
+    live = []
+    for cluster in clusters:
+        lead_ids = [i for i in cluster["lead_ids"] if i in existing]
+        if len(lead_ids) >= 2:
+            live.append({**cluster, "lead_ids": lead_ids})
+            if len(live) >= limit:
+                break
+    return live
+
+
+MERGE_FIELDS = (
+    "company_name_ar", "website", "industry", "contact_name", "contact_title", "email", "phone",
+    "linkedin_url", "funding_amount", "funding_stage", "funding_date", "employee_count",
+    "revenue_range", "location", "source_id", "source_url",
+)
+
+
+def merge_leads(db: Session, primary: Lead, duplicates: List[Lead]) -> Lead:
+    """Fold duplicates into primary, move their messages, delete them; caller commits"""
+    duplicate_ids = [d.id for d in duplicates]
+    for duplicate in duplicates:
+        for f in MERGE_FIELDS:
+            if getattr(primary, f) in (None, "") and getattr(duplicate, f) not in (None, ""):
+                setattr(primary, f, getattr(duplicate, f))
+        primary.score = max(primary.score or 0, duplicate.score or 0)
+        if duplicate.notes:
+            primary.notes = f"{primary.notes}\n\n{duplicate.notes}" if primary.notes else duplicate.notes
+        primary.custom_fields = {**(duplicate.custom_fields or {}), **(primary.custom_fields or {})}
+    primary.tags = sorted(set(primary.tags or []).union(*[(d.tags or []) for d in duplicates])) or None
+    primary.raw_data = {
+        **(primary.raw_data or {}),
+        "merged_from": [str(i) for i in duplicate_ids] + (primary.raw_data or {}).get("merged_from", [])
+    }
+
+    # Keep data_sources.leads_count in step with the deleted rows
+    per_source: Dict[UUID, int] = {}
+    for duplicate in duplicates:
+        if duplicate.source_id and duplicate.source_id != primary.source_id:
+            per_source[duplicate.source_id] = per_source.get(duplicate.source_id, 0) + 1
+
+    # A merged duplicate's source_url would collide with the unique (org_id, source_url) index
+    # org_id on every statement keeps them to the org's partition and (org_id, ...) indexes
+    same_org = Lead.org_id == primary.org_id
+    db.query(Lead).filter(same_org, Lead.id.in_(duplicate_ids)).update({"source_url": None}, synchronize_session=False)
+    db.query(Message).filter(Message.org_id == primary.org_id, Message.lead_id.in_(duplicate_ids)).update(
+        {"lead_id": primary.id}, synchronize_session=False
+    )
+    db.query(Lead).filter(same_org, Lead.id.in_(duplicate_ids)).delete(synchronize_session=False)
+    for source_id, count in per_source.items():
+        db.query(DataSource).filter(DataSource.id == source_id).update(
+            {"leads_count": func.greatest(DataSource.leads_count - count, 0)}, synchronize_session=False
+        )
+    for duplicate in duplicates:
+        db.expunge(duplicate)
+    mark_changed(db, primary.org_id, "leads", "sources")
+
+    db.flush()
+    index_leads(db, primary.org_id, [(primary.id, lead_fields(primary))])
+    return primary
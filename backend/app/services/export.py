@@ -0,0 +1,176 @@
+"""
+Export Service - Streaming lead export as CSV, NDJSON or Parquet
+Rows are read through a server-side cursor and encoded a chunk at a time, so
+memory stays flat whatever the export size and the first bytes go out before
+the query has finished.
+"""
+
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator, List, Sequence
+import csv
+import io
+import json
+
+from sqlalchemy.orm import Query, Session
+
+from app.database import SessionLocal
+from app.models import Lead
+
+EXPORT_COLUMNS = (
+    "id", "company_name", "company_name_ar", "website", "industry",
+    "contact_name", "contact_title", "email", "phone", "linkedin_url",
+    "funding_amount", "funding_stage", "employee_count", "location",
+    "source_url", "score", "status", "tags", "notes", "created_at", "updated_at",
+)
+
+CHUNK_ROWS = 1000
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _rows(build_query: Callable[[Any], Query], session_factory: Callable[[], Session]) -> Iterator[Sequence[Any]]:
+    """Stream (EXPORT_COLUMNS) tuples on a session owned by the generator"""
+    db = session_factory()
+    try:
+        query = build_query(db.query(*[getattr(Lead, c) for c in EXPORT_COLUMNS]))
+        for row in query.yield_per(CHUNK_ROWS):
+            yield row
+    finally:
+        db.close()
+
+
+def _batches(rows: Iterable[Sequence[Any]], size: int = CHUNK_ROWS) -> Iterator[List[Sequence[Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _text(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return ";".join(value)
+    return value
+
+
+def csv_chunks(rows: Iterable[Sequence[Any]]) -> Iterator[bytes]:
+    # The BOM makes Excel open the file as UTF-8 so Arabic renders correctly
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+
+    for batch in _batches(rows):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_text(v) for v in row] for row in batch)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _json_default(value: Any) -> str:
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def ndjson_chunks(rows: Iterable[Sequence[Any]]) -> Iterator[bytes]:
+    for batch in _batches(rows):
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False, default=_json_default) + "\n"
+            for row in batch
+        ).encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def parquet_chunks(rows: Iterable[Sequence[Any]]) -> Iterator[bytes]:
+    """One row group per batch; the footer is written when the rows run out"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.string()),
+        ("company_name", pa.string()),
+        ("company_name_ar", pa.string()),
+        ("website", pa.string()),
+        ("industry", pa.string()),
+        ("contact_name", pa.string()),
+        ("contact_title", pa.string()),
+        ("email", pa.string()),
+        ("phone", pa.string()),
+        ("linkedin_url", pa.string()),
+        ("funding_amount", pa.string()),
+        ("funding_stage", pa.string()),
+        ("employee_count", pa.string()),
+        ("location", pa.string()),
+        ("source_url", pa.string()),
+        ("score", pa.int32()),
+        ("status", pa.string()),
+        ("tags", pa.list_(pa.string())),
+        ("notes", pa.string()),
+        ("created_at", pa.timestamp("us")),
+        ("updated_at", pa.timestamp("us")),
+    ])
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for batch in _batches(rows):
+            columns = list(zip(*batch))
+            columns[0] = [str(v) for v in columns[0]]
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            ))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+ENCODERS = {
+    "csv": csv_chunks,
+    "ndjson": ndjson_chunks,
+    "parquet": parquet_chunks,
+}
+
+
+def export_leads(
+    build_query: Callable[[Any], Query], fmt: str, session_factory: Callable[[], Session] = SessionLocal
+) -> Iterator[bytes]:
+    """Byte chunks of the export; `build_query` adds org scope, filters and order"""
+    return ENCODERS[fmt](_rows(build_query, session_factory))
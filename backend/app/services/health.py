@@ -0,0 +1,257 @@
+"""
+Health Service - Cached dependency checks behind the status and probe endpoints
+A background thread measures database round-trip latency, pool saturation,
+task queue depth, AI upstream reachability and read replica lag every few
+seconds. The probe endpoints only read the last snapshot, so a platform
+polling them never adds load to the database or the AI API. The AI upstream
+is only probed every HEALTH_AI_PROBE_INTERVAL_SECONDS while its circuit
+breaker is closed: real calls already trip the breaker when it fails.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional, Tuple
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CheckStatus:
+    ok = "ok"
+    degraded = "degraded"
+    down = "down"
+    disabled = "disabled"
+
+
+# A failing critical check takes the instance out of rotation; the rest only degrade it
+CRITICAL_CHECKS = ("database", "pool")
+
+# Read in-process counters only; run before the others so the connection
+# check_database holds is not counted as load
+INLINE_CHECKS = ("pool",)
+
+
+def _timed(fn: Callable[[], Any]) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    result = fn()
+    return result, round((time.perf_counter() - started) * 1000, 1)
+
+
+def check_database() -> Dict[str, Any]:
+    from app.database import engine
+
+    def round_trip():
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    _, latency = _timed(round_trip)
+    degraded = latency > settings.HEALTH_DB_LATENCY_DEGRADED_MS
+    return {"status": CheckStatus.degraded if degraded else CheckStatus.ok, "latency_ms": latency}
+
+
+def check_pool() -> Dict[str, Any]:
+    from app.database import engine
+
+    pool = engine.pool
+    capacity = pool.size() + max(getattr(pool, "_max_overflow", 0), 0)
+    in_use = pool.checkedout()
+    saturation = round(in_use / capacity, 3) if capacity else 0.0
+    if saturation >= settings.HEALTH_POOL_SATURATION_DOWN:
+        status = CheckStatus.down
+    elif saturation >= settings.HEALTH_POOL_SATURATION_DEGRADED:
+        status = CheckStatus.degraded
+    else:
+        status = CheckStatus.ok
+    return {"status": status, "in_use": in_use, "capacity": capacity, "saturation": saturation}
+
+
+def check_queue() -> Dict[str, Any]:
+    from app.workers.queue import get_queue
+
+    depth, latency = _timed(get_queue().depth)
+    degraded = depth > settings.HEALTH_QUEUE_DEPTH_DEGRADED
+    return {"status": CheckStatus.degraded if degraded else CheckStatus.ok, "depth": depth, "latency_ms": latency}
+
+
+_ai_probe: Dict[str, Any] = {"at": None, "result": None}
+
+
+def probe_ai() -> Dict[str, Any]:
+    """One reachability probe of the AI upstream"""
+    from app.services.ai_service import get_ai_service
+
+    # Any HTTP answer means the upstream is reachable; only transport errors raise
+    try:
+        _, latency = _timed(get_ai_service().warm)
+        return {"status": CheckStatus.ok, "latency_ms": latency}
+    except Exception as e:
+        logger.warning("AI upstream probe failed: %s", e)
+        return {"status": CheckStatus.down, "error": type(e).__name__}
+
+
+def record_ai_probe(result: Dict[str, Any]) -> None:
+    """Use a probe made elsewhere (the startup warmup) until the next one is due"""
+    _ai_probe["result"] = result
+    _ai_probe["at"] = time.monotonic()
+
+
+def check_ai() -> Dict[str, Any]:
+    if not settings.ANTHROPIC_API_KEY:
+        return {"status": CheckStatus.disabled}
+    from app.services.call_policy import get_call_policy
+
+    breaker = get_call_policy().breaker.state
+    if _ai_probe["at"] is None:
+        # The startup round gates readiness: leave the first probe to the background
+        # warmup (which records it) or to the next interval, never to this round
+        record_ai_probe({"status": CheckStatus.ok, "probe": "pending"})
+    elif breaker != "closed" or time.monotonic() - _ai_probe["at"] >= settings.HEALTH_AI_PROBE_INTERVAL_SECONDS:
+        record_ai_probe(probe_ai())
+
+    result = dict(_ai_probe["result"], breaker=breaker, probed_seconds_ago=round(time.monotonic() - _ai_probe["at"], 1))
+    if result["status"] == CheckStatus.ok and breaker != "closed":
+        result["status"] = CheckStatus.degraded
+    return result
+
+
+def check_replica() -> Dict[str, Any]:
+    from app.database import read_engine
+
+    if read_engine is None:
+        return {"status": CheckStatus.disabled}
+    from app.services.read_routing import replica_lag
+
+    lag, latency = _timed(replica_lag)
+    degraded = lag > settings.READ_REPLICA_MAX_LAG_SECONDS
+    return {"status": CheckStatus.degraded if degraded else CheckStatus.ok, "lag_seconds": round(lag, 3),
+            "latency_ms": latency}
+
+
+CHECKS: Dict[str, Callable[[], Dict[str, Any]]] = {
+    "database": check_database,
+    "pool": check_pool,
+    "queue": check_queue,
+    "ai": check_ai,
+    "replica": check_replica,
+}
+
+
+class HealthMonitor:
+    """Runs every check on an interval and keeps the last snapshot"""
+
+    def __init__(
+        self,
+        interval: float = settings.HEALTH_CHECK_INTERVAL_SECONDS,
+        timeout: float = settings.HEALTH_CHECK_TIMEOUT_SECONDS,
+        checks: Optional[Dict[str, Callable[[], Dict[str, Any]]]] = None,
+    ):
+        self.interval = interval
+        self.timeout = timeout
+        self.checks = checks or CHECKS
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # One spare worker per check, so a hung check cannot block the next round
+        self._pool = ThreadPoolExecutor(max_workers=len(self.checks) * 2, thread_name_prefix="health-check")
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._checked_at: Optional[float] = None
+        self.rounds = 0
+
+    def run_checks(self) -> None:
+        results = {}
+        for name in INLINE_CHECKS:
+            if name in self.checks:
+                try:
+                    results[name] = self.checks[name]()
+                except Exception as e:
+                    results[name] = self._failed(name, e)
+
+        futures = {name: self._pool.submit(check) for name, check in self.checks.items() if name not in results}
+        deadline = time.monotonic() + self.timeout
+        for name, future in futures.items():
+            try:
+                results[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeout:
+                results[name] = {"status": CheckStatus.down, "error": f"timed out after {self.timeout}s"}
+            except Exception as e:
+                results[name] = self._failed(name, e)
+        with self._lock:
+            self._results = results
+            self._checked_at = time.monotonic()
+            self.rounds += 1
+
+    @staticmethod
+    def _failed(name: str, error: Exception) -> Dict[str, Any]:
+        logger.warning("Health check %s failed: %s", name, error)
+        return {"status": CheckStatus.down, "error": type(error).__name__}
+
+    def snapshot(self) -> Tuple[Dict[str, Dict[str, Any]], Optional[float]]:
+        """Last results and their age in seconds (None before the first round)"""
+        with self._lock:
+            age = time.monotonic() - self._checked_at if self._checked_at is not None else None
+            return dict(self._results), age
+
+    def readiness(self) -> Dict[str, Any]:
+        results, age = self.snapshot()
+        if age is None:
+            return {"ready": False, "status": "starting", "reason": "no checks yet", "checks": {}}
+        if age > settings.HEALTH_STALE_AFTER_SECONDS:
+            return {"ready": False, "status": "unhealthy", "reason": "checks stale", "age_seconds": round(age, 1),
+                    "checks": results}
+
+        failing = [name for name in CRITICAL_CHECKS if results.get(name, {}).get("status") == CheckStatus.down]
+        if failing:
+            status = "unhealthy"
+        elif any(r.get("status") in (CheckStatus.degraded, CheckStatus.down) for r in results.values()):
+            status = "degraded"
+        else:
+            status = "healthy"
+        report = {"ready": not failing, "status": status, "age_seconds": round(age, 1), "checks": results}
+        if failing:
+            report["reason"] = ", ".join(failing)
+        return report
+
+    def liveness(self) -> Dict[str, Any]:
+        """Alive unless the check loop itself has stopped making progress"""
+        _, age = self.snapshot()
+        running = self._thread is not None and self._thread.is_alive()
+        stalled = age is not None and age > settings.HEALTH_LIVENESS_STALL_SECONDS
+        return {"alive": running and not stalled, "checker_running": running,
+                "age_seconds": round(age, 1) if age is not None else None}
+
+    # ---------- lifecycle ----------
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="health-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self._pool.shutdown(wait=False)
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            try:
+                self.run_checks()
+            except Exception:
+                logger.exception("Health checks failed")
+
+
+_health_monitor: Optional[HealthMonitor] = None
+
+def get_health_monitor() -> HealthMonitor:
+    global _health_monitor
+    if _health_monitor is None:
+        _health_monitor = HealthMonitor()
+    return _health_monitor
@@ -0,0 +1,222 @@
+"""
+Read Routing - Send read-only routes to the replica without losing read-your-writes
+GET routes for leads, campaigns and the dashboard take a session from
+get_read_db. It is a replica session unless:
+  - no DATABASE_READ_URL is configured,
+  - the user committed a write in the last READ_STICKY_SECONDS (their own
+    changes may not have replicated yet), or a background task wrote to
+    the user's org in that window, or
+  - the health monitor reports the replica down or lagging beyond
+    READ_REPLICA_MAX_LAG_SECONDS.
+Writes are noticed on the primary session at commit. A session that an API
+request authenticated (attribute_writes) makes only that user sticky; writes
+nobody is attributed with, such as imports and campaign sends in the task
+worker, make the whole org sticky.
+"""
+
+from itertools import chain
+from typing import Any, Callable, Dict, Generator, List, Optional, Set
+from uuid import UUID
+import logging
+import threading
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import ReadSessionLocal, SessionLocal, read_engine
+from app.serving import process_count, single_process
+
+logger = logging.getLogger(__name__)
+
+_READ_ONLY = "read_only"
+_WRITERS = "writing_orgs"
+_WRITER_USER = "writing_user"
+
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+def replica_lag() -> float:
+    """Seconds the replica's replay is behind (0 when it has replayed everything received)"""
+    with read_engine.connect() as connection:
+        return float(connection.execute(REPLICA_LAG_SQL).scalar() or 0)
+
+
+def _user_key(user_id: UUID) -> str:
+    return f"user:{user_id}"
+
+
+def _org_key(org_id: UUID) -> str:
+    return f"org:{org_id}"
+
+
+class MemoryStickyStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._until: Dict[str, float] = {}
+
+    def mark(self, keys: Set[str], seconds: float) -> None:
+        until = time.monotonic() + seconds
+        with self._lock:
+            for key in keys:
+                self._until[key] = until
+            if len(self._until) > 10000:
+                now = time.monotonic()
+                self._until = {k: v for k, v in self._until.items() if v > now}
+
+    def is_sticky(self, keys: List[str]) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            return any(self._until.get(key, 0.0) > now for key in keys)
+
+
+class RedisStickyStore:
+    """faris:rw:user:<user_id> / faris:rw:org:<org_id> exist while those reads must stay on the primary"""
+
+    def __init__(self, url: str = settings.REDIS_URL, prefix: str = "faris:rw:"):
+        import redis
+
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url, socket_timeout=0.5)
+
+    def mark(self, keys: Set[str], seconds: float) -> None:
+        pipe = self._redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.set(f"{self.prefix}{key}", 1, px=int(seconds * 1000))
+        pipe.execute()
+
+    def is_sticky(self, keys: List[str]) -> bool:
+        return bool(self._redis.exists(*(f"{self.prefix}{key}" for key in keys)))
+
+
+class ReadRouter:
+    def __init__(self):
+        self.store = RedisStickyStore() if settings.READ_STICKY_BACKEND == "redis" else MemoryStickyStore()
+        # Per-process stickiness cannot see writes made by sibling web workers or the task worker
+        self.shared = settings.READ_STICKY_BACKEND == "redis" or single_process()
+        if read_engine is not None and not self.shared:
+            logger.warning(
+                "Read replica disabled: memory sticky store with %d web processes and %s task workers",
+                process_count(), settings.TASK_QUEUE_BACKEND,
+            )
+        self.replica_reads = 0
+        self.sticky_reads = 0
+        self.lagging_reads = 0
+
+    @property
+    def enabled(self) -> bool:
+        return read_engine is not None and self.shared
+
+    def mark_written(self, org_ids: Set[UUID], user_id: Optional[UUID] = None) -> None:
+        """The user's reads stay on the primary for a while; every org's when no user wrote"""
+        if not self.enabled or not org_ids:
+            return
+        keys = {_user_key(user_id)} if user_id else {_org_key(org_id) for org_id in org_ids}
+        try:
+            self.store.mark(keys, settings.READ_STICKY_SECONDS)
+        except Exception:
+            logger.warning("Could not record writes for read routing", exc_info=True)
+
+    def use_replica(self, org_id: UUID, user_id: UUID) -> bool:
+        if not self.enabled:
+            return False
+        if not self._replica_healthy():
+            self.lagging_reads += 1
+            return False
+        try:
+            sticky = self.store.is_sticky([_user_key(user_id), _org_key(org_id)])
+        except Exception:
+            logger.warning("Sticky store unavailable, reading from the primary", exc_info=True)
+            sticky = True
+        if sticky:
+            self.sticky_reads += 1
+            return False
+        self.replica_reads += 1
+        return True
+
+    def _replica_healthy(self) -> bool:
+        from app.services.health import CheckStatus, get_health_monitor
+
+        results, _ = get_health_monitor().snapshot()
+        replica = results.get("replica")
+        return replica is not None and replica["status"] == CheckStatus.ok
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "replica_reads": self.replica_reads,
+            "sticky_reads": self.sticky_reads,
+            "lagging_reads": self.lagging_reads,
+        }
+
+
+_read_router: Optional[ReadRouter] = None
+
+def get_read_router() -> ReadRouter:
+    global _read_router
+    if _read_router is None:
+        _read_router = ReadRouter()
+    return _read_router
+
+
+def read_session_factory(org_id: UUID, user_id: UUID) -> Callable[[], Session]:
+    """The replica's session factory when it is safe for this user, else the primary's"""
+    return ReadSessionLocal if get_read_router().use_replica(org_id, user_id) else SessionLocal
+
+
+def read_session(org_id: UUID, user_id: UUID) -> Generator[Session, None, None]:
+    """Session for a read-only route"""
+    db = read_session_factory(org_id, user_id)()
+    db.info[_READ_ONLY] = True
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def attribute_writes(db: Session, user_id: UUID) -> None:
+    """Writes committed on `db` are the user's: only their reads go sticky"""
+    db.info[_WRITER_USER] = user_id
+
+
+@event.listens_for(Session, "before_flush")
+def _refuse_writes(session: Session, flush_context, instances) -> None:
+    if session.info.get(_READ_ONLY) and (session.new or session.dirty or session.deleted):
+        raise RuntimeError("Write attempted on a read-only session")
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_writers(session: Session, flush_context) -> None:
+    writers: Set[UUID] = session.info.setdefault(_WRITERS, set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        org_id = getattr(obj, "org_id", None)
+        if org_id:
+            writers.add(org_id)
+
+
+@event.listens_for(Session, "before_commit")
+def _collect_marked(session: Session) -> None:
+    # Core and bulk writes announce their org through mark_changed()
+    from app.services.collection_versions import changed_orgs
+
+    orgs = changed_orgs(session)
+    if orgs:
+        session.info.setdefault(_WRITERS, set()).update(orgs)
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_sticky(session: Session) -> None:
+    writers = session.info.pop(_WRITERS, None)
+    if writers:
+        get_read_router().mark_written(writers, session.info.get(_WRITER_USER))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_writers(session: Session) -> None:
+    session.info.pop(_WRITERS, None)
@@ -0,0 +1,113 @@
+"""
+Reference Cache - In-process cache of rarely changing responses with ETags
+Entries hold the serialized JSON body and a strong ETag (hash of the body),
+so a matching If-None-Match is answered with 304 without loading or
+serializing anything. Writes in this process invalidate their key; other
+processes pick the change up when the entry's TTL runs out. Keys that writes
+invalidate are not cached at all when several web processes serve, since an
+invalidation would only reach one of them.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional
+import hashlib
+import threading
+import time
+
+from fastapi import Request, Response
+
+from app.config import settings
+from app.serving import process_count
+from app.services.serialization import json_bytes
+
+
+@dataclass
+class CachedBody:
+    body: bytes
+    etag: str
+    loaded_at: float
+
+
+def strong_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 prescribes for If-None-Match
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(etag: str, cache_control: str = "private, no-cache") -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def cached_response(request: Request, entry: CachedBody, cache_control: str = "private, no-cache") -> Response:
+    if etag_matches(request, entry.etag):
+        return not_modified(entry.etag, cache_control)
+    return Response(
+        content=entry.body,
+        media_type="application/json",
+        headers={"ETag": entry.etag, "Cache-Control": cache_control},
+    )
+
+
+def invalidated_ttl(ttl: float) -> float:
+    """TTL for a key that writes invalidate: 0 once other processes would miss the invalidation"""
+    return ttl if process_count() == 1 else 0.0
+
+
+class ReferenceCache:
+    def __init__(self, ttl: float = settings.REFERENCE_CACHE_TTL_SECONDS, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, CachedBody] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, load: Callable[[], Any], ttl: Optional[float] = None) -> CachedBody:
+        """Cached entry for `key`, calling `load` for the payload when missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.loaded_at < (self.ttl if ttl is None else ttl):
+                self.hits += 1
+                return entry
+            self.misses += 1
+            generation = self._generation
+
+        body = json_bytes(load())
+        entry = CachedBody(body=body, etag=strong_etag(body), loaded_at=now)
+        with self._lock:
+            # An invalidation during the load means the payload may already be stale
+            if generation != self._generation:
+                return entry
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[key] = entry
+        return entry
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generation += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_reference_cache: Optional[ReferenceCache] = None
+
+def get_reference_cache() -> ReferenceCache:
+    global _reference_cache
+    if _reference_cache is None:
+        _reference_cache = ReferenceCache()
+    return _reference_cache
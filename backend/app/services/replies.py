@@ -0,0 +1,178 @@
+"""
+Replies Service - Inbound reply ingestion and analysis
+Provider webhooks are queued untouched (replies.ingest); ingestion matches
+replies to messages by external_id, stores them once (keyed on the provider's
+reply id), and moves messages, leads and campaign counters forward in one
+statement each. Analysis (replies.analyze) sends a few replies per LLM call with
+at most REPLY_ANALYSIS_CONCURRENCY calls in flight per process.
+"""
+
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+from uuid import UUID
+import threading
+
+from sqlalchemy import DateTime, Integer, cast, column, func, select, update, values
+from sqlalchemy.dialects.postgresql import JSONB, UUID as PG_UUID, insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Campaign, Lead, Message, MessageReply
+from app.services.campaign_stats import apply_transitions
+from app.services.collection_versions import mark_changed
+
+# Lead statuses a reply moves forward to "replied"
+REPLYABLE_LEAD_STATUSES = ("new", "contacted")
+
+_analysis_slots = threading.BoundedSemaphore(settings.REPLY_ANALYSIS_CONCURRENCY)
+
+
+def _utc_naive(value: datetime) -> datetime:
+    # Columns are TIMESTAMP in UTC; an offset would otherwise be silently dropped
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def ingest_replies(db: Session, events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Store new replies and update counters; returns {org_id: [reply ids]} to analyze"""
+    external_ids = list({e["external_id"] for e in events})
+    messages = {
+        row.external_id: row
+        for row in db.execute(
+            select(Message.id, Message.org_id, Message.external_id)
+            .where(Message.external_id.in_(external_ids))
+        )
+    }
+
+    rows = []
+    for event in events:
+        message = messages.get(event["external_id"])
+        if message is None:
+            continue
+        rows.append({
+            "org_id": message.org_id,
+            "message_id": message.id,
+            "external_id": event["reply_id"],
+            "from_address": event.get("from_address"),
+            "body": event["body"],
+            "received_at": _utc_naive(event["received_at"]),
+        })
+    if not rows:
+        return {"matched": 0, "new": 0, "unmatched": len(events), "pending": {}}
+
+    # Provider retries resend the same reply ids; only first deliveries come back
+    inserted = db.execute(
+        pg_insert(MessageReply).values(rows)
+        .on_conflict_do_nothing(index_elements=["external_id"])
+        .returning(MessageReply.id, MessageReply.org_id, MessageReply.message_id, MessageReply.received_at)
+    ).all()
+
+    first_reply: Dict[UUID, datetime] = {}
+    pending: Dict[UUID, List[UUID]] = defaultdict(list)
+    for reply in inserted:
+        pending[reply.org_id].append(reply.id)
+        if reply.message_id not in first_reply or reply.received_at < first_reply[reply.message_id]:
+            first_reply[reply.message_id] = reply.received_at
+
+    if first_reply:
+        v = values(
+            column("id", PG_UUID(as_uuid=True)), column("ts", DateTime), name="v"
+        ).data(list(first_reply.items()))
+        # Locked and re-read under the lock, so the old status is the one being replaced
+        old = (
+            select(Message.org_id, Message.id, Message.status)
+            .where(Message.id.in_(list(first_reply)))
+            .with_for_update()
+            .subquery("old")
+        )
+        newly_replied = db.execute(
+            update(Message)
+            .where(Message.id == v.c.id)
+            .where(Message.org_id == old.c.org_id, Message.id == old.c.id)
+            .where(Message.replied_at.is_(None))
+            .values(status="replied", replied_at=v.c.ts)
+            .returning(Message.org_id, Message.campaign_id, Message.lead_id, Message.channel, old.c.status)
+        ).all()
+        apply_transitions(db, (
+            (r.org_id, r.campaign_id, r.channel, r.status, "replied") for r in newly_replied
+        ))
+
+        per_campaign = Counter(r.campaign_id for r in newly_replied if r.campaign_id)
+        if per_campaign:
+            c = values(
+                column("id", PG_UUID(as_uuid=True)), column("n", Integer), name="c"
+            ).data(list(per_campaign.items()))
+            db.execute(
+                update(Campaign)
+                .where(Campaign.id == c.c.id)
+                .values(replies_received=func.coalesce(Campaign.replies_received, 0) + c.c.n)
+            )
+
+        lead_ids = list({r.lead_id for r in newly_replied if r.lead_id})
+        if lead_ids:
+            db.execute(
+                update(Lead)
+                .where(Lead.id.in_(lead_ids), Lead.status.in_(REPLYABLE_LEAD_STATUSES))
+                .values(status="replied", status_updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+        for org_id in pending:
+            mark_changed(db, org_id, "leads", "campaigns")
+    db.commit()
+
+    return {
+        "matched": len(rows),
+        "new": len(inserted),
+        "unmatched": len(events) - len(rows),
+        "pending": {str(org_id): [str(i) for i in ids] for org_id, ids in pending.items()},
+    }
+
+
+def analyze_replies(db: Session, org_id: UUID, reply_ids: List[UUID]) -> Dict[str, int]:
+    """Run the Inshallah Decoder over unanalyzed replies of one org"""
+    from app.services.ai_service import get_ai_service
+    from app.services.usage_service import get_usage_meter
+
+    replies = db.execute(
+        select(MessageReply.id, MessageReply.body, Message.lead_id)
+        .join(Message, Message.id == MessageReply.message_id)
+        .where(MessageReply.org_id == org_id, MessageReply.id.in_(reply_ids))
+        .where(MessageReply.analyzed_at.is_(None))
+    ).all()
+    if not replies:
+        return {"analyzed": 0, "skipped": 0}
+
+    meter = get_usage_meter()
+    if not meter.check_limit(db, org_id, "ai_generations", len(replies)):
+        return {"analyzed": 0, "skipped": len(replies)}
+
+    with _analysis_slots:
+        result = get_ai_service().analyze_responses([r.body for r in replies])
+
+    now = datetime.utcnow()
+    v = values(
+        column("id", PG_UUID(as_uuid=True)), column("analysis", JSONB), name="v"
+    ).data([(r.id, analysis) for r, analysis in zip(replies, result["results"])])
+    db.execute(
+        update(MessageReply)
+        .where(MessageReply.id == v.c.id)
+        .values(analysis=cast(v.c.analysis, JSONB), analyzed_at=now)
+    )
+
+    # A clear "no" closes the lead; anything else leaves it with the sales team
+    declined = [r.lead_id for r, a in zip(replies, result["results"]) if a.get("intent") == "not_interested"]
+    if declined:
+        db.execute(
+            update(Lead)
+            .where(Lead.id.in_(declined), Lead.status == "replied")
+            .values(status="not_interested", status_updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        mark_changed(db, org_id, "leads")
+    db.commit()
+
+    meter.record(org_id, "ai_generations", len(replies))
+    meter.record(org_id, "ai_tokens_used", result["tokens_used"])
+    return {"analyzed": len(replies), "skipped": 0}
@@ -0,0 +1,409 @@
+"""
+Scraper Service - Concurrent, incremental lead extraction for data sources
+Fetches a source's pages with per-host concurrency limits and politeness
+delays, skips unchanged pages with ETag / If-Modified-Since, and upserts the
+extracted leads in batches keyed on (org_id, source_url).
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from urllib.parse import urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+from uuid import UUID
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import xml.etree.ElementTree as ET
+
+import httpx
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import DataSource, Lead
+from app.services.collection_versions import mark_changed
+from app.services.dedup import IDENTITY_FIELDS, index_leads
+from app.services.usage_service import get_usage_meter
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "FarisAI-Scraper/1.0 (+https://farisai.app)"
+
+# scrape_config keys that may be mapped straight onto Lead columns
+LEAD_FIELDS = (
+    "company_name", "company_name_ar", "website", "industry", "contact_name", "contact_title",
+    "email", "phone", "linkedin_url", "funding_amount", "funding_stage", "employee_count", "location"
+)
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int
+    body: bytes = b""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+
+@dataclass
+class ScrapeReport:
+    pages_fetched: int = 0
+    pages_unchanged: int = 0
+    items_found: int = 0
+    leads_created: int = 0
+    leads_updated: int = 0
+    errors: List[str] = field(default_factory=list)
+
+
+# ==================== FETCHING ====================
+
+class HostThrottle:
+    """Caps concurrent requests per host and spaces them by a politeness delay"""
+
+    def __init__(self, per_host: int, delay: float):
+        self.per_host = per_host
+        self.delay = delay
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._next_slot: Dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, host: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.per_host))
+        await semaphore.acquire()
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.delay
+        if slot > now:
+            await asyncio.sleep(slot - now)
+        return semaphore
+
+
+class Fetcher:
+    """HTTP client wrapper with conditional requests and robots.txt checks"""
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        self._owns_client = client is None
+        self.client = client or httpx.AsyncClient(
+            timeout=settings.SCRAPER_TIMEOUT_SECONDS,
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+        )
+        self.throttle = HostThrottle(settings.SCRAPER_PER_HOST_CONCURRENCY, settings.SCRAPER_POLITENESS_DELAY_SECONDS)
+        self._robots: Dict[str, Optional[RobotFileParser]] = {}
+
+    async def close(self) -> None:
+        if self._owns_client:
+            await self.client.aclose()
+
+    async def fetch(self, url: str, validators: Optional[Dict[str, str]] = None) -> FetchResult:
+        host = urlsplit(url).netloc
+        if not await self._allowed(url, host):
+            raise PermissionError(f"Disallowed by robots.txt: {url}")
+
+        headers = {}
+        if validators:
+            if validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
+
+        semaphore = await self.throttle.acquire(host)
+        try:
+            response = await self.client.get(url, headers=headers)
+        finally:
+            semaphore.release()
+
+        if response.status_code == 304:
+            return FetchResult(url, 304)
+        response.raise_for_status()
+        return FetchResult(
+            url,
+            response.status_code,
+            response.content,
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+        )
+
+    async def _allowed(self, url: str, host: str) -> bool:
+        if host not in self._robots:
+            parts = urlsplit(url)
+            robots_url = f"{parts.scheme}://{host}/robots.txt"
+            parser = None
+            try:
+                response = await self.client.get(robots_url)
+                if response.status_code == 200:
+                    parser = RobotFileParser(robots_url)
+                    parser.parse(response.text.splitlines())
+            except httpx.HTTPError:
+                pass
+            self._robots[host] = parser
+        parser = self._robots[host]
+        return parser is None or parser.can_fetch(USER_AGENT, url)
+
+
+# ==================== EXTRACTION ====================
+
+def extract_items(source_type: str, config: Dict[str, Any], body: bytes, page_url: str) -> List[Dict[str, Any]]:
+    """Turn a fetched page into raw item dicts according to scrape_config"""
+    if source_type == "rss":
+        return _extract_rss(body, page_url)
+    if source_type == "api":
+        return _extract_api(config, body, page_url)
+    return _extract_html(config, body, page_url)
+
+
+def _extract_html(config: Dict[str, Any], body: bytes, page_url: str) -> List[Dict[str, Any]]:
+    from bs4 import BeautifulSoup
+
+    selector = config.get("selector")
+    if not selector:
+        raise ValueError("scrape_config has no 'selector'")
+
+    soup = BeautifulSoup(body, "html.parser")
+    items = []
+    for node in soup.select(selector):
+        item = {}
+        for key, css in config.items():
+            if key in ("selector", "link", "pages", "endpoint") or not isinstance(css, str):
+                continue
+            found = node.select_one(css)
+            if found:
+                text = found.get_text(" ", strip=True)
+                item[key] = (found.get("datetime") or text) if key == "date" else text
+        link_css = config.get("link")
+        if link_css:
+            anchor = node if node.name == "a" else node.select_one(link_css)
+            if anchor and anchor.get("href"):
+                item["link"] = urljoin(page_url, anchor["href"])
+        if item:
+            items.append(item)
+    return items
+
+
+def _extract_rss(body: bytes, page_url: str) -> List[Dict[str, Any]]:
+    root = ET.fromstring(body)
+    atom = "{http://www.w3.org/2005/Atom}"
+    items = []
+    for node in root.iter("item"):
+        items.append({
+            "title": (node.findtext("title") or "").strip(),
+            "link": urljoin(page_url, (node.findtext("link") or "").strip()),
+            "date": node.findtext("pubDate"),
+            "description": node.findtext("description"),
+        })
+    for node in root.iter(f"{atom}entry"):
+        link = node.find(f"{atom}link")
+        items.append({
+            "title": (node.findtext(f"{atom}title") or "").strip(),
+            "link": urljoin(page_url, link.get("href", "")) if link is not None else None,
+            "date": node.findtext(f"{atom}updated"),
+            "description": node.findtext(f"{atom}summary"),
+        })
+    return items
+
+
+def _extract_api(config: Dict[str, Any], body: bytes, page_url: str) -> List[Dict[str, Any]]:
+    data = json.loads(body)
+    for part in (config.get("items") or "").split("."):
+        if part:
+            data = data.get(part, []) if isinstance(data, dict) else []
+    if isinstance(data, dict):
+        data = [data]
+    mapping = config.get("fields") or {}
+    items = []
+    for record in data:
+        if not isinstance(record, dict):
+            continue
+        item = dict(record)
+        for lead_field, key in mapping.items():
+            item[lead_field] = record.get(key)
+        items.append(item)
+    return items
+
+
+def item_to_lead_row(item: Dict[str, Any], source: DataSource, page_url: str) -> Optional[Dict[str, Any]]:
+    company_name = item.get("company_name") or item.get("title") or item.get("name")
+    if not company_name:
+        return None
+    source_url = item.get("link") or item.get("url")
+    if not source_url:
+        # No per-item URL: derive a stable one from the page and the item name
+        digest = hashlib.sha1(str(company_name).encode("utf-8")).hexdigest()[:12]
+        source_url = f"{page_url}#{digest}"
+
+    row = {
+        "org_id": source.org_id,
+        "company_name": str(company_name)[:255],
+        "source_id": source.id,
+        "source_url": source_url,
+        "raw_data": {**{k: v for k, v in item.items() if _jsonable(v)}, "page_url": page_url},
+        "status": "new",
+        "score": 0,
+    }
+    for key in LEAD_FIELDS:
+        if key != "company_name" and item.get(key):
+            row[key] = str(item[key])
+    if not row.get("industry") and source.industry_source is not None:
+        row["industry"] = source.industry_source.industry
+    return row
+
+
+def _jsonable(value: Any) -> bool:
+    return value is None or isinstance(value, (str, int, float, bool, list, dict))
+
+
+# ==================== PERSISTENCE ====================
+
+def upsert_leads(db, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Insert new leads, refresh raw_data on existing ones; one statement per batch"""
+    if not rows:
+        return {"created": 0, "updated": 0}
+    # Last occurrence wins when a page repeats an item
+    rows = list({row["source_url"]: row for row in rows}.values())
+    # Partitioned leads cannot return xmax, so inserts are told apart by this batch's created_at
+    now = datetime.utcnow()
+    columns = set().union(*rows) | {"created_at"}
+    rows = [{c: row.get(c) for c in columns} | {"created_at": now} for row in rows]
+
+    stmt = pg_insert(Lead).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Lead.org_id, Lead.source_url],
+        index_where=Lead.source_url.isnot(None),
+        set_={"raw_data": stmt.excluded.raw_data, "updated_at": now},
+        where=Lead.raw_data.is_distinct_from(stmt.excluded.raw_data),
+    ).returning(Lead.id, Lead.source_url, (Lead.created_at == now).label("inserted"))
+
+    results = db.execute(stmt).all()
+    mark_changed(db, rows[0]["org_id"], "leads")
+    by_url = {row["source_url"]: row for row in rows}
+    created = [r for r in results if r.inserted]
+    # New leads join the dedup index
+    index_leads(db, rows[0]["org_id"], [
+        (r.id, {f: by_url[r.source_url].get(f) for f in IDENTITY_FIELDS}) for r in created
+    ])
+    return {"created": len(created), "updated": len(results) - len(created)}
+
+
+async def scrape_source(source_id: UUID, fetcher: Optional[Fetcher] = None) -> ScrapeReport:
+    """Scrape one data source and upsert its leads"""
+    db = SessionLocal()
+    owns_fetcher = fetcher is None
+    fetcher = fetcher or Fetcher()
+    report = ScrapeReport()
+    try:
+        source = db.query(DataSource).filter(DataSource.id == source_id).first()
+        if not source or not source.is_active:
+            return report
+
+        config = source.scrape_config or {}
+        base_url = source.url or (source.industry_source.url if source.industry_source else None)
+        if source.source_type == "api" and config.get("endpoint"):
+            pages = [urljoin(base_url, config["endpoint"])]
+        else:
+            pages = [urljoin(base_url, p) for p in config.get("pages", [])] or [base_url]
+
+        state = dict(source.scrape_state or {})
+        page_state = dict(state.get("pages", {}))
+        meter = get_usage_meter()
+        pending: List[Dict[str, Any]] = []
+
+        async def fetch_page(url):
+            try:
+                return await fetcher.fetch(url, page_state.get(url))
+            except Exception as e:
+                report.errors.append(f"{url}: {e}")
+                return None
+
+        def flush(batch) -> bool:
+            if not meter.check_limit(db, source.org_id, "leads_scraped", len(batch)):
+                report.errors.append("Monthly lead limit reached")
+                return False
+            counts = upsert_leads(db, batch)
+            db.commit()
+            report.leads_created += counts["created"]
+            report.leads_updated += counts["updated"]
+            meter.record(source.org_id, "leads_scraped", counts["created"])
+            return True
+
+        # A page's validators are kept only once all of its rows are committed;
+        # otherwise the next run would get a 304 for rows that were never stored
+        unsaved: Dict[str, Dict[str, Optional[str]]] = {}
+
+        async def store(batch) -> bool:
+            if not await asyncio.to_thread(flush, batch):
+                return False
+            page_state.update(unsaved)
+            unsaved.clear()
+            return True
+
+        limit_reached = False
+        for next_page in asyncio.as_completed([fetch_page(url) for url in pages if url]):
+            result = await next_page
+            if limit_reached:
+                continue
+            if result is None:
+                continue
+            if result.not_modified:
+                report.pages_unchanged += 1
+                continue
+            report.pages_fetched += 1
+            try:
+                items = extract_items(source.source_type, config, result.body, result.url)
+            except Exception as e:
+                report.errors.append(f"{result.url}: {e}")
+                continue
+            report.items_found += len(items)
+            added = False
+            for item in items:
+                row = item_to_lead_row(item, source, result.url)
+                if row:
+                    pending.append(row)
+                    added = True
+                if len(pending) >= settings.SCRAPER_BATCH_SIZE:
+                    limit_reached = not await store(pending)
+                    pending = []
+                    if limit_reached:
+                        break
+            if limit_reached:
+                continue
+            validators = {"etag": result.etag, "last_modified": result.last_modified}
+            if added and pending:
+                # Some of its rows are still buffered
+                unsaved[result.url] = validators
+            else:
+                page_state[result.url] = validators
+
+        if pending and not limit_reached:
+            await store(pending)
+
+        state["pages"] = page_state
+        source.scrape_state = state
+        source.leads_count = (source.leads_count or 0) + report.leads_created
+        source.last_scraped_at = datetime.utcnow()
+        source.last_error = "; ".join(report.errors)[:2000] or None
+        db.commit()
+        return report
+    except Exception as e:
+        db.rollback()
+        org_id = db.execute(
+            update(DataSource).where(DataSource.id == source_id)
+            .values(last_error=str(e)[:2000], last_scraped_at=datetime.utcnow())
+            .returning(DataSource.org_id)
+        ).scalar()
+        if org_id:
+            mark_changed(db, org_id, "sources")
+        db.commit()
+        raise
+    finally:
+        if owns_fetcher:
+            await fetcher.close()
+        db.close()
@@ -0,0 +1,70 @@
+"""
+Serialization - Negotiated response formats for data-heavy endpoints
+JSON goes out as compact UTF-8 with Arabic left unescaped; clients that send
+Accept: application/msgpack get the same document as MessagePack. Both skip
+FastAPI's second validation pass over response_model, since the payload is
+already a validated schema object.
+"""
+
+from typing import Any, Optional
+import importlib.util
+import json
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+# Optional; JSON only without it. Imported on first use to keep startup lean
+MSGPACK_AVAILABLE = importlib.util.find_spec("msgpack") is not None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+def plain(payload: Any) -> Any:
+    """JSON-ready data; schema objects go through pydantic-core, which is far
+    cheaper than jsonable_encoder's per-field walk"""
+    if isinstance(payload, BaseModel):
+        return payload.model_dump(mode="json")
+    if isinstance(payload, list) and all(isinstance(item, BaseModel) for item in payload):
+        return [item.model_dump(mode="json") for item in payload]
+    return jsonable_encoder(payload)
+
+
+def json_bytes(payload: Any) -> bytes:
+    """JSON bytes identical to what FastAPI's JSONResponse would send"""
+    return json.dumps(plain(payload), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def msgpack_bytes(payload: Any) -> bytes:
+    import msgpack
+
+    return msgpack.packb(plain(payload), use_bin_type=True)
+
+
+def response_format(request: Request) -> str:
+    """MSGPACK when the client asks for it (with q > 0) and we can produce it"""
+    accept = request.headers.get("accept", "")
+    if not MSGPACK_AVAILABLE or "msgpack" not in accept:
+        return JSON
+    for part in accept.split(","):
+        media_type, _, params = part.strip().partition(";")
+        if media_type.strip().lower() in MSGPACK_TYPES:
+            params = params.strip()
+            try:
+                q = float(params[2:]) if params.startswith("q=") else 1.0
+            except ValueError:
+                q = 0.0
+            return MSGPACK if q > 0 else JSON
+    return JSON
+
+
+def negotiated(request: Request, payload: Any, response: Optional[Response] = None) -> Response:
+    """Render `payload` in the requested format, keeping headers already set on `response`"""
+    media_type = response_format(request)
+    body = msgpack_bytes(payload) if media_type == MSGPACK else json_bytes(payload)
+    headers = dict(response.headers) if response is not None else {}
+    headers.pop("content-length", None)
+    headers["Vary"] = "Accept"
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -0,0 +1,214 @@
+"""
+Template Service - Compiled mail-merge templates for campaign messages
+Placeholders use lead fields by English or Arabic name, with fallbacks:
+
+    {{contact_name | "فريق العمل"}}       field, else literal
+    {{company_name_ar | company_name}}   field, else another field
+    {% if funding_amount %}...{% else %}...{% endif %}
+    {% إذا المجال %}...{% وإلا %}...{% انتهى %}
+
+Templates are parsed once into a flat list of closures and cached per campaign
+(id + updated_at), so rendering is a join over pre-bound callables.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Mapping, Optional, Tuple
+import re
+import threading
+
+Renderer = Callable[[Mapping[str, Any]], str]
+
+FIELDS = (
+    "company_name", "company_name_ar", "website", "industry", "contact_name",
+    "contact_title", "email", "phone", "linkedin_url", "funding_amount",
+    "funding_stage", "employee_count", "location", "sender_company",
+)
+
+ARABIC_ALIASES = {
+    "الشركة": "company_name",
+    "اسم_الشركة": "company_name",
+    "اسم_الشركة_بالعربي": "company_name_ar",
+    "الموقع_الإلكتروني": "website",
+    "المجال": "industry",
+    "الاسم": "contact_name",
+    "جهة_الاتصال": "contact_name",
+    "المنصب": "contact_title",
+    "البريد": "email",
+    "الجوال": "phone",
+    "التمويل": "funding_amount",
+    "مرحلة_التمويل": "funding_stage",
+    "عدد_الموظفين": "employee_count",
+    "المدينة": "location",
+    "الموقع": "location",
+    "شركتنا": "sender_company",
+}
+
+KEYWORDS = {
+    "if": "if", "إذا": "if",
+    "elif": "elif", "وإذا": "elif",
+    "else": "else", "وإلا": "else",
+    "endif": "endif", "انتهى": "endif",
+}
+
+_TOKEN = re.compile(r"(\{\{.*?\}\}|\{%.*?%\})", re.DOTALL)
+_STRING = re.compile(r'^"(.*)"$|^\'(.*)\'$', re.DOTALL)
+
+
+class TemplateError(ValueError):
+    pass
+
+
+def _field(name: str) -> str:
+    name = name.strip()
+    field = ARABIC_ALIASES.get(name, name)
+    if field not in FIELDS:
+        raise TemplateError(f"حقل غير معروف: {name}")
+    return field
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return "، ".join(str(v) for v in value if v)
+    return str(value).strip()
+
+
+def _compile_variable(expression: str) -> Renderer:
+    options: List[Tuple[bool, str]] = []
+    for part in expression.split("|"):
+        part = part.strip()
+        literal = _STRING.match(part)
+        if literal:
+            options.append((True, literal.group(1) if literal.group(1) is not None else literal.group(2)))
+        else:
+            options.append((False, _field(part)))
+
+    if len(options) == 1 and not options[0][0]:
+        field = options[0][1]
+        return lambda row: _text(row.get(field))
+
+    def render(row: Mapping[str, Any]) -> str:
+        for is_literal, value in options:
+            if is_literal:
+                return value
+            text = _text(row.get(value))
+            if text:
+                return text
+        return ""
+    return render
+
+
+def _condition(expression: str) -> Callable[[Mapping[str, Any]], bool]:
+    words = expression.split()
+    negate = bool(words) and words[0] in ("not", "لا")
+    if negate:
+        words = words[1:]
+    if len(words) != 1:
+        raise TemplateError(f"شرط غير صالح: {expression}")
+    field = _field(words[0])
+    if negate:
+        return lambda row: not _text(row.get(field))
+    return lambda row: bool(_text(row.get(field)))
+
+
+def _join(parts: List[Renderer]) -> Renderer:
+    if not parts:
+        return lambda row: ""
+    if len(parts) == 1:
+        return parts[0]
+    return lambda row: "".join([part(row) for part in parts])
+
+
+def compile_template(source: Optional[str]) -> Renderer:
+    """Parse `source` into a renderer; raises TemplateError on bad syntax or fields"""
+    if not source:
+        return lambda row: ""
+
+    # Stack of open blocks: (branches [(condition, parts)], current parts)
+    root: List[Renderer] = []
+    stack: List[Tuple[List[Tuple[Optional[Callable], List[Renderer]]], List[Renderer]]] = []
+    current = root
+
+    for token in _TOKEN.split(source):
+        if not token:
+            continue
+        if token.startswith("{{"):
+            current.append(_compile_variable(token[2:-2]))
+        elif token.startswith("{%"):
+            words = token[2:-2].strip().split(None, 1)
+            keyword = KEYWORDS.get(words[0]) if words else None
+            argument = words[1] if len(words) > 1 else ""
+            if keyword == "if":
+                branches = [(_condition(argument), [])]
+                stack.append((branches, current))
+                current = branches[-1][1]
+            elif keyword in ("elif", "else"):
+                if not stack or stack[-1][0][-1][0] is None:
+                    raise TemplateError(f"{words[0]} بدون if")
+                branches = stack[-1][0]
+                branches.append((_condition(argument) if keyword == "elif" else None, []))
+                current = branches[-1][1]
+            elif keyword == "endif":
+                if not stack:
+                    raise TemplateError("endif بدون if")
+                branches, current = stack.pop()
+                current.append(_branch([(condition, _join(parts)) for condition, parts in branches]))
+            else:
+                raise TemplateError(f"وسم غير معروف: {token}")
+        else:
+            current.append(lambda row, text=token: text)
+
+    if stack:
+        raise TemplateError("if بدون endif")
+    return _join(root)
+
+
+def _branch(branches: List[Tuple[Optional[Callable], Renderer]]) -> Renderer:
+    def render(row: Mapping[str, Any]) -> str:
+        for condition, body in branches:
+            if condition is None or condition(row):
+                return body(row)
+        return ""
+    return render
+
+
+# ==================== CAMPAIGN CACHE ====================
+
+@dataclass
+class CompiledCampaign:
+    subject: Renderer
+    body: Renderer
+
+    def render(self, row: Mapping[str, Any]) -> Tuple[str, str]:
+        return self.subject(row).strip(), self.body(row).strip()
+
+    def render_batch(self, rows: Iterable[Mapping[str, Any]]) -> List[Tuple[str, str]]:
+        subject, body = self.subject, self.body
+        return [(subject(row).strip(), body(row).strip()) for row in rows]
+
+
+_cache: "OrderedDict[Tuple[Any, Any], CompiledCampaign]" = OrderedDict()
+_cache_lock = threading.Lock()
+CACHE_SIZE = 512
+
+
+def compiled_campaign(campaign) -> CompiledCampaign:
+    """Compiled templates for a campaign, recompiled only when it was updated"""
+    key = (campaign.id, campaign.updated_at)
+    with _cache_lock:
+        compiled = _cache.get(key)
+        if compiled is not None:
+            _cache.move_to_end(key)
+            return compiled
+
+    compiled = CompiledCampaign(
+        subject=compile_template(campaign.email_subject_template),
+        body=compile_template(campaign.message_template),
+    )
+    with _cache_lock:
+        _cache[key] = compiled
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return compiled
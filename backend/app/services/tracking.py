@@ -0,0 +1,269 @@
+"""
+Tracking Service - Open pixel and click redirect hits, written behind
+Links carry a token with the message's org and id, signed with an HMAC so it
+cannot be forged or pointed elsewhere; click tokens also sign the target URL.
+Campaign messages are rendered with their links through the click redirect and,
+for email, the open pixel appended (tracked_body).
+The endpoints only verify the token and record the hit in memory: repeat hits
+on a message coalesce to its earliest, and a flush thread writes each batch
+as one UPDATE ... FROM (VALUES ...) per kind that sets opened_at / clicked_at
+only where still NULL and moves the status (and funnel counters) forward.
+"""
+
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote, urlsplit
+from uuid import UUID
+import base64
+import hashlib
+import hmac
+import logging
+import re
+import threading
+import time
+
+from sqlalchemy import DateTime, and_, case, column, func, select, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Message
+from app.services.background import PeriodicFlusher
+from app.services.campaign_stats import apply_transitions
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_BYTES = 12
+
+# 1x1 transparent GIF
+PIXEL = base64.b64decode("R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7")
+
+# Bare http(s) links in a rendered body; trailing sentence punctuation is not part of them
+LINK_PATTERN = re.compile(r"https?://[^\s<>\"'()\[\]]+")
+LINK_TRAILING = ".,;:!?،؛؟"
+
+# A hit proves the message reached the recipient, so any earlier status moves on;
+# replied (and bounced/failed, which a hit would contradict) stay as they are
+OPENABLE_STATUSES = ("draft", "scheduled", "sending", "sent", "delivered")
+CLICKABLE_STATUSES = OPENABLE_STATUSES + ("opened",)
+
+_Key = Tuple[UUID, UUID]  # (org_id, message_id)
+
+
+# ==================== TOKENS ====================
+
+def _signing_key() -> bytes:
+    if settings.TRACKING_SECRET:
+        return settings.TRACKING_SECRET.encode()
+    return hmac.new(settings.JWT_SECRET.encode(), b"faris-tracking", hashlib.sha256).digest()
+
+
+def _signature(payload: bytes, url: Optional[str]) -> bytes:
+    signed = b"c" + payload + url.encode() if url is not None else b"o" + payload
+    return hmac.new(_signing_key(), signed, hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+
+def message_token(org_id: UUID, message_id: UUID, url: Optional[str] = None) -> str:
+    """Open token, or a click token bound to `url`"""
+    payload = org_id.bytes + message_id.bytes
+    return base64.urlsafe_b64encode(payload + _signature(payload, url)).decode().rstrip("=")
+
+
+def read_token(token: str, url: Optional[str] = None) -> Optional[_Key]:
+    """(org_id, message_id) if the token is genuine (and was issued for `url`)"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except ValueError:
+        return None
+    if len(raw) != 32 + SIGNATURE_BYTES:
+        return None
+    payload, signature = raw[:32], raw[32:]
+    if not hmac.compare_digest(signature, _signature(payload, url)):
+        return None
+    return UUID(bytes=payload[:16]), UUID(bytes=payload[16:])
+
+
+def open_url(org_id: UUID, message_id: UUID) -> str:
+    return f"{settings.TRACKING_BASE_URL.rstrip('/')}/api/t/o/{message_token(org_id, message_id)}.gif"
+
+
+def click_url(org_id: UUID, message_id: UUID, url: str) -> str:
+    if urlsplit(url).scheme not in ("http", "https"):
+        raise ValueError(f"Only http(s) links can be tracked: {url!r}")
+    token = message_token(org_id, message_id, url)
+    return f"{settings.TRACKING_BASE_URL.rstrip('/')}/api/t/c/{token}?u={quote(url, safe='')}"
+
+
+def tracked_body(org_id: UUID, message_id: UUID, channel: str, body: str) -> str:
+    """Body with every link through the signed click redirect and, for email, the open pixel"""
+    def track(match: re.Match) -> str:
+        url = match.group(0)
+        link = url.rstrip(LINK_TRAILING)
+        return click_url(org_id, message_id, link) + url[len(link):]
+
+    body = LINK_PATTERN.sub(track, body)
+    if channel == "email":
+        body += f'\n<img src="{open_url(org_id, message_id)}" width="1" height="1" alt="">'
+    return body
+
+
+# ==================== BUFFER ====================
+
+class TrackingBuffer:
+    """Earliest open and click per message, pending a batched write"""
+
+    def __init__(
+        self,
+        flush_interval: float = settings.TRACKING_FLUSH_INTERVAL_SECONDS,
+        batch_size: int = settings.TRACKING_BATCH_SIZE,
+        max_pending: int = settings.TRACKING_MAX_PENDING,
+    ):
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._opens: Dict[_Key, datetime] = {}
+        self._clicks: Dict[_Key, datetime] = {}
+        self._oldest_pending: Optional[float] = None
+        self._flusher = PeriodicFlusher("tracking", self.flush, flush_interval)
+
+        # Counters
+        self.hits = 0
+        self.dropped_hits = 0
+        self.flushed_opens = 0
+        self.flushed_clicks = 0
+        self.flush_failures = 0
+        self.last_flush_seconds = 0.0
+
+    # ---------- producers ----------
+
+    def record_open(self, org_id: UUID, message_id: UUID) -> None:
+        self._record(self._opens, (org_id, message_id))
+
+    def record_click(self, org_id: UUID, message_id: UUID) -> None:
+        self._record(self._clicks, (org_id, message_id))
+
+    def _record(self, pending: Dict[_Key, datetime], key: _Key) -> None:
+        now = datetime.utcnow()
+        with self._lock:
+            self.hits += 1
+            if key in pending:
+                return
+            if len(self._opens) + len(self._clicks) >= self.max_pending:
+                self.dropped_hits += 1
+                return
+            pending[key] = now
+            if self._oldest_pending is None:
+                self._oldest_pending = time.monotonic()
+            full = len(pending) >= self.batch_size
+        if full:
+            self._flusher.wake()
+
+    # ---------- flushing ----------
+
+    def flush(self) -> None:
+        started = time.monotonic()
+        with self._lock:
+            opens, clicks, oldest = self._opens, self._clicks, self._oldest_pending
+            self._opens, self._clicks, self._oldest_pending = {}, {}, None
+        if not opens and not clicks:
+            return
+
+        db = SessionLocal()
+        try:
+            for hits, field, statuses, status in (
+                (opens, "opened_at", OPENABLE_STATUSES, "opened"),
+                (clicks, "clicked_at", CLICKABLE_STATUSES, "clicked"),
+            ):
+                rows = [(org_id, message_id, at) for (org_id, message_id), at in hits.items()]
+                for start in range(0, len(rows), self.batch_size):
+                    _write_first_hits(db, rows[start:start + self.batch_size], field, statuses, status)
+            db.commit()
+        except Exception:
+            db.rollback()
+            self.flush_failures += 1
+            self._requeue(opens, clicks, oldest)
+            raise
+        finally:
+            db.close()
+
+        self.flushed_opens += len(opens)
+        self.flushed_clicks += len(clicks)
+        self.last_flush_seconds = time.monotonic() - started
+
+    def _requeue(self, opens: Dict[_Key, datetime], clicks: Dict[_Key, datetime], oldest: Optional[float]) -> None:
+        """Merge a failed batch back, keeping the earliest hit per message"""
+        with self._lock:
+            for failed, pending in ((opens, self._opens), (clicks, self._clicks)):
+                for key, at in failed.items():
+                    if key in pending:
+                        pending[key] = min(pending[key], at)
+                    elif len(self._opens) + len(self._clicks) < self.max_pending:
+                        pending[key] = at
+                    else:
+                        self.dropped_hits += 1
+            if oldest is not None:
+                self._oldest_pending = min(oldest, self._oldest_pending or oldest)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            pending_opens = len(self._opens)
+            pending_clicks = len(self._clicks)
+            oldest = self._oldest_pending
+        return {
+            "hits": self.hits,
+            "pending_opens": pending_opens,
+            "pending_clicks": pending_clicks,
+            "flush_lag_seconds": round(time.monotonic() - oldest, 3) if oldest else 0.0,
+            "last_flush_seconds": round(self.last_flush_seconds, 4),
+            "flushed_opens": self.flushed_opens,
+            "flushed_clicks": self.flushed_clicks,
+            "dropped_hits": self.dropped_hits,
+            "flush_failures": self.flush_failures,
+        }
+
+    # ---------- lifecycle ----------
+
+    def start(self) -> None:
+        self._flusher.start()
+
+    def stop(self) -> None:
+        self._flusher.stop()
+
+
+def _write_first_hits(db, rows, field: str, statuses: Tuple[str, ...], status: str) -> None:
+    """Set `field` on messages that do not have it yet; advance their status"""
+    v = values(
+        column("org_id", PG_UUID(as_uuid=True)), column("id", PG_UUID(as_uuid=True)), column("ts", DateTime),
+        name="v"
+    ).data(rows)
+    # Locked and re-read under the lock, so the old status is the one being replaced
+    first = (
+        select(Message.org_id, Message.id, func.coalesce(Message.status, "draft").label("status"), v.c.ts)
+        .join(v, and_(Message.org_id == v.c.org_id, Message.id == v.c.id))
+        .where(getattr(Message, field).is_(None))
+        .with_for_update(of=Message)
+        .subquery("first")
+    )
+    changes = {
+        field: first.c.ts,
+        "status": case((first.c.status.in_(statuses), status), else_=first.c.status),
+    }
+    if field == "clicked_at":
+        # Image blocking hides most opens; a click shows the message was opened
+        changes["opened_at"] = func.coalesce(Message.opened_at, first.c.ts)
+    changed = db.execute(
+        update(Message)
+        .where(Message.org_id == first.c.org_id, Message.id == first.c.id)
+        .values(changes)
+        .returning(Message.org_id, Message.campaign_id, Message.channel, first.c.status.label("old"), Message.status)
+    ).all()
+    apply_transitions(db, ((r.org_id, r.campaign_id, r.channel, r.old, r.status) for r in changed))
+
+
+_tracker: Optional[TrackingBuffer] = None
+
+def get_tracker() -> TrackingBuffer:
+    global _tracker
+    if _tracker is None:
+        _tracker = TrackingBuffer()
+    return _tracker
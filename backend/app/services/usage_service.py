@@ -0,0 +1,230 @@
+"""
+Usage Service - Buffered usage metering and cached plan-limit enforcement
+Same semantics as increment_usage / check_usage_limit in database/schema.sql,
+without two database round trips on every request.
+
+Increments are buffered in memory and upserted into `usage` in one statement
+per flush. Limit checks are answered from a cached view of the org's tier and
+current usage plus everything this process has not flushed yet. Usage recorded
+by other processes becomes visible after at most
+USAGE_FLUSH_INTERVAL_SECONDS + USAGE_CACHE_TTL_SECONDS.
+
+With several web processes that lag lets each of them spend the whole quota,
+so the meter writes through instead: increments are upserted as they are
+recorded and limit checks read the org's usage from the database.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+import logging
+import threading
+import time
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Organization, Usage, SubscriptionLimit
+from app.serving import process_count
+from app.services.background import PeriodicFlusher
+
+logger = logging.getLogger(__name__)
+
+USAGE_FIELDS = ("leads_scraped", "leads_imported", "messages_sent", "ai_generations", "ai_tokens_used")
+
+# subscription_limits column -> usage columns counted against it
+LIMIT_COLUMNS = {
+    "monthly_leads": ("leads_scraped", "leads_imported"),
+    "monthly_messages": ("messages_sent",),
+    "monthly_ai_generations": ("ai_generations",),
+}
+FIELD_LIMITS = {f: column for column, fields in LIMIT_COLUMNS.items() for f in fields}
+
+_Key = Tuple[UUID, date]
+
+
+def current_month() -> date:
+    return datetime.utcnow().date().replace(day=1)
+
+
+@dataclass
+class _OrgUsage:
+    tier: str
+    month: date
+    used: Dict[str, int] = field(default_factory=dict)
+    loaded_at: float = 0.0
+
+
+class UsageMeter:
+    """Buffers usage increments and answers plan-limit checks from cache"""
+
+    def __init__(
+        self,
+        flush_interval: float = settings.USAGE_FLUSH_INTERVAL_SECONDS,
+        max_pending: int = settings.USAGE_FLUSH_MAX_PENDING,
+        cache_ttl: float = settings.USAGE_CACHE_TTL_SECONDS,
+    ):
+        self.max_pending = max_pending
+        self.cache_ttl = cache_ttl
+        # Plan limits only change through migrations, so they stay cached either way
+        self.limits_ttl = cache_ttl
+        # Other web processes cannot see this one's buffer or cache
+        self.write_through = process_count() > 1
+        if self.write_through:
+            self.cache_ttl = 0.0
+        self._lock = threading.Lock()
+        self._pending: Dict[_Key, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        # Batches being written by concurrent flushes, still counted against limits
+        self._inflight: List[Dict[_Key, Dict[str, int]]] = []
+        self._orgs: Dict[UUID, _OrgUsage] = {}
+        self._limits: Dict[str, Dict[str, int]] = {}
+        self._limits_loaded_at = 0.0
+        self._flusher = PeriodicFlusher("usage-meter", self.flush, flush_interval)
+
+    # ---------- recording ----------
+
+    def record(self, org_id: UUID, usage_field: str, amount: int = 1) -> None:
+        """Buffer an increment; only touches the database when writing through"""
+        if usage_field not in USAGE_FIELDS:
+            raise ValueError(f"Unknown usage field: {usage_field}")
+        if amount <= 0:
+            return
+        with self._lock:
+            self._pending[(org_id, current_month())][usage_field] += amount
+            pending = len(self._pending)
+        if self.write_through:
+            try:
+                self.flush()
+            except Exception:
+                # The work being metered is done; the batch is back in the buffer for the next flush
+                logger.warning("Usage write-through failed, retrying on the next flush", exc_info=True)
+                self._flusher.wake()
+        elif pending >= self.max_pending:
+            self._flusher.wake()
+
+    def flush(self) -> int:
+        """Upsert all buffered increments in a single statement"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch = {k: dict(v) for k, v in self._pending.items()}
+            self._pending.clear()
+            self._inflight.append(batch)
+
+        rows = [
+            {"org_id": org_id, "month": month, **{f: counts.get(f, 0) for f in USAGE_FIELDS}}
+            for (org_id, month), counts in batch.items()
+        ]
+        stmt = pg_insert(Usage).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Usage.org_id, Usage.month],
+            set_={f: getattr(Usage, f) + getattr(stmt.excluded, f) for f in USAGE_FIELDS}
+        )
+
+        db = SessionLocal()
+        try:
+            db.execute(stmt)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put the batch back so the counts are retried on the next flush
+            with self._lock:
+                for key, counts in batch.items():
+                    for f, amount in counts.items():
+                        self._pending[key][f] += amount
+            raise
+        finally:
+            db.close()
+            with self._lock:
+                self._inflight.remove(batch)
+
+        # Flushed counts are now in the database; fold them into cached snapshots
+        with self._lock:
+            for (org_id, month), counts in batch.items():
+                entry = self._orgs.get(org_id)
+                if entry and entry.month == month:
+                    for f, amount in counts.items():
+                        entry.used[f] = entry.used.get(f, 0) + amount
+        return len(rows)
+
+    # ---------- limit checks ----------
+
+    def check_limit(self, db: Session, org_id: UUID, usage_field: str, amount: int = 1) -> bool:
+        """True if the org may consume `amount` more of `usage_field` this month"""
+        remaining = self.remaining(db, org_id, usage_field)
+        return remaining is None or amount <= remaining
+
+    def remaining(self, db: Session, org_id: UUID, usage_field: str) -> Optional[int]:
+        """How much more of `usage_field` the org may consume this month; None if unlimited"""
+        column = FIELD_LIMITS.get(usage_field)
+        if column is None:
+            return None
+
+        entry = self._org_usage(db, org_id)
+        limit = self._tier_limits(db).get(entry.tier, {}).get(column)
+        # NULL or -1 means unlimited
+        if limit is None or limit < 0:
+            return None
+
+        key = (org_id, entry.month)
+        with self._lock:
+            used = 0
+            for f in LIMIT_COLUMNS[column]:
+                used += entry.used.get(f, 0)
+                used += self._pending.get(key, {}).get(f, 0)
+                used += sum(inflight.get(key, {}).get(f, 0) for inflight in self._inflight)
+        return max(0, limit - used)
+
+    def invalidate(self, org_id: UUID) -> None:
+        """Drop the cached view of an org (e.g. after a tier change)"""
+        with self._lock:
+            self._orgs.pop(org_id, None)
+
+    def _org_usage(self, db: Session, org_id: UUID) -> _OrgUsage:
+        month = current_month()
+        now = time.monotonic()
+        entry = self._orgs.get(org_id)
+        if entry and entry.month == month and now - entry.loaded_at < self.cache_ttl:
+            return entry
+
+        tier = db.query(Organization.subscription_tier).filter(Organization.id == org_id).scalar() or "free"
+        row = db.query(Usage).filter(Usage.org_id == org_id, Usage.month == month).first()
+        used = {f: (getattr(row, f) or 0) for f in USAGE_FIELDS} if row else {}
+
+        entry = _OrgUsage(tier=tier, month=month, used=used, loaded_at=now)
+        with self._lock:
+            self._orgs[org_id] = entry
+        return entry
+
+    def _tier_limits(self, db: Session) -> Dict[str, Dict[str, int]]:
+        now = time.monotonic()
+        if self._limits and now - self._limits_loaded_at < self.limits_ttl:
+            return self._limits
+
+        limits = {}
+        for row in db.query(SubscriptionLimit).all():
+            limits[row.tier] = {column: getattr(row, column) for column in LIMIT_COLUMNS}
+        self._limits = limits
+        self._limits_loaded_at = now
+        return limits
+
+    # ---------- lifecycle ----------
+
+    def start(self) -> None:
+        self._flusher.start()
+
+    def stop(self) -> None:
+        self._flusher.stop()
+
+
+_usage_meter: Optional[UsageMeter] = None
+
+def get_usage_meter() -> UsageMeter:
+    global _usage_meter
+    if _usage_meter is None:
+        _usage_meter = UsageMeter()
+    return _usage_meter
@@ -0,0 +1,92 @@
+"""
+User Cache - Which org each user belongs to, for token checks on cached reads
+Read routes take the org from the bearer token instead of loading the user,
+but a user who was deleted or moved to another org must lose access before
+the token expires. The user's org is cached for USER_CACHE_TTL_SECONDS; users
+changed through the ORM are dropped from this process's cache when the change
+commits, and other processes see the change once the TTL runs out.
+"""
+
+from typing import Dict, Optional, Set, Tuple
+from uuid import UUID
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import User
+
+_CHANGED_USERS = "changed_users"
+
+
+class UserOrgCache:
+    def __init__(self, ttl: float = settings.USER_CACHE_TTL_SECONDS, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Dict[UUID, Tuple[UUID, float]] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def org_of(self, db: Session, user_id: UUID) -> Optional[UUID]:
+        """The user's current org, or None if the user no longer exists"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[1] < self.ttl:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self._generation
+
+        org_id = db.query(User.org_id).filter(User.id == user_id).scalar()
+        if org_id is None:
+            return None
+        with self._lock:
+            # A user changed during the lookup may have been read before the change
+            if generation == self._generation:
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+                self._entries[user_id] = (org_id, now)
+        return org_id
+
+    def invalidate(self, user_ids: Set[UUID]) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+            self._generation += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_user_cache: Optional[UserOrgCache] = None
+
+def get_user_cache() -> UserOrgCache:
+    global _user_cache
+    if _user_cache is None:
+        _user_cache = UserOrgCache()
+    return _user_cache
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_users(session: Session, flush_context) -> None:
+    changed = [obj.id for obj in list(session.dirty) + list(session.deleted) if isinstance(obj, User)]
+    if changed:
+        session.info.setdefault(_CHANGED_USERS, set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_users(session: Session) -> None:
+    changed = session.info.pop(_CHANGED_USERS, None)
+    if changed:
+        get_user_cache().invalidate(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_users(session: Session) -> None:
+    session.info.pop(_CHANGED_USERS, None)
@@ -0,0 +1,130 @@
+"""
+Warmup Service - Startup timing and pre-warmed resources
+Records how long each startup phase took (imports, background services, pool
+warmup) and when the first successful request was answered, which is the
+number a deploy is judged by. Database connections are opened in parallel
+before the app reports ready; the AI client is built and its TLS connection
+opened in the background so it never delays readiness.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+
+def process_age() -> Optional[float]:
+    """Seconds since this process started (Linux), covering interpreter and server imports"""
+    try:
+        with open("/proc/self/stat") as f:
+            started_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - started_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases: Dict[str, float] = {}
+        self.ready_at: Optional[float] = None
+        self.first_request: Optional[Dict[str, Any]] = None
+        self._started = time.perf_counter()
+        self._age_at_start = process_age()
+
+    def begin(self, at: float) -> None:
+        """Count from `at`, the perf_counter when the app module started importing"""
+        age = process_age()
+        self._age_at_start = age - (time.perf_counter() - at) if age is not None else None
+        self._started = at
+
+    def record(self, phase: str, since: float) -> None:
+        """Duration of `phase`, from `since` (perf_counter) to now"""
+        with self._lock:
+            self.phases[phase] = round((time.perf_counter() - since) * 1000, 1)
+
+    def ready(self) -> None:
+        self.ready_at = time.perf_counter()
+        logger.info("Startup ready: %s", self.report())
+
+    def request_served(self, path: str, status: int) -> None:
+        with self._lock:
+            if self.first_request is None:
+                self.first_request = {"path": path, "status": status, "after_ms": self._since_process_start()}
+
+    def _since_process_start(self) -> float:
+        elapsed = (time.perf_counter() - self._started) * 1000
+        return round(elapsed + (self._age_at_start or 0) * 1000, 1)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "phases_ms": dict(self.phases),
+                "before_app_ms": round(self._age_at_start * 1000, 1) if self._age_at_start is not None else None,
+                "ready_ms": round((self.ready_at - self._started) * 1000 + (self._age_at_start or 0) * 1000, 1)
+                if self.ready_at else None,
+                "first_request": self.first_request,
+            }
+
+
+_startup_timer: Optional[StartupTimer] = None
+
+def get_startup_timer() -> StartupTimer:
+    global _startup_timer
+    if _startup_timer is None:
+        _startup_timer = StartupTimer()
+    return _startup_timer
+
+
+def warm_database(connections: int) -> int:
+    """Open `connections` pool connections at once and hand them back to the pool"""
+    from app.database import engine
+
+    if connections <= 0:
+        return 0
+
+    def open_one():
+        connection = engine.connect()
+        connection.execute(text("SELECT 1"))
+        return connection
+
+    opened = []
+    with ThreadPoolExecutor(max_workers=connections) as pool:
+        futures = [pool.submit(open_one) for _ in range(connections)]
+        for future in futures:
+            try:
+                opened.append(future.result())
+            except Exception as e:
+                logger.warning("Database warmup connection failed: %s", e)
+    # Held until all are open, so the pool keeps N distinct connections
+    for connection in opened:
+        connection.close()
+    return len(opened)
+
+
+def warm_ai_client() -> None:
+    """Build the AI client and open its connection; runs in a background thread"""
+    started = time.perf_counter()
+    try:
+        from app.services.health import probe_ai, record_ai_probe
+
+        # Also the health check's first AI probe, so startup never waits on one
+        record_ai_probe(probe_ai())
+    except Exception as e:
+        logger.warning("AI client warmup failed: %s", e)
+    finally:
+        get_startup_timer().record("ai_client", started)
+
+
+def warm_ai_client_in_background() -> threading.Thread:
+    thread = threading.Thread(target=warm_ai_client, name="ai-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,207 @@
+"""
+Write-Behind Service - Deferred activity log and login bookkeeping
+Activity events and last-login timestamps are queued in memory and written
+in multi-row batches on a timer or when the queue reaches WRITE_BEHIND_BATCH_SIZE,
+keeping both writes off the request path. Nothing reads them in real time.
+
+A batch the database rejects (say, an event for a user deleted meanwhile) is
+split until the offending rows are isolated. Those are dropped and counted
+rather than failing, and requeueing, the whole batch on every flush.
+"""
+
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+from uuid import UUID, uuid4
+import logging
+import threading
+import time
+
+from sqlalchemy import DateTime, column, insert, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import ActivityLog, User
+from app.services.background import PeriodicFlusher
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Bounded in-memory queue of activity rows and login timestamps"""
+
+    def __init__(
+        self,
+        flush_interval: float = settings.WRITE_BEHIND_FLUSH_INTERVAL_SECONDS,
+        batch_size: int = settings.WRITE_BEHIND_BATCH_SIZE,
+        max_pending: int = settings.WRITE_BEHIND_MAX_PENDING,
+    ):
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._activity: Deque[Dict[str, Any]] = deque()
+        self._logins: Dict[UUID, datetime] = {}
+        self._oldest_pending: Optional[float] = None
+        self._flusher = PeriodicFlusher("write-behind", self.flush, flush_interval)
+
+        # Counters
+        self.dropped_events = 0
+        self.rejected_events = 0
+        self.flushed_events = 0
+        self.flushed_logins = 0
+        self.flush_failures = 0
+        self.last_flush_at: Optional[float] = None
+        self.last_flush_seconds = 0.0
+
+    # ---------- producers ----------
+
+    def log_activity(
+        self,
+        org_id: UUID,
+        action: str,
+        user_id: Optional[UUID] = None,
+        entity_type: Optional[str] = None,
+        entity_id: Optional[UUID] = None,
+        details: Optional[Dict[str, Any]] = None,
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None,
+    ) -> None:
+        row = {
+            "id": uuid4(),
+            "org_id": org_id,
+            "user_id": user_id,
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "details": details,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "created_at": datetime.utcnow(),
+        }
+        with self._lock:
+            if len(self._activity) >= self.max_pending:
+                self.dropped_events += 1
+                return
+            self._activity.append(row)
+            self._mark_pending()
+            full = len(self._activity) >= self.batch_size
+        if full:
+            self._flusher.wake()
+
+    def touch_login(self, user_id: UUID, at: Optional[datetime] = None) -> None:
+        with self._lock:
+            self._logins[user_id] = at or datetime.utcnow()
+            self._mark_pending()
+
+    def _mark_pending(self) -> None:
+        if self._oldest_pending is None:
+            self._oldest_pending = time.monotonic()
+
+    # ---------- flushing ----------
+
+    def flush(self) -> None:
+        started = time.monotonic()
+        with self._lock:
+            activity = list(self._activity)
+            logins = self._logins
+            oldest = self._oldest_pending
+            self._activity.clear()
+            self._logins = {}
+            self._oldest_pending = None
+        if not activity and not logins:
+            return
+
+        db = SessionLocal()
+        try:
+            written = 0
+            for start in range(0, len(activity), self.batch_size):
+                written += self._insert_activity(db, activity[start:start + self.batch_size])
+            if logins:
+                v = values(
+                    column("id", PG_UUID(as_uuid=True)), column("ts", DateTime), name="v"
+                ).data(list(logins.items()))
+                db.execute(
+                    update(User)
+                    .where(User.id == v.c.id)
+                    .where((User.last_login_at.is_(None)) | (User.last_login_at < v.c.ts))
+                    .values(last_login_at=v.c.ts)
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            self.flush_failures += 1
+            self._requeue(activity, logins, oldest)
+            raise
+        finally:
+            db.close()
+
+        self.flushed_events += written
+        self.flushed_logins += len(logins)
+        self.last_flush_at = time.time()
+        self.last_flush_seconds = time.monotonic() - started
+
+    def _insert_activity(self, db, rows: List[Dict[str, Any]]) -> int:
+        """Insert rows under a savepoint, halving a rejected batch down to the bad rows"""
+        try:
+            with db.begin_nested():
+                db.execute(insert(ActivityLog).values(rows))
+            return len(rows)
+        except IntegrityError as e:
+            if len(rows) == 1:
+                self.rejected_events += 1
+                row = rows[0]
+                logger.warning(
+                    "Dropped activity event %r for org %s: %s", row["action"], row["org_id"], str(e.orig).strip()
+                )
+                return 0
+            middle = len(rows) // 2
+            return self._insert_activity(db, rows[:middle]) + self._insert_activity(db, rows[middle:])
+
+    def _requeue(self, activity, logins, oldest: Optional[float]) -> None:
+        """Put a failed batch back in front of newer items, dropping what no longer fits"""
+        with self._lock:
+            room = max(0, self.max_pending - len(self._activity))
+            keep = activity[:room]
+            self.dropped_events += len(activity) - len(keep)
+            self._activity.extendleft(reversed(keep))
+            for user_id, at in logins.items():
+                if user_id not in self._logins or self._logins[user_id] < at:
+                    self._logins[user_id] = at
+            if oldest is not None:
+                self._oldest_pending = min(oldest, self._oldest_pending or oldest)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending_events = len(self._activity)
+            pending_logins = len(self._logins)
+            oldest = self._oldest_pending
+        return {
+            "pending_events": pending_events,
+            "pending_logins": pending_logins,
+            "flush_lag_seconds": round(time.monotonic() - oldest, 3) if oldest else 0.0,
+            "last_flush_seconds": round(self.last_flush_seconds, 4),
+            "flushed_events": self.flushed_events,
+            "flushed_logins": self.flushed_logins,
+            "dropped_events": self.dropped_events,
+            "rejected_events": self.rejected_events,
+            "flush_failures": self.flush_failures,
+        }
+
+    # ---------- lifecycle ----------
+
+    def start(self) -> None:
+        self._flusher.start()
+
+    def stop(self) -> None:
+        self._flusher.stop()
+
+
+_write_behind: Optional[WriteBehindBuffer] = None
+
+def get_write_behind() -> WriteBehindBuffer:
+    global _write_behind
+    if _write_behind is None:
+        _write_behind = WriteBehindBuffer()
+    return _write_behind
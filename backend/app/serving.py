@@ -0,0 +1,131 @@
+"""
+Serving - Process layout for the multi-worker production server
+gunicorn.conf.py decides how many web processes to fork and exports the count,
+so every process can size its share of host-wide resources (database
+connections, in-process rate limits) and know when per-process state stops
+being authoritative.
+"""
+
+from typing import List, Tuple
+import fcntl
+import logging
+import math
+import os
+import tempfile
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROCESSES_ENV = "FARIS_WEB_PROCESSES"
+GROUP_ENV = "FARIS_WEB_GROUP"
+
+
+def cpu_limit() -> int:
+    """CPUs this container may use: the cgroup quota when set, else the affinity mask"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def default_web_workers() -> int:
+    """WEB_WORKERS when set; otherwise one per usable CPU (bcrypt, JSON and CSV are CPU-bound)
+
+    A memory task queue only works in one process: jobs live in the worker that
+    queued them, and GET /api/tasks/{id} could land on another. Rather than
+    quietly serving with one worker, the server refuses to start unless
+    TASK_QUEUE_BACKEND=redis or WEB_WORKERS=1 asks for a single process.
+    """
+    if settings.TASK_QUEUE_BACKEND == "memory":
+        if settings.WEB_WORKERS == 1:
+            return 1
+        raise RuntimeError(
+            "TASK_QUEUE_BACKEND=memory cannot serve several web workers: set TASK_QUEUE_BACKEND=redis "
+            "(with REDIS_URL and a `python -m app.workers` process) or WEB_WORKERS=1"
+        )
+    if settings.WEB_WORKERS > 0:
+        return settings.WEB_WORKERS
+    return max(1, min(cpu_limit(), settings.WEB_WORKERS_MAX))
+
+
+def process_count() -> int:
+    """Web processes sharing this host's budgets; 1 under plain uvicorn"""
+    try:
+        return max(1, int(os.environ.get(PROCESSES_ENV, "1")))
+    except ValueError:
+        return 1
+
+
+def per_process_share(total: int) -> int:
+    """This process's share of a host-wide limit, never below 1"""
+    return max(1, math.ceil(total / process_count()))
+
+
+def pool_limits(processes: int) -> Tuple[int, int]:
+    """(pool_size, max_overflow) for one process, within DATABASE_MAX_CONNECTIONS overall"""
+    if settings.DATABASE_MAX_CONNECTIONS <= 0:
+        return settings.DATABASE_POOL_SIZE, settings.DATABASE_MAX_OVERFLOW
+    per_process = max(2, settings.DATABASE_MAX_CONNECTIONS // processes)
+    pool_size = min(settings.DATABASE_POOL_SIZE, per_process)
+    return pool_size, min(settings.DATABASE_MAX_OVERFLOW, per_process - pool_size)
+
+
+_leader_lock = None
+
+def is_schedule_leader() -> bool:
+    """True in exactly one process of a gunicorn group (flock, released on exit)
+
+    A recycled leader drops the lock when it exits and the next caller takes over.
+    """
+    global _leader_lock
+    if process_count() == 1 or _leader_lock is not None:
+        return True
+    group = os.environ.get(GROUP_ENV, str(os.getppid()))
+    path = os.path.join(tempfile.gettempdir(), f"faris-scheduler-{group}.lock")
+    handle = open(path, "w")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    _leader_lock = handle
+    return True
+
+
+def single_process() -> bool:
+    """True when this process is the only one serving and running tasks
+
+    With a redis task queue the jobs run in `python -m app.workers`, whose
+    writes never reach this process's memory.
+    """
+    return process_count() == 1 and settings.TASK_QUEUE_BACKEND == "memory"
+
+
+def process_local_state() -> List[str]:
+    """Backends that are per process, and so not shared when several workers serve"""
+    local = []
+    if settings.TASK_QUEUE_BACKEND == "memory":
+        local.append("TASK_QUEUE_BACKEND")
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        local.append("RATE_LIMIT_BACKEND")
+    if settings.COLLECTION_VERSION_BACKEND == "memory":
+        local.append("COLLECTION_VERSION_BACKEND")
+    if settings.DATABASE_READ_URL and settings.READ_STICKY_BACKEND == "memory":
+        local.append("READ_STICKY_BACKEND")
+    return local
+
+
+def warn_process_local_state() -> None:
+    if single_process():
+        return
+    for name in process_local_state():
+        logger.warning("%s=memory with %d web processes and %s task workers; set it to redis to share state",
+                       name, process_count(), settings.TASK_QUEUE_BACKEND)
@@ -0,0 +1,9 @@
+"""
+Background Workers Package
+"""
+
+from app.workers.queue import Job, JobStatus, TASKS, task, get_queue
+from app.workers.worker import Worker, get_inprocess_worker
+from app.workers import tasks
+
+__all__ = ["Job", "JobStatus", "TASKS", "task", "get_queue", "Worker", "get_inprocess_worker", "tasks"]
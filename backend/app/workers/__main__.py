@@ -0,0 +1,46 @@
+"""
+Worker process entry point
+
+    python -m app.workers --concurrency 8
+"""
+
+import argparse
+import logging
+import signal
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.config import settings
+from app.services.usage_service import get_usage_meter
+from app.services.write_behind import get_write_behind
+from app.workers import Worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Faris AI background worker")
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if settings.TASK_QUEUE_BACKEND != "redis":
+        logging.warning("TASK_QUEUE_BACKEND is not redis; this worker cannot see jobs from the API process")
+
+    worker = Worker(concurrency=args.concurrency)
+    signal.signal(signal.SIGTERM, lambda *_: worker.request_stop())
+
+    usage_meter = get_usage_meter()
+    usage_meter.start()
+    write_behind = get_write_behind()
+    write_behind.start()
+    try:
+        print(f"Faris AI worker started with {args.concurrency} threads")
+        worker.run_forever()
+    finally:
+        usage_meter.stop()
+        write_behind.stop()
+
+
+if __name__ == "__main__":
+    main()
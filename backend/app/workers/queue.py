@@ -0,0 +1,381 @@
+"""
+Task Queue - Typed task definitions and queue backends
+In-memory backend for tests and single-node use, Redis backend for production.
+"""
+
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Generic, List, Optional, Tuple, Type, TypeVar
+from uuid import uuid4
+import heapq
+import json
+import threading
+import time
+
+from pydantic import BaseModel
+
+from app.config import settings
+from app.serving import is_schedule_leader
+
+P = TypeVar("P", bound=BaseModel)
+
+
+class JobStatus:
+    queued = "queued"
+    running = "running"
+    retrying = "retrying"
+    succeeded = "succeeded"
+    dead = "dead"
+
+
+@dataclass
+class Job:
+    name: str
+    payload: Dict[str, Any]
+    org_id: Optional[str] = None
+    id: str = field(default_factory=lambda: str(uuid4()))
+    status: str = JobStatus.queued
+    attempts: int = 0
+    max_retries: int = 0
+    run_at: float = 0.0
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    updated_at: Optional[str] = None
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False, default=str)
+
+    @classmethod
+    def from_json(cls, raw) -> "Job":
+        return cls(**json.loads(raw))
+
+
+# ==================== TASK DEFINITIONS ====================
+
+class TaskDefinition(Generic[P]):
+    """A named task with a typed payload; call .enqueue() from routes"""
+
+    def __init__(self, name: str, func: Callable[[P], Any], payload_model: Type[P], max_retries: int):
+        self.name = name
+        self.func = func
+        self.payload_model = payload_model
+        self.max_retries = max_retries
+
+    def enqueue(self, payload: P, org_id: Optional[Any] = None, delay: float = 0.0) -> Job:
+        if not isinstance(payload, self.payload_model):
+            raise TypeError(f"{self.name} expects {self.payload_model.__name__}")
+        job = Job(
+            name=self.name,
+            payload=payload.model_dump(mode="json"),
+            org_id=str(org_id) if org_id else None,
+            max_retries=self.max_retries,
+            run_at=time.time() + delay,
+        )
+        get_queue().push(job)
+        return job
+
+    def run(self, job: Job) -> Any:
+        return self.func(self.payload_model(**job.payload))
+
+
+TASKS: Dict[str, TaskDefinition] = {}
+
+# (definition, payload, every_seconds) enqueued periodically by the worker scheduler
+SCHEDULES: List[Tuple[TaskDefinition, BaseModel, float]] = []
+
+
+def task(name: str, payload: Type[P], max_retries: Optional[int] = None):
+    """Register a function as a background task"""
+    def decorator(func: Callable[[P], Any]) -> TaskDefinition[P]:
+        definition = TaskDefinition(
+            name, func, payload,
+            settings.TASK_MAX_RETRIES if max_retries is None else max_retries
+        )
+        TASKS[name] = definition
+        return definition
+    return decorator
+
+
+def schedule(definition: TaskDefinition[P], payload: P, every: float) -> None:
+    """Run a task every `every` seconds (once per period across all workers)"""
+    SCHEDULES.append((definition, payload, every))
+
+
+# ==================== BACKENDS ====================
+
+class MemoryQueue:
+    """Thread-safe in-process queue; jobs are lost when the process exits"""
+
+    def __init__(self, max_finished: int = 10000):
+        self._ready: Deque[str] = deque()
+        self._delayed: List = []
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._dead: Deque[str] = deque(maxlen=max_finished)
+        self._max_finished = max_finished
+        self._claimed: Dict[str, int] = {}
+        self._cond = threading.Condition()
+
+    def push(self, job: Job) -> None:
+        with self._cond:
+            self._jobs[job.id] = job
+            self._schedule(job)
+            self._cond.notify()
+
+    def pop(self, timeout: float = 1.0) -> Optional[Job]:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.time()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, job_id = heapq.heappop(self._delayed)
+                    self._ready.append(job_id)
+                if self._ready:
+                    job = self._jobs.get(self._ready.popleft())
+                    if job is None:
+                        continue
+                    job.status = JobStatus.running
+                    job.updated_at = datetime.utcnow().isoformat()
+                    return job
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                if self._delayed:
+                    remaining = min(remaining, max(self._delayed[0][0] - now, 0.01))
+                self._cond.wait(remaining)
+
+    def save(self, job: Job) -> None:
+        with self._cond:
+            job.updated_at = datetime.utcnow().isoformat()
+            self._jobs[job.id] = job
+            self._jobs.move_to_end(job.id)
+            self._prune()
+
+    def retry(self, job: Job, delay: float) -> None:
+        with self._cond:
+            job.status = JobStatus.retrying
+            job.run_at = time.time() + delay
+            job.updated_at = datetime.utcnow().isoformat()
+            self._schedule(job)
+            self._cond.notify()
+
+    def dead_letter(self, job: Job) -> None:
+        job.status = JobStatus.dead
+        self.save(job)
+        with self._cond:
+            self._dead.append(job.id)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def dead_letters(self, limit: int = 100) -> List[Job]:
+        ids = list(self._dead)[-limit:]
+        return [self._jobs[i] for i in ids if i in self._jobs]
+
+    def depth(self) -> int:
+        return len(self._ready) + len(self._delayed)
+
+    def claim_schedule(self, name: str, slot: int, ttl: float) -> bool:
+        # Every gunicorn worker has its own queue; only one of them runs the schedules
+        if not is_schedule_leader():
+            return False
+        with self._cond:
+            if self._claimed.get(name) == slot:
+                return False
+            self._claimed[name] = slot
+            return True
+
+    def _schedule(self, job: Job) -> None:
+        if job.run_at > time.time():
+            heapq.heappush(self._delayed, (job.run_at, job.id))
+        else:
+            self._ready.append(job.id)
+
+    def _prune(self) -> None:
+        # Forget the oldest finished jobs once over capacity
+        excess = len(self._jobs) - self._max_finished
+        if excess <= 0:
+            return
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].status in (JobStatus.succeeded, JobStatus.dead):
+                del self._jobs[job_id]
+                excess -= 1
+
+
+class RedisQueue:
+    """Redis-backed queue shared by the API and any number of worker processes
+
+    faris:tq:ready       list of job ids ready to run
+    faris:tq:delayed     zset of job ids scored by run_at
+    faris:tq:processing  list of job ids claimed by a worker
+    faris:tq:leases      zset of claimed job ids scored by lease expiry
+    faris:tq:dead        list of dead-lettered job ids
+    faris:tq:job:<id>    job record (JSON)
+
+    A worker holds a lease on each job it runs and renews it while the job is
+    running; jobs whose lease expires (the worker died) go back to ready.
+    """
+
+    PROMOTE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 100)
+for _, id in ipairs(due) do
+  redis.call('ZREM', KEYS[1], id)
+  redis.call('LPUSH', KEYS[2], id)
+end
+return #due
+"""
+
+    # Re-checks the lease and moves the job in one step, so a renewal or a
+    # finishing worker in between wins over the requeue
+    REQUEUE_SCRIPT = """
+local lease = redis.call('ZSCORE', KEYS[3], ARGV[1])
+if lease and tonumber(lease) > tonumber(ARGV[2]) then
+  return 0
+end
+redis.call('ZREM', KEYS[3], ARGV[1])
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) == 0 then
+  return 0
+end
+redis.call('SET', KEYS[4], ARGV[3])
+redis.call('LPUSH', KEYS[2], ARGV[1])
+return 1
+"""
+
+    def __init__(
+        self,
+        url: str = settings.REDIS_URL,
+        prefix: str = "faris:tq:",
+        lease_seconds: float = settings.TASK_VISIBILITY_TIMEOUT_SECONDS,
+    ):
+        import redis
+
+        self.prefix = prefix
+        self.lease_seconds = lease_seconds
+        self._redis = redis.Redis.from_url(url)
+        self._promote = self._redis.register_script(self.PROMOTE_SCRIPT)
+        self._requeue = self._redis.register_script(self.REQUEUE_SCRIPT)
+        self.ready_key = prefix + "ready"
+        self.delayed_key = prefix + "delayed"
+        self.processing_key = prefix + "processing"
+        self.leases_key = prefix + "leases"
+        self.dead_key = prefix + "dead"
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}job:{job_id}"
+
+    def push(self, job: Job) -> None:
+        pipe = self._redis.pipeline()
+        pipe.set(self._job_key(job.id), job.to_json())
+        if job.run_at > time.time():
+            pipe.zadd(self.delayed_key, {job.id: job.run_at})
+        else:
+            pipe.lpush(self.ready_key, job.id)
+        pipe.execute()
+
+    def pop(self, timeout: float = 1.0) -> Optional[Job]:
+        self._promote(keys=[self.delayed_key, self.ready_key], args=[time.time()])
+        job_id = self._redis.brpoplpush(self.ready_key, self.processing_key, timeout=max(1, int(timeout)))
+        if job_id is None:
+            return None
+        job = self.get(job_id.decode())
+        if job is None:
+            self._redis.lrem(self.processing_key, 1, job_id)
+            return None
+        self._redis.zadd(self.leases_key, {job.id: time.time() + self.lease_seconds})
+        job.status = JobStatus.running
+        self.save(job)
+        return job
+
+    def renew_leases(self, job_ids: List[str]) -> None:
+        """Extend the leases of jobs still running (XX: never revive a finished job's)"""
+        if job_ids:
+            expiry = time.time() + self.lease_seconds
+            self._redis.zadd(self.leases_key, {job_id: expiry for job_id in job_ids}, xx=True)
+
+    def save(self, job: Job) -> None:
+        job.updated_at = datetime.utcnow().isoformat()
+        finished = job.status in (JobStatus.succeeded, JobStatus.dead)
+        pipe = self._redis.pipeline()
+        if job.status == JobStatus.dead:
+            pipe.set(self._job_key(job.id), job.to_json())
+        else:
+            pipe.set(self._job_key(job.id), job.to_json(), ex=settings.TASK_RESULT_TTL_SECONDS if finished else None)
+        if finished:
+            pipe.lrem(self.processing_key, 1, job.id)
+            pipe.zrem(self.leases_key, job.id)
+        pipe.execute()
+
+    def retry(self, job: Job, delay: float) -> None:
+        job.status = JobStatus.retrying
+        job.run_at = time.time() + delay
+        job.updated_at = datetime.utcnow().isoformat()
+        pipe = self._redis.pipeline()
+        pipe.set(self._job_key(job.id), job.to_json())
+        pipe.lrem(self.processing_key, 1, job.id)
+        pipe.zrem(self.leases_key, job.id)
+        pipe.zadd(self.delayed_key, {job.id: job.run_at})
+        pipe.execute()
+
+    def dead_letter(self, job: Job) -> None:
+        job.status = JobStatus.dead
+        self.save(job)
+        self._redis.lpush(self.dead_key, job.id)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        raw = self._redis.get(self._job_key(job_id))
+        return Job.from_json(raw) if raw else None
+
+    def dead_letters(self, limit: int = 100) -> List[Job]:
+        ids = self._redis.lrange(self.dead_key, 0, limit - 1)
+        return [j for j in (self.get(i.decode()) for i in ids) if j]
+
+    def depth(self) -> int:
+        pipe = self._redis.pipeline()
+        pipe.llen(self.ready_key)
+        pipe.zcard(self.delayed_key)
+        ready, delayed = pipe.execute()
+        return ready + delayed
+
+    def claim_schedule(self, name: str, slot: int, ttl: float) -> bool:
+        """True for exactly one caller per (schedule, period slot)"""
+        return bool(self._redis.set(f"{self.prefix}sched:{name}:{slot}", 1, nx=True, ex=max(1, int(ttl))))
+
+    def requeue_stale(self, older_than: float) -> int:
+        """Return jobs whose worker died mid-task to the ready list
+
+        A job is stale once its lease has expired; a claimed job without one (its
+        worker died right after claiming it) once it has not been saved for
+        `older_than` seconds.
+        """
+        requeued = 0
+        now = time.time()
+        cutoff = datetime.utcfromtimestamp(now - older_than).isoformat()
+        raw_ids = self._redis.lrange(self.processing_key, 0, -1)
+        pipe = self._redis.pipeline(transaction=False)
+        for raw_id in raw_ids:
+            pipe.zscore(self.leases_key, raw_id)
+        for raw_id, lease in zip(raw_ids, pipe.execute()):
+            if lease is not None and lease > now:
+                continue
+            job = self.get(raw_id.decode())
+            if job is None or job.status != JobStatus.running:
+                continue
+            if lease is None and (job.updated_at or "") >= cutoff:
+                continue
+            job.status = JobStatus.queued
+            job.updated_at = datetime.utcnow().isoformat()
+            keys = [self.processing_key, self.ready_key, self.leases_key, self._job_key(job.id)]
+            requeued += self._requeue(keys=keys, args=[raw_id, now, job.to_json()])
+        return requeued
+
+
+_queue = None
+
+def get_queue():
+    global _queue
+    if _queue is None:
+        _queue = RedisQueue() if settings.TASK_QUEUE_BACKEND == "redis" else MemoryQueue()
+    return _queue
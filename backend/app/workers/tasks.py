@@ -0,0 +1,279 @@
+"""
+Background Tasks - Expensive work moved out of request handlers
+"""
+
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID, uuid4
+import csv
+import io
+
+from pydantic import BaseModel
+
+from app.database import SessionLocal
+from app.models import Campaign, Lead
+from app.schemas import InboundReply
+from app.services.dedup import DuplicateIndex, IDENTITY_FIELDS, build_duplicate_report, index_leads, lead_fields
+from app.services.usage_service import get_usage_meter
+from app.config import settings
+from app.workers.queue import schedule, task
+
+
+# ==================== LEADS ====================
+
+class ImportLeadsPayload(BaseModel):
+    org_id: UUID
+    user_id: UUID
+    csv_text: str
+
+
+@task("leads.import", payload=ImportLeadsPayload, max_retries=1)
+def import_leads(payload: ImportLeadsPayload) -> dict:
+    rows = [row for row in csv.DictReader(io.StringIO(payload.csv_text)) if row.get('company_name')]
+    meter = get_usage_meter()
+    db = SessionLocal()
+    try:
+        # The API only checked that some quota was left; rows past it are not imported
+        quota = meter.remaining(db, payload.org_id, "leads_imported")
+        duplicates = DuplicateIndex(db, payload.org_id, rows)
+        imported, skipped, over_quota = [], 0, 0
+        for row in rows:
+            if duplicates.match(row):
+                skipped += 1
+                continue
+            if quota is not None and len(imported) >= quota:
+                over_quota += 1
+                continue
+
+            lead = Lead(
+                id=uuid4(),
+                org_id=payload.org_id,
+                company_name=row['company_name'],
+                email=row.get('email'),
+                phone=row.get('phone'),
+                industry=row.get('industry'),
+                website=row.get('website'),
+                contact_name=row.get('contact_name'),
+                status="new",
+                score=0
+            )
+            db.add(lead)
+            duplicates.add(lead_fields(lead), lead.id)
+            imported.append(lead)
+
+        db.flush()
+        index_leads(db, payload.org_id, [(lead.id, lead_fields(lead)) for lead in imported])
+        db.commit()
+    finally:
+        db.close()
+
+    meter.record(payload.org_id, "leads_imported", len(imported))
+    return {"imported": len(imported), "skipped": skipped, "over_quota": over_quota, "truncated": over_quota > 0}
+
+
+class ReindexMatchKeysPayload(BaseModel):
+    org_id: UUID
+
+
+@task("leads.reindex_match_keys", payload=ReindexMatchKeysPayload)
+def reindex_match_keys(payload: ReindexMatchKeysPayload) -> dict:
+    """Rebuild the dedup blocking keys for every lead in an org"""
+    db = SessionLocal()
+    try:
+        columns = [Lead.id] + [getattr(Lead, f) for f in IDENTITY_FIELDS]
+        query = db.query(*columns).filter(Lead.org_id == payload.org_id).order_by(Lead.id)
+        indexed, last_id = 0, None
+        while True:
+            page = query.filter(Lead.id > last_id) if last_id else query
+            batch = page.limit(2000).all()
+            if not batch:
+                break
+            index_leads(db, payload.org_id, [(row.id, dict(zip(IDENTITY_FIELDS, row[1:]))) for row in batch])
+            db.commit()
+            indexed += len(batch)
+            last_id = batch[-1].id
+        # Fresh keys, fresh clusters
+        clusters = build_duplicate_report(db, payload.org_id)
+    finally:
+        db.close()
+    return {"indexed": indexed, "clusters": clusters}
+
+
+class FindDuplicatesPayload(BaseModel):
+    org_id: UUID
+    requested_at: Optional[datetime] = None
+
+
+@task("leads.find_duplicates", payload=FindDuplicatesPayload)
+def find_duplicates(payload: FindDuplicatesPayload) -> dict:
+    """Rebuild the stored duplicate report (skipped if one built since the request covers it)"""
+    db = SessionLocal()
+    try:
+        clusters = build_duplicate_report(db, payload.org_id, payload.requested_at)
+    finally:
+        db.close()
+    return {"clusters": clusters, "skipped": clusters is None}
+
+
+class ScoreLeadsPayload(BaseModel):
+    org_id: UUID
+    lead_ids: Optional[List[UUID]] = None
+
+
+@task("leads.score", payload=ScoreLeadsPayload)
+def score_leads(payload: ScoreLeadsPayload) -> dict:
+    from app.services.ai_service import AIService
+
+    db = SessionLocal()
+    try:
+        query = db.query(Lead).filter(Lead.org_id == payload.org_id)
+        if payload.lead_ids:
+            query = query.filter(Lead.id.in_(payload.lead_ids))
+
+        scored = 0
+        for lead in query.yield_per(500):
+            result = AIService.score_lead({
+                "company_name": lead.company_name,
+                "industry": lead.industry or "",
+                "funding_amount": lead.funding_amount or "",
+                "funding_stage": lead.funding_stage,
+                "employee_count": lead.employee_count,
+                "website": lead.website,
+                "email": lead.email,
+                "phone": lead.phone
+            })
+            lead.score = result["score"]
+            lead.score_breakdown = result["breakdown"]
+            scored += 1
+        db.commit()
+    finally:
+        db.close()
+    return {"scored": scored}
+
+
+# ==================== SOURCES ====================
+
+class ScrapeSourcePayload(BaseModel):
+    source_id: UUID
+
+
+@task("sources.scrape", payload=ScrapeSourcePayload)
+def scrape_source(payload: ScrapeSourcePayload) -> dict:
+    import asyncio
+    from dataclasses import asdict
+    from app.services.scraper import scrape_source as run_scrape
+
+    return asdict(asyncio.run(run_scrape(payload.source_id)))
+
+
+# ==================== CAMPAIGNS ====================
+
+class RunCampaignPayload(BaseModel):
+    campaign_id: UUID
+
+
+class RunActiveCampaignsPayload(BaseModel):
+    pass
+
+
+@task("campaigns.run", payload=RunCampaignPayload)
+def run_campaign(payload: RunCampaignPayload) -> dict:
+    from app.services.campaign_runner import run_campaign as run
+
+    db = SessionLocal()
+    try:
+        return run(db, payload.campaign_id)
+    finally:
+        db.close()
+
+
+@task("campaigns.run_active", payload=RunActiveCampaignsPayload)
+def run_active_campaigns(payload: RunActiveCampaignsPayload) -> dict:
+    """Fan out one campaigns.run per active campaign"""
+    db = SessionLocal()
+    try:
+        active = db.query(Campaign.id, Campaign.org_id).filter(Campaign.status == "active").all()
+    finally:
+        db.close()
+    for campaign_id, org_id in active:
+        run_campaign.enqueue(RunCampaignPayload(campaign_id=campaign_id), org_id=org_id)
+    return {"enqueued": len(active)}
+
+
+class ReconcileCampaignStatsPayload(BaseModel):
+    pass
+
+
+@task("campaigns.reconcile_stats", payload=ReconcileCampaignStatsPayload, max_retries=2)
+def reconcile_campaign_stats(payload: ReconcileCampaignStatsPayload) -> dict:
+    """Recount the funnel counters from messages, correcting any drift"""
+    from app.services.campaign_stats import reconcile
+
+    db = SessionLocal()
+    try:
+        return reconcile(db)
+    finally:
+        db.close()
+
+
+# ==================== REPLIES ====================
+
+class IngestRepliesPayload(BaseModel):
+    events: List[InboundReply]
+
+
+class AnalyzeRepliesPayload(BaseModel):
+    org_id: UUID
+    reply_ids: List[UUID]
+
+
+@task("replies.ingest", payload=IngestRepliesPayload)
+def ingest_replies(payload: IngestRepliesPayload) -> dict:
+    from app.services.replies import ingest_replies as ingest
+
+    db = SessionLocal()
+    try:
+        result = ingest(db, [event.model_dump() for event in payload.events])
+    finally:
+        db.close()
+
+    size = settings.REPLY_ANALYSIS_BATCH_SIZE
+    for org_id, reply_ids in result.pop("pending").items():
+        for start in range(0, len(reply_ids), size):
+            analyze_replies.enqueue(
+                AnalyzeRepliesPayload(org_id=org_id, reply_ids=reply_ids[start:start + size]), org_id=org_id
+            )
+    return result
+
+
+@task("replies.analyze", payload=AnalyzeRepliesPayload)
+def analyze_replies(payload: AnalyzeRepliesPayload) -> dict:
+    from app.services.replies import analyze_replies as analyze
+
+    db = SessionLocal()
+    try:
+        return analyze(db, payload.org_id, payload.reply_ids)
+    finally:
+        db.close()
+
+
+# ==================== MAINTENANCE ====================
+
+class MaintainActivityPayload(BaseModel):
+    pass
+
+
+@task("activity.maintain_partitions", payload=MaintainActivityPayload, max_retries=2)
+def maintain_activity_partitions(payload: MaintainActivityPayload) -> dict:
+    from app.services.activity_retention import maintain
+
+    db = SessionLocal()
+    try:
+        return maintain(db)
+    finally:
+        db.close()
+
+
+schedule(run_active_campaigns, RunActiveCampaignsPayload(), settings.CAMPAIGN_RUN_INTERVAL_SECONDS)
+schedule(reconcile_campaign_stats, ReconcileCampaignStatsPayload(), settings.CAMPAIGN_STATS_RECONCILE_INTERVAL_SECONDS)
+schedule(maintain_activity_partitions, MaintainActivityPayload(), settings.ACTIVITY_MAINTENANCE_INTERVAL_SECONDS)
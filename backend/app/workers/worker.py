@@ -0,0 +1,157 @@
+"""
+Worker - Runs queued tasks with retries, backoff and dead-lettering
+"""
+
+from typing import List, Optional, Set
+import logging
+import random
+import threading
+import time
+import traceback
+
+from app.config import settings
+from app.workers.queue import SCHEDULES, TASKS, Job, JobStatus, get_queue
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with equal jitter (half the step fixed, half random), capped at TASK_RETRY_MAX_SECONDS"""
+    ceiling = min(settings.TASK_RETRY_MAX_SECONDS, settings.TASK_RETRY_BASE_SECONDS * (2 ** (attempt - 1)))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class Worker:
+    """Pulls jobs from the queue on `concurrency` threads"""
+
+    def __init__(self, concurrency: int = settings.WORKER_CONCURRENCY, queue=None):
+        self.concurrency = concurrency
+        self.queue = queue or get_queue()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._running: Set[str] = set()
+        self._running_lock = threading.Lock()
+
+    def start(self) -> None:
+        self._stopping.clear()
+        for i in range(self.concurrency):
+            thread = threading.Thread(target=self._loop, name=f"task-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if SCHEDULES:
+            thread = threading.Thread(target=self._schedule_loop, name="task-scheduler", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if hasattr(self.queue, "renew_leases"):
+            thread = threading.Thread(target=self._heartbeat_loop, name="task-heartbeat", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def request_stop(self) -> None:
+        self._stopping.set()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Finish in-flight jobs, then stop taking new ones"""
+        self._stopping.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+
+    def run_forever(self) -> None:
+        self.start()
+        last_requeue = 0.0
+        try:
+            while not self._stopping.is_set():
+                time.sleep(1)
+                if hasattr(self.queue, "requeue_stale") and time.monotonic() - last_requeue > 60:
+                    try:
+                        self.queue.requeue_stale(settings.TASK_VISIBILITY_TIMEOUT_SECONDS)
+                    except Exception:
+                        # A Redis hiccup must not take the worker down; try again next minute
+                        logger.exception("Failed to requeue stale jobs")
+                    last_requeue = time.monotonic()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def _loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = self.queue.pop(timeout=1.0)
+            except Exception:
+                logger.exception("Failed to fetch job")
+                time.sleep(1)
+                continue
+            if job is not None:
+                self.execute(job)
+
+    def _schedule_loop(self) -> None:
+        last_slots = {}
+        while not self._stopping.is_set():
+            now = time.time()
+            for definition, payload, every in SCHEDULES:
+                slot = int(now // every)
+                if last_slots.get(definition.name) == slot:
+                    continue
+                last_slots[definition.name] = slot
+                try:
+                    if self.queue.claim_schedule(definition.name, slot, every):
+                        definition.enqueue(payload)
+                except Exception:
+                    logger.exception("Failed to schedule %s", definition.name)
+            self._stopping.wait(1.0)
+
+    def _heartbeat_loop(self) -> None:
+        """Renew the leases of running jobs, so long jobs are never taken for dead ones"""
+        interval = max(1.0, settings.TASK_VISIBILITY_TIMEOUT_SECONDS / 3)
+        while not self._stopping.wait(interval):
+            with self._running_lock:
+                running = list(self._running)
+            try:
+                self.queue.renew_leases(running)
+            except Exception:
+                logger.exception("Failed to renew job leases")
+
+    def execute(self, job: Job) -> None:
+        definition = TASKS.get(job.name)
+        job.attempts += 1
+        if definition is None:
+            job.error = f"Unknown task: {job.name}"
+            self.queue.dead_letter(job)
+            return
+
+        with self._running_lock:
+            self._running.add(job.id)
+        try:
+            job.result = definition.run(job)
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            if job.attempts <= job.max_retries:
+                delay = retry_delay(job.attempts)
+                logger.warning("Task %s (%s) failed, retry %d in %.1fs", job.name, job.id, job.attempts, delay)
+                self.queue.retry(job, delay)
+            else:
+                logger.error("Task %s (%s) dead-lettered:\n%s", job.name, job.id, traceback.format_exc())
+                self.queue.dead_letter(job)
+            return
+        finally:
+            with self._running_lock:
+                self._running.discard(job.id)
+
+        job.status = JobStatus.succeeded
+        job.error = None
+        self.queue.save(job)
+
+
+_worker: Optional[Worker] = None
+
+def get_inprocess_worker() -> Optional[Worker]:
+    """Worker threads inside the API process, only for the in-memory backend"""
+    global _worker
+    if settings.TASK_QUEUE_BACKEND != "memory":
+        return None
+    if _worker is None:
+        _worker = Worker()
+    return _worker
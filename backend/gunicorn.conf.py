@@ -0,0 +1,51 @@
+"""
+Gunicorn configuration - production serving with uvicorn workers
+
+    gunicorn app.main:app -c gunicorn.conf.py
+
+One process per usable CPU by default (WEB_WORKERS overrides), uvloop and
+httptools, and workers recycled after WEB_MAX_REQUESTS (with jitter, so they
+never restart together). Each worker opens its own database pool, sized so
+all of them together stay within DATABASE_MAX_CONNECTIONS.
+Several workers need TASK_QUEUE_BACKEND=redis; with the in-memory queue the
+config refuses to load unless WEB_WORKERS=1.
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.config import settings  # noqa: E402
+from app.serving import GROUP_ENV, PROCESSES_ENV, default_web_workers, pool_limits  # noqa: E402
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = default_web_workers()
+# loop/http "auto" resolve to uvloop and httptools, both installed by uvicorn[standard]
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Slow AI generations and exports stream for a while; the timeout only catches wedged workers
+timeout = settings.WEB_TIMEOUT_SECONDS
+graceful_timeout = settings.WEB_GRACEFUL_TIMEOUT_SECONDS
+keepalive = settings.WEB_KEEPALIVE_SECONDS
+max_requests = settings.WEB_MAX_REQUESTS
+max_requests_jitter = settings.WEB_MAX_REQUESTS_JITTER
+
+# Each worker imports the app itself: nothing (threads, pools, sockets) is shared across fork
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
+
+# Read by every worker to size its pool and per-process limits
+os.environ[PROCESSES_ENV] = str(workers)
+os.environ[GROUP_ENV] = str(os.getpid())
+
+
+def when_ready(server):
+    pool_size, max_overflow = pool_limits(workers)
+    server.log.info(
+        "Serving with %d workers, database pool %d + %d overflow per worker", workers, pool_size, max_overflow
+    )
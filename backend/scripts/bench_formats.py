@@ -0,0 +1,122 @@
+"""
+Payload size and serialization CPU per response format on Arabic lead pages
+
+    python scripts/bench_formats.py --leads 100 --rounds 200
+
+Builds LeadListResponse pages shaped like /api/leads output (Arabic company
+names, contacts, notes and tags), then times each encoding and compression
+combination the API can negotiate. CPU is process time per page.
+"""
+
+from datetime import datetime, timedelta
+from uuid import uuid4
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.schemas import LeadListResponse, LeadResponse  # noqa: E402
+from app.services.serialization import json_bytes, msgpack_bytes  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+COMPANIES = ["شركة الرياض للتقنية", "مؤسسة جدة التجارية", "حلول الخليج الرقمية", "نماء للاستثمار",
+             "تمكين للخدمات اللوجستية", "سحابة العرب", "منصة وصل", "بوابة الدفع السعودية"]
+CONTACTS = ["محمد العتيبي", "سارة القحطاني", "عبدالله الشهري", "نورة الدوسري", "فهد الغامدي"]
+TITLES = ["الرئيس التنفيذي", "مدير المبيعات", "مدير التسويق", "المدير التقني", "مدير العمليات"]
+INDUSTRIES = ["التقنية المالية", "التجارة الإلكترونية", "الخدمات اللوجستية", "الرعاية الصحية", "العقارات"]
+CITIES = ["الرياض", "جدة", "الدمام", "الخبر", "مكة المكرمة"]
+TAGS = ["أولوية عالية", "تمويل حديث", "معرض ليب", "متابعة", "شريك محتمل"]
+
+
+def lead(i: int) -> LeadResponse:
+    created = datetime(2024, 1, 1) + timedelta(hours=i)
+    return LeadResponse(
+        id=str(uuid4()),
+        org_id=str(uuid4()),
+        company_name=random.choice(COMPANIES),
+        company_name_ar=random.choice(COMPANIES),
+        website=f"https://company{i}.sa",
+        industry=random.choice(INDUSTRIES),
+        contact_name=random.choice(CONTACTS),
+        contact_title=random.choice(TITLES),
+        email=f"contact{i}@company{i}.sa",
+        phone=f"+9665{random.randint(10000000, 99999999)}",
+        location=random.choice(CITIES),
+        funding_amount=f"{random.randint(1, 50)} مليون ريال",
+        funding_stage=random.choice(["Seed", "Series A", "Series B"]),
+        employee_count=random.choice(["11-50", "51-200", "201-500"]),
+        score=random.randint(1, 10),
+        status="new",
+        tags=random.sample(TAGS, 2),
+        notes="تواصلنا معهم في معرض ليب وأبدوا اهتماماً بالحلول المقترحة، يرجى المتابعة بعد أسبوعين.",
+        created_at=created.isoformat(),
+        updated_at=created.isoformat(),
+    )
+
+
+def cpu(fn, rounds: int) -> float:
+    start = time.process_time()
+    for _ in range(rounds):
+        fn()
+    return (time.process_time() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response formats on Arabic lead pages")
+    parser.add_argument("--leads", type=int, default=100, help="leads per page")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(7)
+    page = LeadListResponse(leads=[lead(i) for i in range(args.leads)], total=args.leads, page=1,
+                            page_size=args.leads, total_pages=1)
+
+    encoders = {
+        "json (\\u escaped)": lambda: json.dumps(page.model_dump(mode="json")).encode(),
+        "json (utf-8)": lambda: json_bytes(page),
+    }
+    if msgpack is not None:
+        encoders["msgpack"] = lambda: msgpack_bytes(page)
+    else:
+        print("msgpack not installed, skipping")
+
+    compressors = {"identity": lambda b: b, "gzip-6": lambda b: gzip.compress(b, 6)}
+    if brotli is not None:
+        compressors["br-4"] = lambda b: brotli.compress(b, quality=4)
+    else:
+        print("brotli not installed, skipping")
+
+    print(f"{args.leads} leads per page, {args.rounds} rounds\n")
+    print(f"{'format':<20}{'encoding':<10}{'bytes':>10}{'encode ms':>12}{'compress ms':>13}{'total ms':>10}")
+    for name, encode in encoders.items():
+        body = encode()
+        encode_ms = cpu(encode, args.rounds)
+        for cname, compress in compressors.items():
+            size = len(compress(body))
+            compress_ms = cpu(lambda: compress(body), args.rounds) if cname != "identity" else 0.0
+            print(f"{name:<20}{cname:<10}{size:>10,}{encode_ms:>12.3f}{compress_ms:>13.3f}{encode_ms + compress_ms:>10.3f}")
+
+    # Decode side, for clients choosing a format
+    body = json_bytes(page)
+    print(f"\njson decode ms: {cpu(lambda: json.loads(body), args.rounds):.3f}")
+    if msgpack is not None:
+        packed = msgpack_bytes(page)
+        print(f"msgpack decode ms: {cpu(lambda: msgpack.unpackb(packed), args.rounds):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Per-tenant lead query latency: one heap table vs leads hash-partitioned on org_id
+
+    python scripts/bench_partitions.py --url postgresql://localhost/faris_bench --leads 50000000
+
+Loads the same skewed tenant mix (one whale, a few medium orgs, a long tail of
+small ones) into a plain table and a 16-way hash-partitioned copy, both with the
+indexes from database/schema.sql, in a scratch schema that is dropped at the end.
+Then times the queries the lead routes run, per tenant size class: the list
+page (count + newest 20), status counts for the dashboard, a lead by id, and a
+status + score filter. Finally it bloats the whale's rows and times VACUUM on
+the heap against the whale's partition alone.
+
+Loading 50M rows takes a while and needs ~40GB of disk; --keep reuses a load.
+"""
+
+from typing import Dict, List
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+
+from app.config import settings  # noqa: E402
+
+SCHEMA = "bench_partitions"
+PARTITIONS = 16
+
+COLUMNS = """
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
+    org_id UUID NOT NULL,
+    company_name VARCHAR(255) NOT NULL,
+    industry VARCHAR(100),
+    email VARCHAR(255),
+    score INTEGER DEFAULT 0,
+    status VARCHAR(50) DEFAULT 'new',
+    notes TEXT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+"""
+
+INDEXES = [
+    "CREATE INDEX ON {t}(id)",
+    "CREATE INDEX ON {t}(org_id, status)",
+    "CREATE INDEX ON {t}(org_id, score DESC)",
+    "CREATE INDEX ON {t}(org_id, industry)",
+]
+
+QUERIES = {
+    "list page": [
+        "SELECT COUNT(*) FROM {t} WHERE org_id = :org",
+        "SELECT * FROM {t} WHERE org_id = :org ORDER BY created_at DESC LIMIT 20",
+    ],
+    "status counts": ["SELECT status, COUNT(*) FROM {t} WHERE org_id = :org GROUP BY status"],
+    "lead by id": ["SELECT * FROM {t} WHERE org_id = :org AND id = :id"],
+    "status + score": [
+        "SELECT * FROM {t} WHERE org_id = :org AND status = 'new' AND score >= 7 "
+        "ORDER BY created_at DESC LIMIT 20",
+    ],
+}
+
+STATUSES = "(ARRAY['new','new','new','contacted','replied','meeting_scheduled','converted','archived'])"
+
+
+def tenant_mix(total: int, tenants: int) -> Dict[str, List[int]]:
+    """Row counts per tenant: a whale with 30%, ten medium orgs with 40%, the tail shares the rest"""
+    small = max(1, tenants - 11)
+    return {
+        "whale": [int(total * 0.30)],
+        "medium": [int(total * 0.04)] * 10,
+        "small": [max(1, int(total * 0.30 / small))] * small,
+    }
+
+
+def load(conn, total: int, tenants: int) -> None:
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    conn.execute(text(f"CREATE TABLE {SCHEMA}.tenants (org_id UUID PRIMARY KEY, size_class TEXT, rows BIGINT)"))
+    conn.execute(text(f"CREATE TABLE {SCHEMA}.heap ({COLUMNS}, PRIMARY KEY (id))"))
+    conn.execute(text(f"CREATE TABLE {SCHEMA}.part ({COLUMNS}, PRIMARY KEY (org_id, id)) PARTITION BY HASH (org_id)"))
+    for i in range(PARTITIONS):
+        conn.execute(text(
+            f"CREATE TABLE {SCHEMA}.part_p{i:02d} PARTITION OF {SCHEMA}.part "
+            f"FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {i})"
+        ))
+
+    started = time.perf_counter()
+    loaded = 0
+    for size_class, counts in tenant_mix(total, tenants).items():
+        for rows in counts:
+            org_id = conn.execute(text("SELECT gen_random_uuid()")).scalar()
+            conn.execute(text(f"INSERT INTO {SCHEMA}.tenants VALUES (:org, :size_class, :rows)"),
+                         {"org": org_id, "size_class": size_class, "rows": rows})
+            # Chunks keep each statement's WAL and memory bounded for the whale
+            for first in range(0, rows, 1_000_000):
+                conn.execute(text(f"""
+                    INSERT INTO {SCHEMA}.heap (org_id, company_name, industry, email, score, status, notes, created_at)
+                    SELECT :org, 'company ' || g, 'industry ' || (g % 12), 'contact' || g || '@example.sa',
+                           g % 11, {STATUSES}[1 + g % 8], REPEAT(MD5(g::TEXT), 6),
+                           TIMESTAMP '2024-01-01' + (g || ' minutes')::INTERVAL
+                    FROM generate_series(:first, :last) g
+                """), {"org": org_id, "first": first, "last": min(rows, first + 1_000_000) - 1})
+            loaded += rows
+            if size_class != "small" or loaded % 1_000_000 < rows:
+                print(f"  {loaded:,} rows ({time.perf_counter() - started:.0f}s)", flush=True)
+
+    conn.execute(text(f"INSERT INTO {SCHEMA}.part SELECT * FROM {SCHEMA}.heap"))
+    for table in ("heap", "part"):
+        for index in INDEXES:
+            conn.execute(text(index.format(t=f"{SCHEMA}.{table}")))
+        conn.execute(text(f"VACUUM ANALYZE {SCHEMA}.{table}"))
+    print(f"Loaded {loaded:,} rows into both layouts in {time.perf_counter() - started:.0f}s\n")
+
+
+def tenants_by_class(conn) -> Dict[str, List[str]]:
+    by_class: Dict[str, List[str]] = {}
+    for org_id, size_class in conn.execute(text(f"SELECT org_id, size_class FROM {SCHEMA}.tenants")):
+        by_class.setdefault(size_class, []).append(org_id)
+    return by_class
+
+
+def timed_ms(conn, statements: List[str], table: str, params: Dict) -> float:
+    started = time.perf_counter()
+    for statement in statements:
+        conn.execute(text(statement.format(t=f"{SCHEMA}.{table}")), params).fetchall()
+    return (time.perf_counter() - started) * 1000
+
+
+def percentile(samples: List[float], p: float) -> float:
+    return statistics.quantiles(samples, n=100)[int(p) - 1] if len(samples) > 1 else samples[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-tenant lead queries on heap vs hash-partitioned leads")
+    parser.add_argument("--url", default=settings.DATABASE_URL, help="scratch database (a schema is created and dropped)")
+    parser.add_argument("--leads", type=int, default=50_000_000, help="total leads across all tenants")
+    parser.add_argument("--tenants", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=200, help="queries per size class and layout")
+    parser.add_argument("--keep", action="store_true", help="reuse a previous load and keep it afterwards")
+    args = parser.parse_args()
+
+    random.seed(7)
+    engine = create_engine(args.url, isolation_level="AUTOCOMMIT")
+    with engine.connect() as conn:
+        exists = conn.execute(text("SELECT TO_REGCLASS(:t)"), {"t": f"{SCHEMA}.tenants"}).scalar()
+        if not (args.keep and exists):
+            print(f"Loading {args.leads:,} leads for {args.tenants} tenants")
+            load(conn, args.leads, args.tenants)
+        by_class = tenants_by_class(conn)
+
+        print(f"{'query':<16}{'tenants':<9}{'heap p50':>10}{'heap p95':>10}{'part p50':>10}{'part p95':>10}")
+        for name, statements in QUERIES.items():
+            for size_class in ("small", "medium", "whale"):
+                samples: Dict[str, List[float]] = {"heap": [], "part": []}
+                for _ in range(args.rounds):
+                    org_id = random.choice(by_class[size_class])
+                    lead_id = conn.execute(
+                        text(f"SELECT id FROM {SCHEMA}.part WHERE org_id = :org LIMIT 1"), {"org": org_id}
+                    ).scalar()
+                    params = {"org": org_id, "id": lead_id}
+                    # Alternate layouts so cache warming favours neither
+                    for table in random.sample(["heap", "part"], 2):
+                        samples[table].append(timed_ms(conn, statements, table, params))
+                heap, part = samples["heap"], samples["part"]
+                print(f"{name:<16}{size_class:<9}{percentile(heap, 50):>10.2f}{percentile(heap, 95):>10.2f}"
+                      f"{percentile(part, 50):>10.2f}{percentile(part, 95):>10.2f}")
+
+        # One tenant's churn: the heap vacuums every tenant's pages, the partition only its own
+        whale = by_class["whale"][0]
+        conn.execute(text(f"UPDATE {SCHEMA}.heap SET score = score + 1 WHERE org_id = :org AND score < 2"), {"org": whale})
+        conn.execute(text(f"UPDATE {SCHEMA}.part SET score = score + 1 WHERE org_id = :org AND score < 2"), {"org": whale})
+        partition = conn.execute(
+            text(f"SELECT tableoid::REGCLASS::TEXT FROM {SCHEMA}.part WHERE org_id = :org LIMIT 1"), {"org": whale}
+        ).scalar()
+        print()
+        for label, table in (("heap", f"{SCHEMA}.heap"), ("whale partition", partition)):
+            started = time.perf_counter()
+            conn.execute(text(f"VACUUM {table}"))
+            print(f"VACUUM after whale updates, {label}: {time.perf_counter() - started:.2f}s")
+
+        if not args.keep:
+            conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+EXPLAIN the hot lead, campaign and message queries and fail on sequential scans
+
+    python scripts/check_query_plans.py --url postgresql://localhost/faris_scratch
+
+Run against a scratch database that has database/schema.sql and every
+migration applied. Seeds a skewed set of orgs (one whale, a long tail of small
+ones), VACUUM ANALYZEs, then EXPLAINs each query as the app builds it, for the
+whale and for a small org. Any Seq Scan on leads, messages or campaigns, or on
+their partitions, is a failure: exit status 1, for CI. The seeded orgs are
+deleted afterwards.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Tuple
+from uuid import UUID, uuid4
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import psycopg2.extras  # noqa: E402
+from sqlalchemy import case, create_engine, func, select, text, update  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.api import _filter_leads  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.models import Campaign, Lead, Message  # noqa: E402
+from app.schemas import LeadStatus  # noqa: E402
+from app.services.campaign_runner import _targets  # noqa: E402
+
+psycopg2.extras.register_uuid()
+
+CHECKED_TABLES = ("leads", "messages", "campaigns")
+
+SEED_SQL = """
+    INSERT INTO organizations (id, name, slug)
+    SELECT org_id, 'plan check ' || n, 'plan-check-' || org_id FROM plan_check_orgs;
+
+    INSERT INTO campaigns (org_id, name, status, created_at)
+    SELECT o.org_id, 'campaign ' || c, CASE WHEN c = 1 THEN 'active' ELSE 'completed' END,
+           NOW() - (c || ' days')::INTERVAL
+    FROM plan_check_orgs o CROSS JOIN generate_series(1, 3) c;
+
+    INSERT INTO leads (org_id, company_name, industry, score, status, created_at)
+    SELECT o.org_id, 'company ' || g, 'industry ' || (g % 12), g % 11,
+           (ARRAY['new','new','new','contacted','replied','converted','archived'])[1 + g % 7],
+           NOW() - (g || ' minutes')::INTERVAL
+    FROM plan_check_orgs o CROSS JOIN LATERAL generate_series(1, o.leads) g;
+
+    ANALYZE leads;
+    ANALYZE campaigns;
+
+    INSERT INTO messages (org_id, lead_id, campaign_id, channel, body, status, external_id, created_at)
+    SELECT l.org_id, l.id, c.id, 'email', 'body',
+           (ARRAY['scheduled','sent','delivered','opened','replied'])[1 + ABS(HASHTEXT(l.id::TEXT)) % 5],
+           'ext-' || l.id, l.created_at
+    FROM leads l
+    JOIN campaigns c ON c.org_id = l.org_id AND c.status = 'active'
+    WHERE l.org_id IN (SELECT org_id FROM plan_check_orgs) AND l.score % 2 = 0;
+"""
+
+
+def seed(conn, leads: int, orgs: int) -> Tuple[UUID, UUID]:
+    """(whale, small org): the whale holds a quarter of all leads"""
+    whale, small = uuid4(), uuid4()
+    tail = max(1, (leads - leads // 4) // (orgs - 1))
+    conn.execute(text("CREATE TEMP TABLE plan_check_orgs (org_id UUID, n INTEGER, leads INTEGER)"))
+    conn.execute(text("INSERT INTO plan_check_orgs VALUES (:org, 0, :leads)"), {"org": whale, "leads": leads // 4})
+    conn.execute(text("INSERT INTO plan_check_orgs VALUES (:org, 1, :leads)"), {"org": small, "leads": tail})
+    conn.execute(
+        text("INSERT INTO plan_check_orgs SELECT gen_random_uuid(), n, :leads FROM generate_series(2, :orgs - 1) n"),
+        {"leads": tail, "orgs": orgs},
+    )
+    for statement in SEED_SQL.split(";"):
+        if statement.strip():
+            conn.execute(text(statement))
+    return whale, small
+
+
+def cleanup(engine) -> None:
+    with engine.begin() as conn:
+        # Fresh statistics, or the cascades plan a scan per deleted lead
+        for table in CHECKED_TABLES + ("lead_match_keys", "message_replies"):
+            conn.execute(text(f"ANALYZE {table}"))
+        conn.execute(text("DELETE FROM organizations WHERE slug LIKE 'plan-check-%'"))
+
+
+def hot_queries(db: Session, org_id: UUID) -> Iterator[Tuple[str, Any, bool]]:
+    """(name, statement, whole_tenant) for what the routes and workers run for one org
+
+    whole_tenant statements read most of the org's rows: for an org that fills
+    most of its partition, scanning that partition is the right plan.
+    """
+    lead_id, external_id = db.execute(
+        select(Message.lead_id, Message.external_id).where(Message.org_id == org_id).limit(1)
+    ).one()
+    campaign = db.query(Campaign).filter(Campaign.org_id == org_id, Campaign.status == "active").first()
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    # GET /api/leads: count, then a page of ids off the covering index, then the rows
+    def page(**filters):
+        return _filter_leads(select(Lead.id), org_id, **filters).order_by(Lead.created_at.desc(), Lead.id.desc())
+
+    yield "leads count", select(func.count()).select_from(_filter_leads(select(Lead.id), org_id).subquery()), False
+    yield "leads page 1", page().limit(20), False
+    yield "leads page 50", page().offset(980).limit(20), False
+    yield "leads page, status", page(status=LeadStatus.contacted).limit(20), False
+    yield "leads page, min score", page(min_score=9).limit(20), False
+    yield "leads page rows", select(Lead).where(Lead.org_id == org_id, Lead.id.in_([lead_id])), False
+    yield "lead by id", select(Lead).where(Lead.id == lead_id, Lead.org_id == org_id), False
+
+    # GET /api/leads/{id}/timeline
+    lead_messages = (Message.org_id == org_id, Message.lead_id == lead_id)
+    yield "timeline messages", select(Message).where(*lead_messages).order_by(
+        Message.created_at.desc(), Message.id.desc()
+    ).limit(21), False
+    yield "timeline campaigns", select(Campaign).where(
+        Campaign.org_id == org_id, Campaign.id.in_(select(Message.campaign_id).where(*lead_messages))
+    ), False
+
+    # GET /api/dashboard/stats
+    status = func.coalesce(Lead.status, "new")
+    band = case((Lead.score >= 7, "high"), (Lead.score >= 4, "medium"), else_="low")
+    yield "dashboard leads", (
+        select(status, band, func.count()).where(Lead.org_id == org_id).group_by(status, band)
+    ), True
+    yield "dashboard month", select(func.count()).where(
+        Lead.org_id == org_id, Lead.created_at >= today.replace(day=1)
+    ), True
+    yield "dashboard messages", select(
+        func.count().filter(Message.status.in_(["sent", "delivered", "opened", "replied"])),
+        func.count().filter(Message.status == "replied"),
+    ).where(Message.org_id == org_id), True
+    yield "dashboard campaigns", select(func.count()).where(
+        Campaign.org_id == org_id, Campaign.status == "active"
+    ), False
+
+    # GET /api/campaigns and the campaign worker
+    yield "campaigns list", select(Campaign).where(Campaign.org_id == org_id).order_by(
+        Campaign.created_at.desc()
+    ), False
+    yield "active campaigns", select(Campaign.id, Campaign.org_id).where(Campaign.status == "active"), False
+    messaged = func.count(func.distinct(Message.lead_id))
+    yield "campaign budget", select(messaged.filter(Message.created_at >= today), messaged).where(
+        Message.campaign_id == campaign.id
+    ), False
+    yield "campaign targets", _targets(campaign, 50), True
+
+    # Provider callbacks and dedupe merges
+    yield "reply by external_id", select(Message.id, Message.org_id, Message.external_id).where(
+        Message.external_id.in_([external_id])
+    ), False
+    yield "message by id", update(Message).where(Message.id == uuid4()).values(status="replied"), False
+    yield "merge messages", update(Message).where(
+        Message.org_id == org_id, Message.lead_id.in_([lead_id])
+    ).values(lead_id=lead_id), False
+
+
+def plan_nodes(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def seq_scans(db: Session, statement) -> List[str]:
+    compiled = statement.compile(dialect=db.bind.dialect, compile_kwargs={"render_postcompile": True})
+    raw = db.connection().exec_driver_sql("EXPLAIN (FORMAT JSON) " + compiled.string, compiled.params).scalar()
+    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+    return sorted({
+        node["Relation Name"] for node in plan_nodes(plan)
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name", "").startswith(CHECKED_TABLES)
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when a hot query plans a sequential scan")
+    parser.add_argument("--url", default=settings.DATABASE_URL, help="scratch database with the schema applied")
+    parser.add_argument("--leads", type=int, default=200_000)
+    parser.add_argument("--orgs", type=int, default=400)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    cleanup(engine)
+    try:
+        with engine.begin() as conn:
+            whale, small = seed(conn, args.leads, args.orgs)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for table in CHECKED_TABLES:
+                conn.execute(text(f"VACUUM ANALYZE {table}"))
+
+        failures = 0
+        with Session(engine) as db:
+            for label, org_id in (("whale", whale), ("small org", small)):
+                for name, statement, whole_tenant in hot_queries(db, org_id):
+                    if whole_tenant and org_id == whale:
+                        print(f"{label:<10}{name:<24}skipped (reads the whale's whole partition)")
+                        continue
+                    scans = seq_scans(db, statement)
+                    failures += bool(scans)
+                    result = "SEQ SCAN " + ", ".join(scans) if scans else "ok"
+                    print(f"{label:<10}{name:<24}{result}")
+            db.rollback()
+    finally:
+        cleanup(engine)
+
+    if failures:
+        print(f"\n{failures} quer{'y' if failures == 1 else 'ies'} fell back to a sequential scan")
+        sys.exit(1)
+    print("\nEvery hot query uses an index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Fake Anthropic Messages API for exercising the AI call policy locally
+
+    python scripts/fake_anthropic.py --port 8089 --latency 0.2 --error-rate 0.3 --error-status 529
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8089 ANTHROPIC_API_KEY=fake uvicorn app.main:app
+
+Serves POST /v1/messages (plain and stream=true) with configurable latency,
+slow-tail probability and error injection. Errors carry Retry-After.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import random
+import re
+import time
+import uuid
+
+REPLY = "الموضوع: فرصة تعاون\n\nمرحباً، لاحظنا نمو شركتكم مؤخراً ونود مناقشة كيف يمكننا المساعدة."
+
+
+class FakeAnthropicHandler(BaseHTTPRequestHandler):
+    options: argparse.Namespace = None
+
+    def log_message(self, format, *args):
+        if self.options.verbose:
+            super().log_message(format, *args)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        opts = self.options
+
+        delay = opts.latency
+        if random.random() < opts.slow_rate:
+            delay += opts.slow_latency
+        time.sleep(delay)
+
+        if random.random() < opts.error_rate:
+            body = json.dumps({"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}}).encode()
+            self.send_response(opts.error_status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Retry-After", str(opts.retry_after))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        text = opts.reply
+        prompt = json.dumps(request.get("messages", []), ensure_ascii=False)
+        if "JSON" in prompt:
+            analysis = {"sentiment": "positive", "intent": "interested", "inshallah_score": 7,
+                        "suggested_action": "حدد موعداً", "analysis": "رد إيجابي"}
+            # Batched analysis prompts number each reply: 1. "..."
+            replies = len(re.findall(r'\d+\. \\"', prompt))
+            text = json.dumps([analysis] * replies if "مصفوفة" in prompt else analysis, ensure_ascii=False)
+        usage = {"input_tokens": 120, "output_tokens": len(text.split())}
+        message = {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", "fake"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": usage,
+        }
+
+        if request.get("stream"):
+            self._stream(message, text)
+            return
+
+        body = json.dumps(message, ensure_ascii=False).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, message, text):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        def send(event, data):
+            self.wfile.write(f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode())
+            self.wfile.flush()
+
+        send("message_start", {"type": "message_start", "message": {
+            **message, "content": [], "stop_reason": None,
+            "usage": {"input_tokens": message["usage"]["input_tokens"], "output_tokens": 0},
+        }})
+        send("content_block_start", {"type": "content_block_start", "index": 0,
+                                     "content_block": {"type": "text", "text": ""}})
+        for word in text.split(" "):
+            send("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                         "delta": {"type": "text_delta", "text": word + " "}})
+            time.sleep(self.options.token_interval)
+        send("content_block_stop", {"type": "content_block_stop", "index": 0})
+        send("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                               "usage": {"output_tokens": message["usage"]["output_tokens"]}})
+        send("message_stop", {"type": "message_stop"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Anthropic Messages API")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before every response")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests that are slow")
+    parser.add_argument("--slow-latency", type=float, default=5.0, help="extra seconds for slow requests")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=529)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--token-interval", type=float, default=0.02, help="seconds between streamed tokens")
+    parser.add_argument("--reply", default=REPLY)
+    parser.add_argument("--verbose", action="store_true")
+    FakeAnthropicHandler.options = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", FakeAnthropicHandler.options.port), FakeAnthropicHandler)
+    print(f"Fake Anthropic API on http://127.0.0.1:{FakeAnthropicHandler.options.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Local fixture site for exercising the scraper without the network
+
+    python scripts/fixture_site.py --port 8090 --pages 5 --per-page 40 --latency 0.1
+
+Serves the three source types the scraper understands, with ETag and
+Last-Modified on every page and 304s for matching conditional requests:
+
+    /companies?page=N    HTML, scrape_config {"selector": ".company", "company_name": ".name",
+                         "industry": ".industry", "location": ".city", "link": "a",
+                         "pages": ["/companies?page=1", ...]}
+    /feed.xml            RSS 2.0 (source_type "rss")
+    /api/companies       JSON, scrape_config {"endpoint": "/api/companies", "items": "data.companies",
+                         "fields": {"company_name": "name", "industry": "sector"}}
+    /robots.txt          disallows /private
+
+--bump-every N changes one company per page every N seconds, so reruns see a mix
+of 304s and changed pages. Requests and response statuses are counted per path
+and printed on exit.
+"""
+
+from collections import Counter
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+import argparse
+import hashlib
+import html
+import json
+import random
+import threading
+import time
+
+INDUSTRIES = ("fintech", "ecommerce", "logistics", "healthtech", "edtech", "proptech")
+CITIES = ("الرياض", "جدة", "الدمام", "دبي", "القاهرة")
+
+ROBOTS = "User-agent: *\nDisallow: /private\n"
+
+
+class FixtureSite:
+    """Deterministic companies, split into pages, with a revision per page"""
+
+    def __init__(self, pages: int, per_page: int):
+        self.pages = pages
+        self.per_page = per_page
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._revisions = [0] * pages
+        self._changed_at = [self.started] * pages
+
+    def bump(self) -> None:
+        with self._lock:
+            for page in range(self.pages):
+                self._revisions[page] += 1
+                self._changed_at[page] = time.time()
+
+    def revision(self, page: int):
+        with self._lock:
+            return self._revisions[page], self._changed_at[page]
+
+    def companies(self, page: int):
+        revision, _ = self.revision(page)
+        rows = []
+        for i in range(self.per_page):
+            n = page * self.per_page + i
+            # One company per page is renamed on every bump
+            suffix = f" r{revision}" if i == 0 and revision else ""
+            rows.append({
+                "id": n,
+                "name": f"شركة تجريبية {n}{suffix}",
+                "sector": INDUSTRIES[n % len(INDUSTRIES)],
+                "city": CITIES[n % len(CITIES)],
+                "url": f"/companies/{n}",
+            })
+        return rows
+
+    def everything(self):
+        return [row for page in range(self.pages) for row in self.companies(page)]
+
+    def last_changed(self) -> float:
+        with self._lock:
+            return max(self._changed_at)
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    options: argparse.Namespace = None
+    site: FixtureSite = None
+    counts: Counter = Counter()
+
+    def log_message(self, format, *args):
+        if self.options.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        time.sleep(self.options.latency)
+
+        if parts.path == "/robots.txt":
+            return self._send(200, ROBOTS.encode(), "text/plain")
+        if random.random() < self.options.error_rate:
+            return self._send(503, b"unavailable", "text/plain")
+
+        if parts.path == "/companies":
+            page = int(parse_qs(parts.query).get("page", ["1"])[0]) - 1
+            if not 0 <= page < self.site.pages:
+                return self._send(404, b"no such page", "text/plain")
+            _, changed = self.site.revision(page)
+            return self._conditional(self._html(self.site.companies(page)), "text/html; charset=utf-8", changed)
+        if parts.path == "/feed.xml":
+            return self._conditional(self._rss(self.site.everything()), "application/rss+xml", self.site.last_changed())
+        if parts.path == "/api/companies":
+            body = json.dumps({"data": {"companies": self.site.everything()}}, ensure_ascii=False).encode()
+            return self._conditional(body, "application/json", self.site.last_changed())
+        return self._send(404, b"not found", "text/plain")
+
+    def _conditional(self, body: bytes, content_type: str, changed: float):
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        last_modified = formatdate(changed, usegmt=True)
+        headers = {"ETag": etag, "Last-Modified": last_modified}
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, b"", content_type, headers)
+        return self._send(200, body, content_type, headers)
+
+    def _send(self, status: int, body: bytes, content_type: str, headers=None):
+        self.counts[(urlsplit(self.path).path, status)] += 1
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+
+    @staticmethod
+    def _html(rows) -> bytes:
+        items = "\n".join(
+            f'<li class="company"><a href="{r["url"]}"><span class="name">{html.escape(r["name"])}</span></a>'
+            f' <span class="industry">{r["sector"]}</span> <span class="city">{r["city"]}</span></li>'
+            for r in rows
+        )
+        return f'<!doctype html><html lang="ar"><body><ul>\n{items}\n</ul></body></html>'.encode()
+
+    @staticmethod
+    def _rss(rows) -> bytes:
+        items = "".join(
+            f"<item><title>{escape(r['name'])}</title><link>http://fixture{r['url']}</link>"
+            f"<description>{r['sector']}</description></item>"
+            for r in rows
+        )
+        return f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>{items}</channel></rss>'.encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fixture site for the scraper")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--per-page", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of pages answered with 503")
+    parser.add_argument("--bump-every", type=float, default=0.0, help="seconds between content changes (0 = never)")
+    parser.add_argument("--verbose", action="store_true")
+    options = parser.parse_args()
+
+    FixtureHandler.options = options
+    FixtureHandler.site = site = FixtureSite(options.pages, options.per_page)
+
+    if options.bump_every > 0:
+        def bump():
+            while True:
+                time.sleep(options.bump_every)
+                site.bump()
+        threading.Thread(target=bump, daemon=True).start()
+
+    server = ThreadingHTTPServer(("127.0.0.1", options.port), FixtureHandler)
+    print(f"Fixture site on http://127.0.0.1:{options.port} ({options.pages} pages x {options.per_page} companies)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    for (path, status), count in sorted(FixtureHandler.counts.items()):
+        print(f"{path:<20}{status:<6}{count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+-- 001: Incremental scraping
+-- Conditional-request validators per data source, and the upsert key for scraped leads.
+
+ALTER TABLE data_sources ADD COLUMN IF NOT EXISTS scrape_state JSONB DEFAULT '{}';
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_leads_source_url
+    ON leads(org_id, source_url) WHERE source_url IS NOT NULL;
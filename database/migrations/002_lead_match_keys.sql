@@ -0,0 +1,14 @@
+-- 002: Lead deduplication blocking index
+-- Backfill existing leads afterwards with the leads.reindex_match_keys task.
+
+CREATE TABLE IF NOT EXISTS lead_match_keys (
+    org_id UUID NOT NULL,
+    key_type VARCHAR(20) NOT NULL,
+    key_value VARCHAR(255) NOT NULL,
+    lead_id UUID NOT NULL REFERENCES leads(id) ON DELETE CASCADE,
+    PRIMARY KEY (org_id, key_type, key_value, lead_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_lead_match_keys_lead ON lead_match_keys(lead_id);
+
+ALTER TABLE lead_match_keys ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,110 @@
+-- 003: Monthly partitioned activity_log with per-tier retention
+-- Rebuilds activity_log as a partitioned table and copies existing rows across.
+-- The legacy table is kept as activity_log_legacy; drop it once verified.
+
+BEGIN;
+
+ALTER TABLE subscription_limits ADD COLUMN IF NOT EXISTS activity_retention_months INTEGER;
+UPDATE subscription_limits SET activity_retention_months = CASE tier
+    WHEN 'free' THEN 3
+    WHEN 'starter' THEN 6
+    WHEN 'pro' THEN 12
+    WHEN 'enterprise' THEN 24
+END
+WHERE activity_retention_months IS NULL;
+
+ALTER TABLE activity_log RENAME TO activity_log_legacy;
+ALTER INDEX IF EXISTS idx_activity_org RENAME TO idx_activity_legacy_org;
+ALTER INDEX IF EXISTS idx_activity_created RENAME TO idx_activity_legacy_created;
+
+CREATE TABLE activity_log (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    org_id UUID REFERENCES organizations(id) ON DELETE CASCADE,
+    user_id UUID REFERENCES users(id) ON DELETE SET NULL,
+    action VARCHAR(100) NOT NULL,
+    entity_type VARCHAR(50),
+    entity_id UUID,
+    details JSONB,
+    ip_address INET,
+    user_agent TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE INDEX idx_activity_created ON activity_log(org_id, created_at DESC, id DESC);
+CREATE INDEX idx_activity_action ON activity_log(org_id, action, created_at DESC);
+CREATE INDEX idx_activity_entity ON activity_log(org_id, entity_type, created_at DESC);
+
+CREATE TABLE activity_log_default PARTITION OF activity_log DEFAULT;
+
+CREATE OR REPLACE FUNCTION ensure_activity_log_partitions(
+    p_from DATE DEFAULT CURRENT_DATE,
+    p_months_ahead INTEGER DEFAULT 3
+) RETURNS INTEGER AS $$
+DECLARE
+    v_month DATE := DATE_TRUNC('month', p_from);
+    v_last DATE := DATE_TRUNC('month', CURRENT_DATE) + MAKE_INTERVAL(months => p_months_ahead);
+    v_name TEXT;
+    v_created INTEGER := 0;
+BEGIN
+    WHILE v_month <= v_last LOOP
+        v_name := 'activity_log_' || TO_CHAR(v_month, 'YYYY_MM');
+        IF TO_REGCLASS(v_name) IS NULL THEN
+            EXECUTE FORMAT(
+                'CREATE TABLE %I PARTITION OF activity_log FOR VALUES FROM (%L) TO (%L)',
+                v_name, v_month, (v_month + INTERVAL '1 month')::DATE
+            );
+            v_created := v_created + 1;
+        END IF;
+        v_month := v_month + INTERVAL '1 month';
+    END LOOP;
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION drop_activity_log_partitions(
+    p_keep_months INTEGER,
+    p_detach_only BOOLEAN DEFAULT FALSE
+) RETURNS SETOF TEXT AS $$
+DECLARE
+    v_cutoff DATE := DATE_TRUNC('month', CURRENT_DATE) - MAKE_INTERVAL(months => p_keep_months);
+    v_name TEXT;
+BEGIN
+    FOR v_name IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'activity_log'::REGCLASS
+          AND c.relname ~ '^activity_log_[0-9]{4}_[0-9]{2}$'
+          AND TO_DATE(SUBSTRING(c.relname FROM 14), 'YYYY_MM') < v_cutoff
+        ORDER BY c.relname
+    LOOP
+        EXECUTE FORMAT('ALTER TABLE activity_log DETACH PARTITION %I', v_name);
+        IF NOT p_detach_only THEN
+            EXECUTE FORMAT('DROP TABLE %I', v_name);
+        END IF;
+        RETURN NEXT v_name;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- One partition per month from the oldest retained row through three months ahead
+SELECT ensure_activity_log_partitions(
+    GREATEST(
+        COALESCE((SELECT MIN(created_at)::DATE FROM activity_log_legacy), CURRENT_DATE),
+        (DATE_TRUNC('month', CURRENT_DATE) - INTERVAL '24 months')::DATE
+    ),
+    3
+);
+
+INSERT INTO activity_log (id, org_id, user_id, action, entity_type, entity_id, details, ip_address, user_agent, created_at)
+SELECT id, org_id, user_id, action, entity_type, entity_id, details, ip_address, user_agent, COALESCE(created_at, NOW())
+FROM activity_log_legacy
+WHERE created_at IS NULL OR created_at >= DATE_TRUNC('month', CURRENT_DATE) - INTERVAL '24 months';
+
+ALTER TABLE activity_log ENABLE ROW LEVEL SECURITY;
+
+COMMIT;
+
+-- After verifying counts:
+-- DROP TABLE activity_log_legacy;
@@ -0,0 +1,23 @@
+-- 004: Inbound reply ingestion
+-- Build the external_id index without blocking sends: run this statement on its own.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_external ON messages(external_id) WHERE external_id IS NOT NULL;
+
+CREATE TABLE IF NOT EXISTS message_replies (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    org_id UUID REFERENCES organizations(id) ON DELETE CASCADE,
+    message_id UUID REFERENCES messages(id) ON DELETE CASCADE,
+    external_id VARCHAR(255) NOT NULL,
+    from_address VARCHAR(255),
+    body TEXT NOT NULL,
+    received_at TIMESTAMP NOT NULL,
+    analysis JSONB,
+    analyzed_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_message_replies_external ON message_replies(external_id);
+CREATE INDEX IF NOT EXISTS idx_message_replies_message ON message_replies(message_id);
+CREATE INDEX IF NOT EXISTS idx_message_replies_pending ON message_replies(org_id, created_at) WHERE analyzed_at IS NULL;
+
+ALTER TABLE message_replies ENABLE ROW LEVEL SECURITY;
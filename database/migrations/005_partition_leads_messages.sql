@@ -0,0 +1,313 @@
+-- 005: Hash-partition leads and messages on org_id, online
+-- Run with psql, NOT in a single transaction (no -1): the backfill commits per
+-- batch so the tables stay writable while rows are copied.
+--
+--   1. Create leads_part / messages_part and mirror every write on the old
+--      tables into them with triggers.
+--   2. Copy existing rows in id-ordered batches (resumable: rerun the CALLs).
+--   3. Build the indexes on the new tables, a partition at a time, CONCURRENTLY.
+--   4. Swap the tables in one short transaction and repoint foreign keys.
+--   5. Validate the foreign keys without blocking writes.
+-- The old tables are kept as leads_legacy / messages_legacy; drop them once verified.
+-- Rows with a NULL org_id cannot be placed in a partition and stay in the legacy
+-- tables, as do messages whose lead is not in the same org.
+
+-- ---------------------------------------------
+-- 1. Prepare
+-- ---------------------------------------------
+BEGIN;
+
+CREATE OR REPLACE FUNCTION create_hash_partitions(
+    p_parent TEXT,
+    p_modulus INTEGER DEFAULT 16
+) RETURNS INTEGER AS $$
+DECLARE
+    v_name TEXT;
+    v_created INTEGER := 0;
+BEGIN
+    FOR i IN 0..p_modulus - 1 LOOP
+        v_name := p_parent || '_p' || LPAD(i::TEXT, 2, '0');
+        IF TO_REGCLASS(v_name) IS NULL THEN
+            EXECUTE FORMAT(
+                'CREATE TABLE %I PARTITION OF %I FOR VALUES WITH (MODULUS %s, REMAINDER %s)',
+                v_name, p_parent, p_modulus, i
+            );
+            v_created := v_created + 1;
+        END IF;
+    END LOOP;
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Same columns in the same order, so old rows copy across as ROW(*)
+CREATE TABLE leads_part (
+    LIKE leads INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+    PRIMARY KEY (org_id, id)
+) PARTITION BY HASH (org_id);
+SELECT create_hash_partitions('leads_part', 16);
+
+CREATE TABLE messages_part (
+    LIKE messages INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+    PRIMARY KEY (org_id, id)
+) PARTITION BY HASH (org_id);
+SELECT create_hash_partitions('messages_part', 16);
+
+-- Checked row by row while copying; a partitioned table cannot take a NOT VALID key later
+ALTER TABLE leads_part ADD CONSTRAINT leads_org_id_fkey
+    FOREIGN KEY (org_id) REFERENCES organizations(id) ON DELETE CASCADE;
+ALTER TABLE leads_part ADD CONSTRAINT leads_source_id_fkey
+    FOREIGN KEY (source_id) REFERENCES data_sources(id);
+ALTER TABLE messages_part ADD CONSTRAINT messages_org_id_fkey
+    FOREIGN KEY (org_id) REFERENCES organizations(id) ON DELETE CASCADE;
+ALTER TABLE messages_part ADD CONSTRAINT messages_campaign_id_fkey
+    FOREIGN KEY (campaign_id) REFERENCES campaigns(id) ON DELETE SET NULL;
+ALTER TABLE messages_part ADD CONSTRAINT messages_org_id_lead_id_fkey
+    FOREIGN KEY (org_id, lead_id) REFERENCES leads_part(org_id, id) ON DELETE CASCADE;
+
+-- Deletes that race the backfill are replayed from here at cutover
+CREATE TABLE partition_sync_tombstones (
+    table_name TEXT NOT NULL,
+    org_id UUID NOT NULL,
+    id UUID NOT NULL
+);
+
+CREATE TABLE partition_backfill_progress (
+    table_name TEXT PRIMARY KEY,
+    last_id UUID NOT NULL DEFAULT '00000000-0000-0000-0000-000000000000',
+    copied BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- Rows of this table that can live in the partitioned copy
+CREATE OR REPLACE FUNCTION partitionable(p_table TEXT, p_org_id UUID, p_lead_id UUID) RETURNS BOOLEAN AS $$
+    SELECT p_org_id IS NOT NULL AND (
+        p_table <> 'messages' OR p_lead_id IS NULL
+        OR EXISTS (SELECT 1 FROM leads_part l WHERE l.org_id = p_org_id AND l.id = p_lead_id)
+    )
+$$ LANGUAGE sql STABLE;
+
+-- Mirror trigger per table: upserts replace the whole row, deletes leave a tombstone
+DO $$
+DECLARE
+    v_table TEXT;
+    v_set TEXT;
+    v_lead TEXT;
+BEGIN
+    FOREACH v_table IN ARRAY ARRAY['leads', 'messages'] LOOP
+        SELECT STRING_AGG(FORMAT('%I = EXCLUDED.%I', attname, attname), ', ' ORDER BY attnum)
+        INTO v_set
+        FROM pg_attribute
+        WHERE attrelid = v_table::REGCLASS AND attnum > 0 AND NOT attisdropped AND attname NOT IN ('org_id', 'id');
+        v_lead := CASE v_table WHEN 'messages' THEN 'NEW.lead_id' ELSE 'NULL' END;
+
+        EXECUTE FORMAT($f$
+            CREATE OR REPLACE FUNCTION sync_%1$s_part() RETURNS TRIGGER AS $body$
+            BEGIN
+                -- Only on a key change: a delete would cascade to the copied messages
+                IF OLD.org_id IS NOT NULL AND (TG_OP = 'DELETE' OR (OLD.org_id, OLD.id) IS DISTINCT FROM (NEW.org_id, NEW.id)) THEN
+                    DELETE FROM %1$s_part WHERE org_id = OLD.org_id AND id = OLD.id;
+                    IF TG_OP = 'DELETE' THEN
+                        INSERT INTO partition_sync_tombstones VALUES (%1$L, OLD.org_id, OLD.id);
+                    END IF;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') AND partitionable(%1$L, NEW.org_id, %3$s) THEN
+                    INSERT INTO %1$s_part SELECT NEW.*
+                    ON CONFLICT (org_id, id) DO UPDATE SET %2$s;
+                END IF;
+                RETURN NULL;
+            END;
+            $body$ LANGUAGE plpgsql
+        $f$, v_table, v_set, v_lead);
+
+        EXECUTE FORMAT(
+            'CREATE TRIGGER sync_%1$s_part AFTER INSERT OR UPDATE OR DELETE ON %1$I '
+            'FOR EACH ROW EXECUTE FUNCTION sync_%1$s_part()',
+            v_table
+        );
+        INSERT INTO partition_backfill_progress (table_name) VALUES (v_table) ON CONFLICT DO NOTHING;
+    END LOOP;
+END;
+$$;
+
+-- Copies rows in id order, committing every batch; picks up where it stopped
+CREATE OR REPLACE PROCEDURE backfill_partitioned(
+    p_table TEXT,
+    p_batch INTEGER DEFAULT 5000,
+    p_pause_seconds DOUBLE PRECISION DEFAULT 0
+) LANGUAGE plpgsql AS $$
+DECLARE
+    v_last UUID;
+    v_next UUID;
+    v_rows BIGINT;
+BEGIN
+    SELECT last_id INTO v_last FROM partition_backfill_progress WHERE table_name = p_table;
+    LOOP
+        EXECUTE FORMAT('SELECT id FROM (SELECT id FROM %I WHERE id > $1 ORDER BY id LIMIT $2) b ORDER BY id DESC LIMIT 1', p_table)
+        INTO v_next USING v_last, p_batch;
+        EXIT WHEN v_next IS NULL;
+
+        -- Rows the triggers already mirrored are newer than this snapshot: keep them
+        EXECUTE FORMAT(
+            'INSERT INTO %1$I SELECT * FROM %2$I t WHERE id > $1 AND id <= $2 '
+            'AND partitionable(%2$L, t.org_id, %3$s) ON CONFLICT (org_id, id) DO NOTHING',
+            p_table || '_part', p_table, CASE p_table WHEN 'messages' THEN 't.lead_id' ELSE 'NULL' END
+        ) USING v_last, v_next;
+        GET DIAGNOSTICS v_rows = ROW_COUNT;
+
+        UPDATE partition_backfill_progress
+        SET last_id = v_next, copied = copied + v_rows, updated_at = NOW()
+        WHERE table_name = p_table;
+        v_last := v_next;
+        COMMIT;
+
+        IF p_pause_seconds > 0 THEN
+            PERFORM pg_sleep(p_pause_seconds);
+        END IF;
+    END LOOP;
+END;
+$$;
+
+COMMIT;
+
+-- ---------------------------------------------
+-- 2. Backfill (messages after leads, whose rows their foreign key needs)
+-- ---------------------------------------------
+CALL backfill_partitioned('leads', 5000);
+CALL backfill_partitioned('messages', 5000);
+
+-- ---------------------------------------------
+-- 3. Indexes on the new tables
+-- ---------------------------------------------
+-- The mirror triggers write to leads_part / messages_part on every write to
+-- leads and messages, and a plain CREATE INDEX on a partitioned table holds
+-- SHARE on each partition until it finishes, stalling those writes. Built as
+-- in 006 instead: the parent index ON ONLY (invalid until every partition is
+-- attached), each partition's CONCURRENTLY, then attached. Safe to rerun; drop
+-- any INVALID partition index a failed concurrent build leaves behind first.
+CREATE TEMP TABLE partition_indexes (parent_table TEXT, index_name TEXT, suffix TEXT, kind TEXT, definition TEXT);
+INSERT INTO partition_indexes VALUES
+    ('leads_part', 'idx_leads_part_id', 'id', 'INDEX', '(id)'),
+    ('leads_part', 'idx_leads_part_status', 'status', 'INDEX', '(org_id, status)'),
+    ('leads_part', 'idx_leads_part_score', 'score', 'INDEX', '(org_id, score DESC)'),
+    ('leads_part', 'idx_leads_part_industry', 'industry', 'INDEX', '(org_id, industry)'),
+    ('leads_part', 'idx_leads_part_source_url', 'source_url', 'UNIQUE INDEX',
+     '(org_id, source_url) WHERE source_url IS NOT NULL'),
+    ('messages_part', 'idx_messages_part_id', 'id', 'INDEX', '(id)'),
+    ('messages_part', 'idx_messages_part_lead', 'lead', 'INDEX', '(org_id, lead_id)'),
+    ('messages_part', 'idx_messages_part_campaign', 'campaign', 'INDEX', '(campaign_id)'),
+    ('messages_part', 'idx_messages_part_status', 'status', 'INDEX', '(org_id, status)'),
+    ('messages_part', 'idx_messages_part_external', 'external', 'INDEX',
+     '(external_id) WHERE external_id IS NOT NULL');
+
+SELECT FORMAT('CREATE %s IF NOT EXISTS %I ON ONLY %I %s', kind, index_name, parent_table, definition)
+FROM partition_indexes
+\gexec
+
+SELECT FORMAT('CREATE %s CONCURRENTLY IF NOT EXISTS %I ON %I %s', r.kind, p.relname || '_' || r.suffix, p.relname, r.definition)
+FROM partition_indexes r
+JOIN pg_inherits i ON i.inhparent = r.parent_table::REGCLASS
+JOIN pg_class p ON p.oid = i.inhrelid
+ORDER BY p.relname, r.suffix
+\gexec
+
+SELECT FORMAT('ALTER INDEX %I ATTACH PARTITION %I', r.index_name, p.relname || '_' || r.suffix)
+FROM partition_indexes r
+JOIN pg_inherits i ON i.inhparent = r.parent_table::REGCLASS
+JOIN pg_class p ON p.oid = i.inhrelid
+LEFT JOIN pg_inherits attached
+    ON attached.inhrelid = TO_REGCLASS(p.relname || '_' || r.suffix) AND attached.inhparent = TO_REGCLASS(r.index_name)
+WHERE attached.inhrelid IS NULL
+ORDER BY p.relname, r.suffix
+\gexec
+
+ANALYZE leads_part;
+ANALYZE messages_part;
+
+-- ---------------------------------------------
+-- 4. Cutover (catalog changes only, under a brief exclusive lock)
+-- ---------------------------------------------
+BEGIN;
+
+LOCK TABLE leads, messages, lead_match_keys, message_replies IN ACCESS EXCLUSIVE MODE;
+
+-- Everything written since the backfill began is mirrored; only racing deletes remain
+DELETE FROM leads_part p USING partition_sync_tombstones t
+WHERE t.table_name = 'leads' AND p.org_id = t.org_id AND p.id = t.id;
+DELETE FROM messages_part p USING partition_sync_tombstones t
+WHERE t.table_name = 'messages' AND p.org_id = t.org_id AND p.id = t.id;
+
+DROP TRIGGER sync_leads_part ON leads;
+DROP TRIGGER sync_messages_part ON messages;
+
+ALTER TABLE lead_match_keys DROP CONSTRAINT IF EXISTS lead_match_keys_lead_id_fkey;
+ALTER TABLE message_replies DROP CONSTRAINT IF EXISTS message_replies_message_id_fkey;
+
+ALTER TABLE leads RENAME TO leads_legacy;
+ALTER TABLE messages RENAME TO messages_legacy;
+ALTER TABLE leads_part RENAME TO leads;
+ALTER TABLE messages_part RENAME TO messages;
+
+-- Index and partition names follow the tables
+DO $$
+DECLARE
+    v_index RECORD;
+BEGIN
+    FOR v_index IN
+        SELECT c.relname FROM pg_class c
+        JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE i.indrelid IN ('leads_legacy'::REGCLASS, 'messages_legacy'::REGCLASS)
+          AND (c.relname LIKE 'idx\_%' OR c.relname LIKE '%\_pkey')
+    LOOP
+        EXECUTE FORMAT('ALTER INDEX %I RENAME TO %I', v_index.relname, v_index.relname || '_legacy');
+    END LOOP;
+    FOR v_index IN
+        SELECT c.relname FROM pg_class c
+        JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE i.indrelid IN ('leads'::REGCLASS, 'messages'::REGCLASS) AND c.relname LIKE '%\_part\_%'
+    LOOP
+        EXECUTE FORMAT('ALTER INDEX %I RENAME TO %I', v_index.relname, REPLACE(v_index.relname, '_part_', '_'));
+    END LOOP;
+    FOR i IN 0..15 LOOP
+        EXECUTE FORMAT('ALTER TABLE %I RENAME TO %I', 'leads_part_p' || LPAD(i::TEXT, 2, '0'), 'leads_p' || LPAD(i::TEXT, 2, '0'));
+        EXECUTE FORMAT('ALTER TABLE %I RENAME TO %I', 'messages_part_p' || LPAD(i::TEXT, 2, '0'), 'messages_p' || LPAD(i::TEXT, 2, '0'));
+    END LOOP;
+END;
+$$;
+
+-- Composite keys reach the right partition; validated in step 5
+ALTER TABLE message_replies ALTER COLUMN org_id SET NOT NULL;
+ALTER TABLE lead_match_keys ADD CONSTRAINT lead_match_keys_org_id_lead_id_fkey
+    FOREIGN KEY (org_id, lead_id) REFERENCES leads(org_id, id) ON DELETE CASCADE NOT VALID;
+ALTER TABLE message_replies ADD CONSTRAINT message_replies_org_id_message_id_fkey
+    FOREIGN KEY (org_id, message_id) REFERENCES messages(org_id, id) ON DELETE CASCADE NOT VALID;
+
+CREATE TRIGGER update_leads_updated_at BEFORE UPDATE ON leads FOR EACH ROW EXECUTE FUNCTION update_updated_at();
+CREATE TRIGGER update_messages_updated_at BEFORE UPDATE ON messages FOR EACH ROW EXECUTE FUNCTION update_updated_at();
+
+ALTER TABLE leads ENABLE ROW LEVEL SECURITY;
+ALTER TABLE messages ENABLE ROW LEVEL SECURITY;
+
+COMMIT;
+
+-- ---------------------------------------------
+-- 5. Validate (SHARE UPDATE EXCLUSIVE: reads and writes continue)
+-- ---------------------------------------------
+-- Match keys are derived data: drop those of leads left behind (reindex rebuilds them)
+DELETE FROM lead_match_keys k
+WHERE NOT EXISTS (SELECT 1 FROM leads l WHERE l.org_id = k.org_id AND l.id = k.lead_id);
+
+ALTER TABLE lead_match_keys VALIDATE CONSTRAINT lead_match_keys_org_id_lead_id_fkey;
+ALTER TABLE message_replies VALIDATE CONSTRAINT message_replies_org_id_message_id_fkey;
+
+DROP PROCEDURE backfill_partitioned(TEXT, INTEGER, DOUBLE PRECISION);
+DROP FUNCTION sync_leads_part();
+DROP FUNCTION sync_messages_part();
+DROP FUNCTION partitionable(TEXT, UUID, UUID);
+DROP TABLE partition_sync_tombstones;
+DROP TABLE partition_backfill_progress;
+
+-- After verifying counts (rows with a NULL org_id remain only in the legacy tables):
+-- SELECT (SELECT COUNT(*) FROM leads_legacy WHERE org_id IS NOT NULL), (SELECT COUNT(*) FROM leads);
+-- SELECT (SELECT COUNT(*) FROM messages_legacy WHERE org_id IS NOT NULL), (SELECT COUNT(*) FROM messages);
+-- DROP TABLE messages_legacy;
+-- DROP TABLE leads_legacy;
@@ -0,0 +1,90 @@
+-- 006: Indexes matched to the lead, campaign and message queries
+-- Run with psql, NOT in a single transaction (no -1): partition indexes are built
+-- CONCURRENTLY, which cannot run inside one. Safe to rerun; if a concurrent build
+-- fails it leaves an INVALID index behind: drop that index before rerunning.
+--
+--   leads     (org_id, created_at DESC, id DESC) INCLUDE (status, score, industry)  new, list pages
+--   leads     idx_leads_status  -> (org_id, status, created_at DESC, id DESC)       status tabs
+--   leads     idx_leads_score   -> (org_id, score DESC, id)                         campaign targeting
+--   messages  idx_messages_campaign -> (campaign_id, lead_id) INCLUDE (created_at) campaign budget
+--   campaigns idx_campaigns_org -> (org_id, created_at DESC)                       campaign list
+--   campaigns idx_campaigns_active (org_id, id) WHERE status = 'active'            replaces idx_campaigns_status
+--
+-- messages.external_id is already indexed by 004 (idx_messages_external).
+
+-- ---------------------------------------------
+-- 1. Partitioned indexes: parent first (invalid until every partition is attached)
+-- ---------------------------------------------
+CREATE TEMP TABLE index_rollout (parent_table TEXT, build_as TEXT, final_name TEXT, suffix TEXT, definition TEXT);
+INSERT INTO index_rollout VALUES
+    ('leads', 'idx_leads_created', 'idx_leads_created', 'created',
+     '(org_id, created_at DESC, id DESC) INCLUDE (status, score, industry)'),
+    ('leads', 'idx_leads_status_v2', 'idx_leads_status', 'status_created',
+     '(org_id, status, created_at DESC, id DESC)'),
+    ('leads', 'idx_leads_score_v2', 'idx_leads_score', 'score_id',
+     '(org_id, score DESC, id)'),
+    ('messages', 'idx_messages_campaign_v2', 'idx_messages_campaign', 'campaign_lead',
+     '(campaign_id, lead_id) INCLUDE (created_at)');
+
+-- Already in place from an earlier run: valid, under its final name, with the new columns
+DELETE FROM index_rollout r
+USING pg_index x
+WHERE x.indexrelid = TO_REGCLASS(r.final_name) AND x.indisvalid
+  AND POSITION(r.definition IN pg_get_indexdef(x.indexrelid)) > 0;
+
+SELECT FORMAT('CREATE INDEX IF NOT EXISTS %I ON ONLY %I %s', build_as, parent_table, definition)
+FROM index_rollout
+\gexec
+
+-- Each partition is built without blocking writes, then attached to its parent
+SELECT FORMAT('CREATE INDEX CONCURRENTLY IF NOT EXISTS %I ON %I %s', p.relname || '_' || r.suffix, p.relname, r.definition)
+FROM index_rollout r
+JOIN pg_inherits i ON i.inhparent = r.parent_table::REGCLASS
+JOIN pg_class p ON p.oid = i.inhrelid
+WHERE TO_REGCLASS(r.build_as) IS NOT NULL
+ORDER BY p.relname, r.suffix
+\gexec
+
+SELECT FORMAT('ALTER INDEX %I ATTACH PARTITION %I', r.build_as, p.relname || '_' || r.suffix)
+FROM index_rollout r
+JOIN pg_inherits i ON i.inhparent = r.parent_table::REGCLASS
+JOIN pg_class p ON p.oid = i.inhrelid
+LEFT JOIN pg_inherits attached
+    ON attached.inhrelid = TO_REGCLASS(p.relname || '_' || r.suffix) AND attached.inhparent = TO_REGCLASS(r.build_as)
+WHERE TO_REGCLASS(r.build_as) IS NOT NULL AND attached.inhrelid IS NULL
+ORDER BY p.relname, r.suffix
+\gexec
+
+-- ---------------------------------------------
+-- 2. Swap names (catalog only; gives up rather than queue behind long queries)
+-- ---------------------------------------------
+BEGIN;
+SET LOCAL lock_timeout = '5s';
+
+DO $$
+DECLARE
+    v_index RECORD;
+BEGIN
+    FOR v_index IN SELECT build_as, final_name FROM index_rollout WHERE build_as <> final_name LOOP
+        IF TO_REGCLASS(v_index.build_as) IS NOT NULL THEN
+            EXECUTE FORMAT('DROP INDEX IF EXISTS %I', v_index.final_name);
+            EXECUTE FORMAT('ALTER INDEX %I RENAME TO %I', v_index.build_as, v_index.final_name);
+        END IF;
+    END LOOP;
+END;
+$$;
+
+COMMIT;
+
+-- ---------------------------------------------
+-- 3. Campaigns (a plain table: build and drop concurrently)
+-- ---------------------------------------------
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_campaigns_active ON campaigns(org_id, id) WHERE status = 'active';
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_campaigns_org_v2 ON campaigns(org_id, created_at DESC);
+DROP INDEX CONCURRENTLY IF EXISTS idx_campaigns_status;
+
+SELECT 'DROP INDEX CONCURRENTLY IF EXISTS idx_campaigns_org' WHERE TO_REGCLASS('idx_campaigns_org_v2') IS NOT NULL
+\gexec
+ALTER INDEX IF EXISTS idx_campaigns_org_v2 RENAME TO idx_campaigns_org;
+
+DROP TABLE index_rollout;
@@ -0,0 +1,32 @@
+-- 007: Index one entity's activity history (lead timeline)
+-- Run with psql, NOT in a single transaction (no -1): monthly partitions are
+-- indexed CONCURRENTLY, which cannot run inside one. Safe to rerun; if a
+-- concurrent build fails it leaves an INVALID index behind: drop that index
+-- before rerunning.
+--
+--   activity_log  idx_activity_entity_id (org_id, entity_id, created_at DESC, id DESC)
+--
+-- Partitions created later by ensure_activity_log_partitions inherit it.
+
+-- Parent first: invalid until every partition's index is attached
+CREATE INDEX IF NOT EXISTS idx_activity_entity_id ON ONLY activity_log (org_id, entity_id, created_at DESC, id DESC);
+
+SELECT FORMAT(
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS %I ON %I (org_id, entity_id, created_at DESC, id DESC)',
+    p.relname || '_entity_id', p.relname
+)
+FROM pg_inherits i
+JOIN pg_class p ON p.oid = i.inhrelid
+WHERE i.inhparent = 'activity_log'::REGCLASS
+ORDER BY p.relname
+\gexec
+
+SELECT FORMAT('ALTER INDEX idx_activity_entity_id ATTACH PARTITION %I', p.relname || '_entity_id')
+FROM pg_inherits i
+JOIN pg_class p ON p.oid = i.inhrelid
+LEFT JOIN pg_inherits attached
+    ON attached.inhrelid = TO_REGCLASS(p.relname || '_entity_id')
+   AND attached.inhparent = 'idx_activity_entity_id'::REGCLASS
+WHERE i.inhparent = 'activity_log'::REGCLASS AND attached.inhrelid IS NULL
+ORDER BY p.relname
+\gexec
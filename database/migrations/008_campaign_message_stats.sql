@@ -0,0 +1,22 @@
+-- 008: Campaign funnel counters (messages per campaign, channel and status)
+-- Run before deploying the code that writes them. Messages that change status
+-- between the backfill and the deploy leave the counters off until the next
+-- campaigns.reconcile_stats run corrects them.
+
+CREATE TABLE IF NOT EXISTS campaign_message_stats (
+    campaign_id UUID NOT NULL REFERENCES campaigns(id) ON DELETE CASCADE,
+    org_id UUID NOT NULL REFERENCES organizations(id) ON DELETE CASCADE,
+    channel VARCHAR(50) NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    messages INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT NOW(),
+
+    PRIMARY KEY (campaign_id, channel, status)
+);
+
+INSERT INTO campaign_message_stats (campaign_id, org_id, channel, status, messages)
+SELECT m.campaign_id, c.org_id, m.channel, COALESCE(m.status, 'draft'), COUNT(*)
+FROM messages m
+JOIN campaigns c ON c.id = m.campaign_id
+GROUP BY m.campaign_id, c.org_id, m.channel, COALESCE(m.status, 'draft')
+ON CONFLICT (campaign_id, channel, status) DO UPDATE SET messages = EXCLUDED.messages, updated_at = NOW();
@@ -0,0 +1,58 @@
+-- 009: One message per campaign, lead and channel
+-- Run with psql, NOT in a single transaction (no -1): partition indexes are built
+-- CONCURRENTLY, which cannot run inside one. Safe to rerun; if a concurrent build
+-- fails it leaves an INVALID index behind: drop that index before rerunning.
+--
+-- Campaign runs insert with ON CONFLICT DO NOTHING against this index, so two
+-- runs of the same campaign can never message a lead twice. A unique index on a
+-- partitioned table must include the partition key; campaign_id implies org_id,
+-- so the leading org_id narrows nothing.
+
+-- ---------------------------------------------
+-- 1. Drop duplicates left by concurrent runs that were never sent
+-- ---------------------------------------------
+-- Each (campaign, lead, channel) keeps its oldest sent row, else its oldest; the next
+-- campaigns.reconcile_stats run takes the rest out of the funnel counters.
+-- Duplicates that were already sent are left alone and make step 2 fail; find them with
+--   SELECT org_id, campaign_id, lead_id, channel, COUNT(*) FROM messages
+--   WHERE campaign_id IS NOT NULL AND lead_id IS NOT NULL
+--   GROUP BY 1, 2, 3, 4 HAVING COUNT(*) > 1;
+WITH ranked AS (
+    SELECT org_id, id, COALESCE(status, 'draft') IN ('draft', 'scheduled') AS unsent,
+           ROW_NUMBER() OVER (
+               PARTITION BY org_id, campaign_id, lead_id, channel
+               ORDER BY COALESCE(status, 'draft') IN ('draft', 'scheduled'), created_at, id
+           ) AS n
+    FROM messages
+    WHERE campaign_id IS NOT NULL AND lead_id IS NOT NULL
+)
+DELETE FROM messages m
+USING ranked r
+WHERE m.org_id = r.org_id AND m.id = r.id AND r.n > 1 AND r.unsent;
+
+-- ---------------------------------------------
+-- 2. Unique index: parent first (invalid until every partition is attached)
+-- ---------------------------------------------
+CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_campaign_lead_channel
+    ON ONLY messages(org_id, campaign_id, lead_id, channel);
+
+-- Each partition is built without blocking writes, then attached to its parent
+SELECT FORMAT(
+    'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS %I ON %I (org_id, campaign_id, lead_id, channel)',
+    p.relname || '_campaign_lead_channel', p.relname
+)
+FROM pg_inherits i
+JOIN pg_class p ON p.oid = i.inhrelid
+WHERE i.inhparent = 'messages'::REGCLASS
+ORDER BY p.relname
+\gexec
+
+SELECT FORMAT('ALTER INDEX idx_messages_campaign_lead_channel ATTACH PARTITION %I', p.relname || '_campaign_lead_channel')
+FROM pg_inherits i
+JOIN pg_class p ON p.oid = i.inhrelid
+LEFT JOIN pg_inherits attached
+    ON attached.inhrelid = TO_REGCLASS(p.relname || '_campaign_lead_channel')
+   AND attached.inhparent = 'idx_messages_campaign_lead_channel'::REGCLASS
+WHERE i.inhparent = 'messages'::REGCLASS AND attached.inhrelid IS NULL
+ORDER BY p.relname
+\gexec
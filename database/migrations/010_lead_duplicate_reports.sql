@@ -0,0 +1,11 @@
+-- 010: Stored duplicate-lead reports
+-- GET /api/leads/duplicates reads the org's last report instead of clustering
+-- the whole org on every request; the leads.find_duplicates task rebuilds it.
+
+CREATE TABLE IF NOT EXISTS lead_duplicate_reports (
+    org_id UUID PRIMARY KEY REFERENCES organizations(id) ON DELETE CASCADE,
+    clusters JSONB NOT NULL DEFAULT '[]',
+    built_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+ALTER TABLE lead_duplicate_reports ENABLE ROW LEVEL SECURITY;
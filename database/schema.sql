@@ -101,6 +101,7 @@ CREATE TABLE data_sources (
     source_type VARCHAR(50) NOT NULL, -- website, rss, api, csv_upload
     url TEXT,
     scrape_config JSONB DEFAULT '{}',
+    scrape_state JSONB DEFAULT '{}', -- Per-page ETag / Last-Modified from the last scrape
     is_active BOOLEAN DEFAULT TRUE,
     last_scraped_at TIMESTAMP,
     last_error TEXT,
@@ -111,12 +112,40 @@ CREATE TABLE data_sources (
 
 CREATE INDEX idx_data_sources_org ON data_sources(org_id);
 
+-- =============================================
+-- HASH PARTITIONS (per-tenant tables)
+-- =============================================
+-- leads and messages are hash-partitioned on org_id: every tenant lives in one
+-- partition, so its queries prune to that partition and vacuum, index bloat
+-- and cache churn from a large tenant stay out of the others.
+CREATE OR REPLACE FUNCTION create_hash_partitions(
+    p_parent TEXT,
+    p_modulus INTEGER DEFAULT 16
+) RETURNS INTEGER AS $$
+DECLARE
+    v_name TEXT;
+    v_created INTEGER := 0;
+BEGIN
+    FOR i IN 0..p_modulus - 1 LOOP
+        v_name := p_parent || '_p' || LPAD(i::TEXT, 2, '0');
+        IF TO_REGCLASS(v_name) IS NULL THEN
+            EXECUTE FORMAT(
+                'CREATE TABLE %I PARTITION OF %I FOR VALUES WITH (MODULUS %s, REMAINDER %s)',
+                v_name, p_parent, p_modulus, i
+            );
+            v_created := v_created + 1;
+        END IF;
+    END LOOP;
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
+
 -- =============================================
 -- LEADS
 -- =============================================
 CREATE TABLE leads (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    org_id UUID REFERENCES organizations(id) ON DELETE CASCADE,
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    org_id UUID NOT NULL REFERENCES organizations(id) ON DELETE CASCADE,
     
     -- Company info
     company_name VARCHAR(255) NOT NULL,
@@ -158,13 +187,45 @@ CREATE TABLE leads (
     custom_fields JSONB DEFAULT '{}',
     
     created_at TIMESTAMP DEFAULT NOW(),
-    updated_at TIMESTAMP DEFAULT NOW()
-);
+    updated_at TIMESTAMP DEFAULT NOW(),
+    
+    -- Unique keys must include the partition key; ids are random UUIDs
+    PRIMARY KEY (org_id, id)
+) PARTITION BY HASH (org_id);
 
-CREATE INDEX idx_leads_org ON leads(org_id);
-CREATE INDEX idx_leads_status ON leads(org_id, status);
-CREATE INDEX idx_leads_score ON leads(org_id, score DESC);
+SELECT create_hash_partitions('leads', 16);
+
+-- Lookups by id alone (ORM flushes) probe one small index per partition
+CREATE INDEX idx_leads_id ON leads(id);
+-- List pages read ids off this index alone (filters on the included columns), then fetch one page
+CREATE INDEX idx_leads_created ON leads(org_id, created_at DESC, id DESC) INCLUDE (status, score, industry);
+CREATE INDEX idx_leads_status ON leads(org_id, status, created_at DESC, id DESC);
+-- Campaign targeting takes the best-scored leads first
+CREATE INDEX idx_leads_score ON leads(org_id, score DESC, id);
 CREATE INDEX idx_leads_industry ON leads(org_id, industry);
+-- Scraped leads are upserted on their source URL
+CREATE UNIQUE INDEX idx_leads_source_url ON leads(org_id, source_url) WHERE source_url IS NOT NULL;
+
+-- =============================================
+-- LEAD MATCH KEYS (blocking index for deduplication)
+-- =============================================
+CREATE TABLE lead_match_keys (
+    org_id UUID NOT NULL,
+    key_type VARCHAR(20) NOT NULL, -- name, domain, email_domain, phone
+    key_value VARCHAR(255) NOT NULL,
+    lead_id UUID NOT NULL,
+    PRIMARY KEY (org_id, key_type, key_value, lead_id),
+    FOREIGN KEY (org_id, lead_id) REFERENCES leads(org_id, id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_lead_match_keys_lead ON lead_match_keys(lead_id);
+
+-- Clusters of likely duplicates per org, rebuilt in the background (leads.find_duplicates)
+CREATE TABLE lead_duplicate_reports (
+    org_id UUID PRIMARY KEY REFERENCES organizations(id) ON DELETE CASCADE,
+    clusters JSONB NOT NULL DEFAULT '[]',
+    built_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
 
 -- =============================================
 -- CAMPAIGNS
@@ -209,16 +270,17 @@ CREATE TABLE campaigns (
     updated_at TIMESTAMP DEFAULT NOW()
 );
 
-CREATE INDEX idx_campaigns_org ON campaigns(org_id);
-CREATE INDEX idx_campaigns_status ON campaigns(org_id, status);
+CREATE INDEX idx_campaigns_org ON campaigns(org_id, created_at DESC);
+-- The scheduler fans out over active campaigns only
+CREATE INDEX idx_campaigns_active ON campaigns(org_id, id) WHERE status = 'active';
 
 -- =============================================
 -- MESSAGES
 -- =============================================
 CREATE TABLE messages (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
-    org_id UUID REFERENCES organizations(id) ON DELETE CASCADE,
-    lead_id UUID REFERENCES leads(id) ON DELETE CASCADE,
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    org_id UUID NOT NULL REFERENCES organizations(id) ON DELETE CASCADE,
+    lead_id UUID,
     campaign_id UUID REFERENCES campaigns(id) ON DELETE SET NULL,
     
     -- Message content
@@ -250,13 +312,64 @@ CREATE TABLE messages (
     external_id VARCHAR(255), -- Message ID from email provider, etc.
     
     created_at TIMESTAMP DEFAULT NOW(),
-    updated_at TIMESTAMP DEFAULT NOW()
-);
+    updated_at TIMESTAMP DEFAULT NOW(),
+    
+    PRIMARY KEY (org_id, id),
+    FOREIGN KEY (org_id, lead_id) REFERENCES leads(org_id, id) ON DELETE CASCADE
+) PARTITION BY HASH (org_id);
 
-CREATE INDEX idx_messages_org ON messages(org_id);
-CREATE INDEX idx_messages_lead ON messages(lead_id);
-CREATE INDEX idx_messages_campaign ON messages(campaign_id);
+SELECT create_hash_partitions('messages', 16);
+
+CREATE INDEX idx_messages_id ON messages(id);
+CREATE INDEX idx_messages_lead ON messages(org_id, lead_id);
+-- Campaign runs check which leads were already messaged, and how many today
+CREATE INDEX idx_messages_campaign ON messages(campaign_id, lead_id) INCLUDE (created_at);
+-- One message per campaign, lead and channel, however many runs race (the key must include org_id)
+CREATE UNIQUE INDEX idx_messages_campaign_lead_channel ON messages(org_id, campaign_id, lead_id, channel);
 CREATE INDEX idx_messages_status ON messages(org_id, status);
+CREATE INDEX idx_messages_external ON messages(external_id) WHERE external_id IS NOT NULL;
+
+-- =============================================
+-- CAMPAIGN MESSAGE STATS (funnel counters)
+-- =============================================
+-- Messages per campaign, channel and status. Writers apply deltas in the
+-- transaction that changes a message's status; campaigns.reconcile_stats
+-- recounts from messages to correct drift.
+CREATE TABLE campaign_message_stats (
+    campaign_id UUID NOT NULL REFERENCES campaigns(id) ON DELETE CASCADE,
+    org_id UUID NOT NULL REFERENCES organizations(id) ON DELETE CASCADE,
+    channel VARCHAR(50) NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    messages INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT NOW(),
+
+    PRIMARY KEY (campaign_id, channel, status)
+);
+
+-- =============================================
+-- MESSAGE REPLIES (inbound, from provider webhooks)
+-- =============================================
+CREATE TABLE message_replies (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    org_id UUID NOT NULL REFERENCES organizations(id) ON DELETE CASCADE,
+    message_id UUID,
+    
+    external_id VARCHAR(255) NOT NULL, -- Reply ID from the provider, for idempotent ingestion
+    from_address VARCHAR(255),
+    body TEXT NOT NULL,
+    received_at TIMESTAMP NOT NULL,
+    
+    analysis JSONB, -- sentiment, intent, inshallah_score, suggested_action, analysis
+    analyzed_at TIMESTAMP,
+    
+    created_at TIMESTAMP DEFAULT NOW(),
+    
+    FOREIGN KEY (org_id, message_id) REFERENCES messages(org_id, id) ON DELETE CASCADE
+);
+
+CREATE UNIQUE INDEX idx_message_replies_external ON message_replies(external_id);
+CREATE INDEX idx_message_replies_message ON message_replies(message_id);
+CREATE INDEX idx_message_replies_pending ON message_replies(org_id, created_at) WHERE analyzed_at IS NULL;
 
 -- =============================================
 -- INTEGRATIONS
@@ -290,8 +403,10 @@ CREATE UNIQUE INDEX idx_integrations_unique ON integrations(org_id, type);
 -- =============================================
 -- ACTIVITY LOG
 -- =============================================
+-- Partitioned by month on created_at; partitions are created ahead and dropped
+-- past retention by ensure_activity_log_partitions / drop_activity_log_partitions.
 CREATE TABLE activity_log (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
     org_id UUID REFERENCES organizations(id) ON DELETE CASCADE,
     user_id UUID REFERENCES users(id) ON DELETE SET NULL,
     
@@ -303,11 +418,74 @@ CREATE TABLE activity_log (
     ip_address INET,
     user_agent TEXT,
     
-    created_at TIMESTAMP DEFAULT NOW()
-);
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Feed order and keyset cursor (created_at, id); filtered feeds
+CREATE INDEX idx_activity_created ON activity_log(org_id, created_at DESC, id DESC);
+CREATE INDEX idx_activity_action ON activity_log(org_id, action, created_at DESC);
+CREATE INDEX idx_activity_entity ON activity_log(org_id, entity_type, created_at DESC);
+-- One entity's history (lead timeline)
+CREATE INDEX idx_activity_entity_id ON activity_log(org_id, entity_id, created_at DESC, id DESC);
+
+-- Catches rows outside every monthly partition; should stay empty
+CREATE TABLE activity_log_default PARTITION OF activity_log DEFAULT;
+
+CREATE OR REPLACE FUNCTION ensure_activity_log_partitions(
+    p_from DATE DEFAULT CURRENT_DATE,
+    p_months_ahead INTEGER DEFAULT 3
+) RETURNS INTEGER AS $$
+DECLARE
+    v_month DATE := DATE_TRUNC('month', p_from);
+    v_last DATE := DATE_TRUNC('month', CURRENT_DATE) + MAKE_INTERVAL(months => p_months_ahead);
+    v_name TEXT;
+    v_created INTEGER := 0;
+BEGIN
+    WHILE v_month <= v_last LOOP
+        v_name := 'activity_log_' || TO_CHAR(v_month, 'YYYY_MM');
+        IF TO_REGCLASS(v_name) IS NULL THEN
+            EXECUTE FORMAT(
+                'CREATE TABLE %I PARTITION OF activity_log FOR VALUES FROM (%L) TO (%L)',
+                v_name, v_month, (v_month + INTERVAL '1 month')::DATE
+            );
+            v_created := v_created + 1;
+        END IF;
+        v_month := v_month + INTERVAL '1 month';
+    END LOOP;
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Detach (and by default drop) monthly partitions that end before the cutoff
+CREATE OR REPLACE FUNCTION drop_activity_log_partitions(
+    p_keep_months INTEGER,
+    p_detach_only BOOLEAN DEFAULT FALSE
+) RETURNS SETOF TEXT AS $$
+DECLARE
+    v_cutoff DATE := DATE_TRUNC('month', CURRENT_DATE) - MAKE_INTERVAL(months => p_keep_months);
+    v_name TEXT;
+BEGIN
+    FOR v_name IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'activity_log'::REGCLASS
+          AND c.relname ~ '^activity_log_[0-9]{4}_[0-9]{2}$'
+          AND TO_DATE(SUBSTRING(c.relname FROM 14), 'YYYY_MM') < v_cutoff
+        ORDER BY c.relname
+    LOOP
+        EXECUTE FORMAT('ALTER TABLE activity_log DETACH PARTITION %I', v_name);
+        IF NOT p_detach_only THEN
+            EXECUTE FORMAT('DROP TABLE %I', v_name);
+        END IF;
+        RETURN NEXT v_name;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
 
-CREATE INDEX idx_activity_org ON activity_log(org_id);
-CREATE INDEX idx_activity_created ON activity_log(org_id, created_at DESC);
+SELECT ensure_activity_log_partitions(CURRENT_DATE, 3);
 
 -- =============================================
 -- USAGE TRACKING (for billing)
@@ -340,14 +518,15 @@ CREATE TABLE subscription_limits (
     data_sources INTEGER,
     campaigns INTEGER,
     integrations TEXT[],
-    features TEXT[]
+    features TEXT[],
+    activity_retention_months INTEGER -- -1 means keep forever
 );
 
 INSERT INTO subscription_limits VALUES
-('free', 100, 50, 25, 1, 2, 1, ARRAY['email'], ARRAY['basic_scoring']),
-('starter', 500, 250, 100, 3, 5, 5, ARRAY['email', 'linkedin'], ARRAY['basic_scoring', 'csv_import']),
-('pro', 2000, 1000, 500, 10, 20, 20, ARRAY['email', 'linkedin', 'whatsapp'], ARRAY['basic_scoring', 'csv_import', 'advanced_scoring', 'api_access']),
-('enterprise', -1, -1, -1, -1, -1, -1, ARRAY['email', 'linkedin', 'whatsapp', 'hubspot', 'pipedrive'], ARRAY['basic_scoring', 'csv_import', 'advanced_scoring', 'api_access', 'custom_integrations', 'dedicated_support']);
+('free', 100, 50, 25, 1, 2, 1, ARRAY['email'], ARRAY['basic_scoring'], 3),
+('starter', 500, 250, 100, 3, 5, 5, ARRAY['email', 'linkedin'], ARRAY['basic_scoring', 'csv_import'], 6),
+('pro', 2000, 1000, 500, 10, 20, 20, ARRAY['email', 'linkedin', 'whatsapp'], ARRAY['basic_scoring', 'csv_import', 'advanced_scoring', 'api_access'], 12),
+('enterprise', -1, -1, -1, -1, -1, -1, ARRAY['email', 'linkedin', 'whatsapp', 'hubspot', 'pipedrive'], ARRAY['basic_scoring', 'csv_import', 'advanced_scoring', 'api_access', 'custom_integrations', 'dedicated_support'], 24);
 
 -- =============================================
 -- ROW LEVEL SECURITY POLICIES
@@ -359,8 +538,11 @@ ALTER TABLE users ENABLE ROW LEVEL SECURITY;
 ALTER TABLE company_profiles ENABLE ROW LEVEL SECURITY;
 ALTER TABLE data_sources ENABLE ROW LEVEL SECURITY;
 ALTER TABLE leads ENABLE ROW LEVEL SECURITY;
+ALTER TABLE lead_match_keys ENABLE ROW LEVEL SECURITY;
+ALTER TABLE lead_duplicate_reports ENABLE ROW LEVEL SECURITY;
 ALTER TABLE campaigns ENABLE ROW LEVEL SECURITY;
 ALTER TABLE messages ENABLE ROW LEVEL SECURITY;
+ALTER TABLE message_replies ENABLE ROW LEVEL SECURITY;
 ALTER TABLE integrations ENABLE ROW LEVEL SECURITY;
 ALTER TABLE activity_log ENABLE ROW LEVEL SECURITY;
 ALTER TABLE usage ENABLE ROW LEVEL SECURITY;
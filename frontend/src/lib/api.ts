@@ -3,6 +3,7 @@ import type {
   ProfileUpdateData,
   LeadCreateData,
   LeadUpdateData,
+  LeadSelection,
   CampaignCreateData,
   DataSourceCreateData,
   IntegrationCreateData,
@@ -61,6 +62,14 @@ export const leads = {
   create: (data: LeadCreateData) => api.post('/leads', data),
   update: (id: string, data: LeadUpdateData) => api.put(`/leads/${id}`, data),
   delete: (id: string) => api.delete(`/leads/${id}`),
+  export: (params: { format: 'csv' | 'ndjson' | 'parquet'; status?: string; industry?: string; min_score?: number; search?: string }) =>
+    api.get('/leads/export', { params, responseType: 'blob' }),
+  bulkUpdate: (data: { selection: LeadSelection; set_status?: string; add_tags?: string[]; remove_tags?: string[] }) =>
+    api.post('/leads/bulk/update', data),
+  bulkDelete: (selection: LeadSelection) => api.post('/leads/bulk/delete', { selection }),
+  duplicates: (limit?: number) => api.get('/leads/duplicates', { params: { limit } }),
+  merge: (primary_id: string, duplicate_ids: string[]) =>
+    api.post('/leads/merge', { primary_id, duplicate_ids }),
   import: (file: File) => {
     const formData = new FormData();
     formData.append('file', file);
@@ -86,6 +95,7 @@ export const sources = {
   list: () => api.get('/sources'),
   create: (data: DataSourceCreateData) => api.post('/sources', data),
   enableIndustry: (id: string) => api.post(`/sources/industries/${id}/enable`),
+  scrape: (id: string) => api.post(`/sources/${id}/scrape`),
 };
 
 // Integrations
@@ -95,16 +105,65 @@ export const integrations = {
   delete: (id: string) => api.delete(`/integrations/${id}`),
 };
 
+// Background tasks
+export const tasks = {
+  get: (id: string) => api.get(`/tasks/${id}`),
+  wait: async (id: string, intervalMs = 1000) => {
+    for (;;) {
+      const { data } = await api.get(`/tasks/${id}`);
+      if (data.status === 'succeeded' || data.status === 'dead') return data;
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+  },
+};
+
 // Dashboard
 export const dashboard = {
   stats: () => api.get('/dashboard/stats'),
-  activity: () => api.get('/dashboard/activity'),
+  activity: (params?: { limit?: number; cursor?: string; action?: string; entity_type?: string; since?: string; until?: string }) =>
+    api.get('/dashboard/activity', { params }),
 };
 
 // AI
 export const ai = {
   generateMessage: (data: { lead_id: string; channel: string; custom_context?: string }) =>
     api.post('/ai/generate-message', data),
+  // Server-sent events; onEvent gets subject, token, done and error events as they arrive
+  generateMessageStream: async (
+    data: { lead_id: string; channel: string; custom_context?: string },
+    onEvent: (event: string, payload: any) => void
+  ) => {
+    const token = localStorage.getItem('token');
+    const response = await fetch(`${API_URL}/api/ai/generate-message/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(token ? { Authorization: `Bearer ${token}` } : {}),
+      },
+      body: JSON.stringify(data),
+    });
+    if (!response.ok || !response.body) {
+      const error = await response.json().catch(() => ({}));
+      throw new Error(error.detail || response.statusText);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const frame = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        const event = frame.match(/^event: (.*)$/m)?.[1] ?? 'message';
+        const payload = frame.match(/^data: (.*)$/m)?.[1];
+        if (payload) onEvent(event, JSON.parse(payload));
+      }
+    }
+  },
   scoreLead: (lead_id: string) =>
     api.post('/ai/score-lead', { lead_id }),
   analyzeResponse: (message: string, context?: string) =>
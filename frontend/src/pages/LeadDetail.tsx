@@ -95,9 +95,19 @@ export default function LeadDetail() {
   });
 
   const generateMutation = useMutation({
-    mutationFn: (channel: string) => ai.generateMessage({ lead_id: id!, channel }),
-    onSuccess: (data) => {
-      setGeneratedMessage(data.data);
+    mutationFn: (channel: string) => {
+      setGeneratedMessage(null);
+      return ai.generateMessageStream({ lead_id: id!, channel }, (event, payload) => {
+        if (event === 'subject') {
+          setGeneratedMessage((prev) => ({ body: prev?.body ?? '', subject: payload.subject }));
+        } else if (event === 'token') {
+          setGeneratedMessage((prev) => ({ ...prev, body: (prev?.body ?? '') + payload.text }));
+        } else if (event === 'done') {
+          setGeneratedMessage({ subject: payload.subject ?? undefined, body: payload.body });
+        } else if (event === 'error') {
+          throw new Error(payload.detail);
+        }
+      });
     },
   });
 
@@ -1,7 +1,7 @@
 import { useState } from 'react';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { Link } from 'react-router-dom';
-import { leads as leadsApi, ai } from '../lib/api';
+import { leads as leadsApi, ai, tasks } from '../lib/api';
 import { Search, Plus, Upload, Filter, MoreVertical, Sparkles, Mail, Linkedin } from 'lucide-react';
 import type { Lead } from '../types';
 
@@ -49,11 +49,15 @@ export default function Leads() {
   });
 
   const importMutation = useMutation({
-    mutationFn: (file: File) => leadsApi.import(file),
-    onSuccess: (data) => {
+    mutationFn: (file: File) => leadsApi.import(file).then(res => tasks.wait(res.data.id)),
+    onSuccess: (task) => {
       queryClient.invalidateQueries({ queryKey: ['leads'] });
       setShowImport(false);
-      alert(`تم استيراد ${data.data.imported} عميل محتمل`);
+      if (task.status === 'succeeded') {
+        alert(`تم استيراد ${task.result.imported} عميل محتمل`);
+      } else {
+        alert('فشل استيراد الملف');
+      }
     },
   });
 
@@ -172,6 +172,14 @@ export interface LeadUpdateData extends Partial<LeadCreateData> {
   tags?: string[];
 }
 
+export interface LeadSelection {
+  ids?: string[];
+  status?: string;
+  industry?: string;
+  min_score?: number;
+  search?: string;
+}
+
 export interface CampaignCreateData {
   name: string;
   description?: string;